@@ -1,7 +1,12 @@
-from .osc_generator import OSCGenerator
-from .sinewave_generator import SinewaveGenerator
+from utils import registry
 
-__all__ = [
-    'OSCGenerator',
-    'SinewaveGenerator'
-]
+# Classes are imported on first access only (see utils.registry), so that pyaudio isn't imported by OSC scenarios
+MODULES = {
+    'OSCGenerator': '.osc_generator',
+    'SinewaveGenerator': '.sinewave_generator',
+    'OscillatorBankGenerator': '.oscillator_bank',
+}
+
+__all__ = list(MODULES)
+
+__getattr__ = registry.lazy_getattr(__name__, MODULES)
@@ -1,25 +1,37 @@
+import time
 import logging
 from abc import ABC, abstractmethod
-from typing import Any
-from threading import Thread, Event, Lock
+from typing import Any, Optional
+from threading import Thread, Event, Lock, Condition, current_thread
 
 logger = logging.getLogger(__name__)
 
 class AudioGenerator(ABC, Thread):
     """
     Handles how and to what device audio parameters output by the Feature Mapper module are sent.
-    The module continuously send audio data, even if there is nothing to output.
+    The main loop of this thread repeatedly calls `output_audio`, which defines when and what audio data is actually output.
 
     At each iteration of the main loop of this thread, audio parameters are stored in the _data_to_send.
     A setter and a getter are defined in or to safely write and access this variable. *
     Hence it should not directly be accessed from outside of this thread, not even by subclasses.
+
+    Event-driven subclasses call `wait_for_data` in `output_audio`, which blocks until `send` provides new data
+    (or until a timeout or the stop of the module), instead of outputting the same data over and over.
+
+    Audio data can come with a utils.latency.FrameTrace. Subclasses call `_record_dispatch` once the data is actually output,
+    which stamps the trace and hands it to the latency_collector, if any.
     """
 
     def __init__(self):
         super().__init__()
         self.stop_event = Event()
         self._data_to_send: Any = None
+        self._trace = None
         self._data_lock = Lock()
+        self._new_data = Condition(self._data_lock)
+        self._data_version = 0
+        self._taken_version = 0
+        self.latency_collector = None
 
 
     @property
@@ -49,6 +61,77 @@ class AudioGenerator(ABC, Thread):
         """
         with self._data_lock:
             self._data_to_send = value
+            self._data_version += 1
+            self._new_data.notify_all()
+
+
+    def send(self, value, trace=None):
+        """
+        Sets the audio data to be sent along with the trace of the frame it comes from
+
+        Parameters:
+        ---
+        value: Any
+            The new audio data to be set.
+
+        trace: utils.latency.FrameTrace, default=None
+            Timing record of the frame the audio data was computed from
+        """
+        with self._data_lock:
+            self._data_to_send = value
+            self._trace = trace
+            self._data_version += 1
+            self._new_data.notify_all()
+
+
+    def wait_for_data(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until data more recent than the last one returned by `_take_data` is available, the timeout expires or the module is stopped
+
+        Parameters:
+        ---
+        timeout: float, default=None
+            Maximum waiting time in seconds. Waits indefinitely if None
+
+        Returns:
+        ---
+        new_data: bool
+            Whether new data is available
+        """
+        with self._data_lock:
+            self._new_data.wait_for(lambda: self._data_version != self._taken_version or self.stop_event.is_set(), timeout)
+            return self._data_version != self._taken_version
+
+
+    def _take_data(self):
+        """
+        Atomically reads the audio data to send and takes ownership of its pending trace
+        The trace is returned only once, so that a frame isn't recorded several times when the same data is output again
+
+        Returns:
+        ---
+        data, trace: Any, utils.latency.FrameTrace or None
+        """
+        with self._data_lock:
+            trace, self._trace = self._trace, None
+            self._taken_version = self._data_version
+            return self._data_to_send, trace
+
+
+    def _record_dispatch(self, trace) -> None:
+        """
+        Stamps the audio dispatch time of a trace and hands it to the latency collector
+
+        Parameters:
+        ---
+        trace: utils.latency.FrameTrace or None
+            Trace returned by `_take_data`
+        """
+        if trace is None:
+            return
+        trace.audio_dispatch = time.perf_counter()
+        if self.latency_collector is not None:
+            self.latency_collector.record(trace)
 
 
     @abstractmethod
@@ -80,7 +163,12 @@ class AudioGenerator(ABC, Thread):
     def stop(self):
         """
         Triggers the stop_event Event to stop the main loop of this thread and calls the cleanup method to ensure that streams a correctly closed.
+        The main loop is waited for beforehand, so that cleanup never closes a stream or a socket still in use by `output_audio`.
         """
         logger.info('Stopping audio stream')
         self.stop_event.set()
+        with self._data_lock:
+            self._new_data.notify_all()
+        if self.is_alive() and current_thread() is not self:
+            self.join(timeout=1.)
         self.cleanup()
@@ -0,0 +1,145 @@
+"""
+Vectorized signal processing helpers used by the in-process audio generators.
+They all write into preallocated buffers, so that no array is allocated in the audio callback.
+"""
+import numpy as np
+
+TWO_PI = 2 * np.pi
+
+
+def smoothing_decay(time_constant: float, sample_rate: int, n_samples: int) -> np.ndarray:
+    """
+    Decay factors a^1, ..., a^n of a one-pole exponential smoothing with the given time constant.
+    See `smooth_towards`
+
+
+    Parameters
+    ---
+    time_constant: float, required
+        Time constant of the smoothing in milliseconds (time to reach ~63% of a step). No smoothing if 0
+
+    sample_rate: int, required
+        Sampling rate in Hz
+
+    n_samples: int, required
+        Number of samples of a buffer
+
+
+    Returns
+    ---
+    decay: np.ndarray
+        float64 array of shape (n_samples,)
+    """
+    if time_constant <= 0:
+        return np.zeros(n_samples)
+    a = np.exp(-1000 / (time_constant * sample_rate))
+    return a ** np.arange(1, n_samples + 1)
+
+
+def smooth_towards(current: float, target: float, decay: np.ndarray, out: np.ndarray) -> float:
+    """
+    Per-sample exponential smoothing from the current value towards a target held constant over the buffer.
+    The recursion y[k] = a * y[k-1] + (1 - a) * target is computed in closed form: y[k] = target + (current - target) * a^(k+1)
+
+
+    Parameters
+    ---
+    current: float, required
+        Value of the parameter at the last sample of the previous buffer
+
+    target: float, required
+        Target value of the parameter
+
+    decay: np.ndarray, required
+        Output of `smoothing_decay`, same size as out
+
+    out: np.ndarray, required
+        Buffer receiving the smoothed value of every sample
+
+
+    Returns
+    ---
+    last: float
+        Value at the last sample, to be passed as current for the next buffer
+    """
+    np.multiply(decay, current - target, out=out)
+    out += target
+    return float(out[-1])
+
+
+def accumulate_phase(phase: float, frequency: np.ndarray, sample_rate: int, out: np.ndarray) -> float:
+    """
+    Phase accumulator: integrates a per-sample frequency so that the phase is continuous across buffers and frequency changes.
+    The phase of the k-th sample is phase + 2*pi * sum(frequency[:k+1]) / sample_rate
+
+
+    Parameters
+    ---
+    phase: float, required
+        Phase at the last sample of the previous buffer, in radians
+
+    frequency: np.ndarray, required
+        Frequency of every sample in Hz
+
+    sample_rate: int, required
+        Sampling rate in Hz
+
+    out: np.ndarray, required
+        float64 buffer receiving the phase of every sample
+
+
+    Returns
+    ---
+    last: float
+        Phase at the last sample, wrapped to [0, 2*pi) to keep the precision of the next buffers
+    """
+    np.cumsum(frequency, out=out)
+    out *= TWO_PI / sample_rate
+    out += phase
+    return float(out[-1] % TWO_PI)
+
+
+WAVEFORMS = ('sine', 'triangle', 'saw', 'square')
+
+
+def make_wavetable(waveform: str = 'sine', size: int = 2048, n_harmonics: int = 32) -> np.ndarray:
+    """
+    One period of a waveform, computed as a sum of harmonics so that non sine waveforms are band limited (less aliasing)
+
+
+    Parameters
+    ---
+    waveform: str, default='sine'
+        One of 'sine', 'triangle', 'saw' or 'square'
+
+    size: int, default=2048
+        Number of samples of the period. Must be a power of 2, so that table indices can be wrapped with a bit mask
+
+    n_harmonics: int, default=32
+        Number of harmonics of non sine waveforms
+
+
+    Returns
+    ---
+    table: np.ndarray
+        float64 array of shape (size,), normalized between -1 and 1
+    """
+    if waveform not in WAVEFORMS:
+        raise ValueError(f'Unknown waveform {waveform}. Available waveforms: {WAVEFORMS}')
+    if size & (size - 1):
+        raise ValueError(f'Wavetable size must be a power of 2, got {size}')
+
+    phase = TWO_PI * np.arange(size) / size
+    if waveform == 'sine':
+        return np.sin(phase)
+
+    harmonics = np.arange(1, n_harmonics + 1)
+    if waveform == 'saw':
+        amplitudes = 1 / harmonics
+    elif waveform == 'square':
+        amplitudes = np.where(harmonics % 2 == 1, 1 / harmonics, 0.)
+    else:
+        # Odd harmonics with alternating signs, in 1/n^2
+        amplitudes = np.where(harmonics % 2 == 1, (-1.) ** ((harmonics - 1) // 2) / harmonics ** 2, 0.)
+    table = amplitudes @ np.sin(np.outer(harmonics, phase))
+    return table / np.abs(table).max()
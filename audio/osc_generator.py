@@ -1,5 +1,10 @@
-from typing import Dict, Any
-from pythonosc import udp_client
+import time
+import socket
+import struct
+import numbers
+from typing import Dict, Any, List, Optional, Union
+from pythonosc.osc_message_builder import OscMessageBuilder
+from pythonosc.parsing import osc_types
 from .audio_generator import AudioGenerator
 import logging
 
@@ -11,9 +16,34 @@ class OSCGenerator(AudioGenerator):
     """
     Allows to send audio parameters defined by the Feature Mapper module as Open Sound Control (OSC) signals
     One needs to specify a server on which a receiver program (like puredata or Max MSP) interprets incoming data
+
+    The generator is event-driven: it sleeps until new audio parameters are received, and only sends the routes whose value changed
+    (beyond a per-route epsilon for numeric values) since they were last sent. Hence the receiver isn't flooded with duplicate packets.
+    Optionally, the send rate is capped (parameters received meanwhile are coalesced, only the latest ones are sent)
+    and every route is sent again when nothing was sent for a keep-alive interval, so that a receiver started late gets the current state.
+
+    By default, each route is sent as a separate OSC message (one UDP datagram each).
+    In bundle mode, all routes of one mapper output are packed into a single OSC bundle, whose timetag is the capture time of the frame
+    they were computed from plus a fixed delay. A receiver honoring timetags can then apply the changes with a constant latency instead of a variable one,
+    provided that the delay is larger than the worst case processing latency (see utils.latency.LatencyCollector).
+
+    Messages are encoded once per value and reused (e.g by keep-alives), and every datagram is encoded once whatever the number of destinations.
+
+
+    Attributes
+    ---
+    messages_sent: int
+        Number of OSC messages actually sent
+
+    messages_suppressed: int
+        Number of route values not sent because they didn't change
     """
 
-    def __init__(self, ip: str = '127.0.0.1', port: int = 11111):
+    BUNDLE_HEADER = osc_types.write_string('#bundle')
+
+    def __init__(self, ip: str = '127.0.0.1', port: int = 11111, epsilon: Union[float, Dict[str, float]] = 0.,
+                 max_rate: Optional[float] = None, keepalive: Optional[int] = 1000,
+                 bundle: bool = False, delay: int = 0, destinations: Optional[List[List[Any]]] = None):
         """
         Initializes the OSCGenerator.
 
@@ -25,28 +55,160 @@ class OSCGenerator(AudioGenerator):
 
         port: int, default=11111
             The port number of the OSC server.
+
+        epsilon: float or dict, default=0.
+            Minimum change of a numeric value for its route to be sent again.
+            Either a single value for all routes, or a dict { route: epsilon } (routes missing from the dict use 0)
+
+        max_rate: float, default=None
+            Maximum number of updates sent per second. Unlimited if None
+
+        keepalive: int, default=1000
+            Interval in milliseconds after which all routes are sent again if nothing was sent in the meantime. Disabled if None
+
+        bundle: bool, default=False
+            Whether all routes of one mapper output are sent in a single timetagged OSC bundle
+
+        delay: int, default=0
+            Bundle mode only. Delay in milliseconds added to the capture time of the frame to compute the timetag of the bundle
+
+        destinations: list, default=None
+            Additional [ip, port] pairs the same datagrams are sent to. Host names, IPv4 and IPv6 addresses are supported
         """
         super().__init__()
-        self.client = udp_client.SimpleUDPClient(ip, port)
-        logger.info(f'OSC generator initialized at {ip}:{port}')
+        self.destinations = [(ip, port)] + [(dest_ip, int(dest_port)) for dest_ip, dest_port in destinations or []]
+        # Destinations are resolved once, and one socket is opened per address family (IPv4, IPv6)
+        self.sockets: Dict[int, socket.socket] = {}
+        self._addresses: List[tuple] = []
+        for dest_ip, dest_port in self.destinations:
+            family, _, _, _, address = socket.getaddrinfo(dest_ip, dest_port, socket.AF_UNSPEC, socket.SOCK_DGRAM)[0]
+            if family not in self.sockets:
+                self.sockets[family] = socket.socket(family, socket.SOCK_DGRAM)
+            self._addresses.append((self.sockets[family], address))
+        self.bundle = bundle
+        self.delay = delay / 1000
+        # perf_counter timestamps (frame capture times) are converted to system time for the timetags
+        self.clock_offset = time.time() - time.perf_counter()
+        self.epsilon = epsilon
+        self.min_interval = 1 / max_rate if max_rate else 0.
+        self.keepalive = keepalive / 1000 if keepalive else None
+
+        self._routes: Dict[str, str] = {}
+        self._encoded: Dict[str, tuple] = {}
+        self._sent_values: Dict[str, Any] = {}
+        self.last_send_time = time.perf_counter()
+        self.messages_sent = 0
+        self.messages_suppressed = 0
+        destinations = ', '.join(f'{dest_ip}:{dest_port}' for dest_ip, dest_port in self.destinations)
+        logger.info(f'OSC generator initialized at {destinations}{" (bundles)" if bundle else ""}')
+
+
+    def _route(self, key: str) -> str:
+        """
+        OSC address of a key of the audio parameters, cached to avoid formatting it at each message
+        """
+        route = self._routes.get(key)
+        if route is None:
+            route = self._routes[key] = key if key.startswith('/') else f'/{key}'
+        return route
+
+
+    def _encode(self, key: str, val: Any) -> bytes:
+        """
+        OSC message of a route, encoded once per value
+        """
+        cached = self._encoded.get(key)
+        if cached is not None and type(cached[0]) is type(val) and cached[0] == val:
+            return cached[1]
+        builder = OscMessageBuilder(self._route(key))
+        builder.add_arg(val)
+        dgram = builder.build().dgram
+        self._encoded[key] = (val, dgram)
+        return dgram
+
+
+    def _build_bundle(self, dgrams: List[bytes], trace=None) -> bytes:
+        """
+        Packs encoded messages into an OSC bundle timetagged with the capture time of the frame (or the current time) plus the delay
+        """
+        reference = trace.capture if trace is not None else time.perf_counter()
+        timetag = osc_types.write_date(reference + self.clock_offset + self.delay)
+        elements = b''.join(struct.pack('>i', len(dgram)) + dgram for dgram in dgrams)
+        return self.BUNDLE_HEADER + timetag + elements
+
+
+    def _send_dgram(self, dgram: bytes) -> None:
+        """
+        Sends the same encoded datagram to every destination
+        """
+        for sock, address in self._addresses:
+            sock.sendto(dgram, address)
+
+
+    def _has_changed(self, key: str, val: Any) -> bool:
+        """
+        Whether the value of a route differs from the last one sent, beyond the epsilon of the route for numeric values
+        """
+        if key not in self._sent_values:
+            return True
+        previous = self._sent_values[key]
+        if isinstance(val, numbers.Number) and isinstance(previous, numbers.Number):
+            epsilon = self.epsilon.get(key, 0.) if isinstance(self.epsilon, dict) else self.epsilon
+            return abs(val - previous) > epsilon
+        return val != previous
 
 
     def output_audio(self):
         """
         Ouputs OSC signals so that the actual sound generation is handled
         by an external tool (like puredata or Max/MSP)
+        Blocks until new audio parameters are received or the keep-alive interval is elapsed
         """
-        if self.data_to_send:
+        timeout = None
+        if self.keepalive is not None:
+            timeout = max(0., self.last_send_time + self.keepalive - time.perf_counter())
+        has_new_data = self.wait_for_data(timeout)
+        if self.stop_event.is_set():
+            return
+
+        if has_new_data and self.min_interval:
+            delay = self.last_send_time + self.min_interval - time.perf_counter()
+            if delay > 0 and self.stop_event.wait(delay):
+                return
+
+        data, trace = self._take_data()
+        now = time.perf_counter()
+        force = self.keepalive is not None and now - self.last_send_time >= self.keepalive
+        if not data:
+            # Nothing to send yet, the keep-alive timer is restarted to avoid waking up continuously
+            if force:
+                self.last_send_time = now
+            return
+
+        if type(data) != dict:
+            raise TypeError('OSC generator expects dict type with format Dict[str, Any]')
+
+        dgrams = []
+        for key, val in data.items():
+            if not force and not self._has_changed(key, val):
+                self.messages_suppressed += 1
+                continue
+            dgrams.append(self._encode(key, val))
+            self._sent_values[key] = val
+            if val == 1: logger.debug(f'Sent {val} to {self._route(key)} route')
 
-            if type(self.data_to_send) != dict:
-                raise TypeError('OSC generator expects dict type with format Dict[str, Any]')
+        if dgrams:
+            if self.bundle:
+                self._send_dgram(self._build_bundle(dgrams, trace))
             else:
-                for route, val in self.data_to_send.items():
-                    route = f'/{route}' if not route.startswith('/') else route
-                    self.client.send_message(route, val)
-                    if val == 1: logger.debug(f'Sent {val} to {route} route')
+                for dgram in dgrams:
+                    self._send_dgram(dgram)
+            self.messages_sent += len(dgrams)
+            self.last_send_time = now
+            self._record_dispatch(trace)
 
 
     def cleanup(self):
-        logger.info(f'Cleanup method not required in {__name__}')
-        pass
+        logger.info(f'OSC generator sent {self.messages_sent} messages, suppressed {self.messages_suppressed} unchanged values')
+        for sock in self.sockets.values():
+            sock.close()
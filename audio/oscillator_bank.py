@@ -0,0 +1,210 @@
+import logging
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .sinewave_generator import SinewaveGenerator
+from .dsp import smoothing_decay, make_wavetable
+
+logger = logging.getLogger(__name__)
+
+
+class OscillatorBankGenerator(SinewaveGenerator):
+    """
+    Polyphonic in-process generator: a bank of N oscillators (voices) reading the same precomputed wavetable,
+    each one with its own frequency, amplitude and smoothing time constants. Each hand or landmark can then drive its own partial.
+
+    All the voices of a buffer are rendered at once with (n_voices, buffer_size) array operations:
+    per-sample smoothing of frequencies and amplitudes, phase accumulation, wavetable lookup with linear interpolation and mixing.
+    Backends (pyaudio stream callback or WAV file) are the ones of audio.SinewaveGenerator.
+
+    Audio parameters are dictionaries whose keys are mapped to voices by `voice_map`: { route: [param, voice] }, param being 'frequency' or 'amplitude'.
+    A scalar value is assigned to the voice, a sequence of values to consecutive voices starting from it.
+    Without voice_map, the routes 'frequency_<i>' and 'amplitude_<i>' drive the voice i,
+    and the routes 'frequency' and 'amplitude' (or 'volume') drive the voices 0, 1, ... with sequences of values.
+    """
+
+    PARAMS = ('frequency', 'amplitude')
+
+    def __init__(self, n_voices: int = 8, waveform: str = 'sine', table_size: int = 2048,
+                 frequencies: Union[float, Sequence[float]] = 440., amplitudes: Union[float, Sequence[float]] = 0.,
+                 frequency_smoothing: Union[float, Sequence[float]] = 20., amplitude_smoothing: Union[float, Sequence[float]] = 10.,
+                 gain: Optional[float] = None, voice_map: Optional[Dict[str, List]] = None, **kwargs):
+        """
+        Initializes the OscillatorBankGenerator.
+
+
+        Parameters:
+        ---
+        n_voices: int, default=8
+            Number of oscillators
+
+        waveform: str, default='sine'
+            Waveform of the shared wavetable. See audio.dsp.make_wavetable
+
+        table_size: int, default=2048
+            Number of samples of the wavetable (power of 2)
+
+        frequencies: float or list, default=440.
+            Initial frequency of every voice (or of each voice) in Hz
+
+        amplitudes: float or list, default=0.
+            Initial amplitude of every voice (or of each voice), between 0 and 1
+
+        frequency_smoothing: float or list, default=20.
+            Time constant of the frequency smoothing in milliseconds, for every voice or each voice. Disabled if 0
+
+        amplitude_smoothing: float or list, default=10.
+            Time constant of the amplitude smoothing in milliseconds, for every voice or each voice. Disabled if 0
+
+        gain: float, default=None
+            Gain applied to the mix of the voices. 1 / n_voices if None, so that the output never clips
+
+        voice_map: dict, default=None
+            { route: [param, voice] } mapping of the audio parameters to the voices. See class description
+
+        **kwargs:
+            Parameters of audio.SinewaveGenerator: backend, sample_rate, buffer_size and output_path
+        """
+        self.n_voices = n_voices
+        self.table = make_wavetable(waveform, table_size)
+        # Differences between consecutive samples (wrapping around) for the linear interpolation
+        self.table_diff = np.roll(self.table, -1) - self.table
+        self.table_mask = table_size - 1
+        self.gain = gain if gain is not None else 1 / n_voices
+
+        self.frequency_smoothing_per_voice = np.broadcast_to(np.asarray(frequency_smoothing, dtype=np.float64), (n_voices,))
+        self.amplitude_smoothing_per_voice = np.broadcast_to(np.asarray(amplitude_smoothing, dtype=np.float64), (n_voices,))
+        self.voice_map = {route: (param, int(voice)) for route, (param, voice) in (voice_map or {}).items()}
+        for route, (param, voice) in self.voice_map.items():
+            if param not in self.PARAMS or not 0 <= voice < n_voices:
+                raise ValueError(f'Invalid voice_map entry {route}: {[param, voice]}')
+        self._ignored_routes = set()
+
+        super().__init__(frequency=0., volume=0., **kwargs)
+        self.frequencies = np.broadcast_to(np.asarray(frequencies, dtype=np.float64), (n_voices,)).copy()
+        self.amplitudes = np.broadcast_to(np.asarray(amplitudes, dtype=np.float64), (n_voices,)).copy()
+        self.phases = np.zeros(n_voices)
+        self.targets = {
+            'frequency': self.frequencies.copy(),
+            'amplitude': self.amplitudes.copy()
+        }
+        logger.info(f'Oscillator bank initialized with {n_voices} {waveform} voices')
+
+
+    def _allocate_buffers(self, n_samples: int) -> None:
+        """
+        Overrides audio.SinewaveGenerator._allocate_buffers
+        Allocates (n_voices, n_samples) rendering buffers
+        """
+        shape = (self.n_voices, n_samples)
+        self._frequency_decay = np.stack([smoothing_decay(tau, self.sample_rate, n_samples) for tau in self.frequency_smoothing_per_voice])
+        self._amplitude_decay = np.stack([smoothing_decay(tau, self.sample_rate, n_samples) for tau in self.amplitude_smoothing_per_voice])
+        self._frequency_buffer = np.empty(shape)
+        self._amplitude_buffer = np.empty(shape)
+        self._phase_buffer = np.empty(shape)
+        self._index_buffer = np.empty(shape, dtype=np.int64)
+        self._wave_buffer = np.empty(shape)
+        self._fraction_buffer = np.empty(shape)
+        self._delta = np.empty((self.n_voices, 1))
+        self._mix_buffer = np.empty(n_samples)
+        self._output_buffer = np.empty(n_samples, dtype=np.float32)
+
+
+    def _smooth(self, current: np.ndarray, target: np.ndarray, decay: np.ndarray, out: np.ndarray) -> None:
+        """
+        Per-sample exponential smoothing of every voice (see audio.dsp.smooth_towards), current values being updated in place
+        """
+        np.subtract(current, target, out=self._delta[:, 0])
+        np.multiply(decay, self._delta, out=out)
+        out += target[:, None]
+        current[:] = out[:, -1]
+
+
+    def render(self, n_samples: Optional[int] = None) -> np.ndarray:
+        """
+        Overrides audio.SinewaveGenerator.render
+        Renders the next samples of the mix of all the voices
+
+
+        Parameters:
+        ---
+        n_samples: int, default=None
+            Number of samples to render. buffer_size if None
+
+
+        Returns:
+        ---
+        samples: np.ndarray
+            float32 samples. The array is a persistent buffer overwritten at the next call
+        """
+        n_samples = n_samples or self.buffer_size
+        if n_samples != self._output_buffer.size:
+            self._allocate_buffers(n_samples)
+
+        self._smooth(self.frequencies, self.targets['frequency'], self._frequency_decay, self._frequency_buffer)
+        self._smooth(self.amplitudes, self.targets['amplitude'], self._amplitude_decay, self._amplitude_buffer)
+
+        # Phase accumulator, in wavetable samples
+        phase = self._phase_buffer
+        np.cumsum(self._frequency_buffer, axis=1, out=phase)
+        phase *= self.table.size / self.sample_rate
+        phase += self.phases[:, None]
+        np.mod(phase[:, -1], self.table.size, out=self.phases)
+
+        # Wavetable lookup with linear interpolation, indices being wrapped with a bit mask
+        np.floor(phase, out=self._fraction_buffer)
+        index = self._index_buffer
+        np.copyto(index, self._fraction_buffer, casting='unsafe')
+        np.subtract(phase, self._fraction_buffer, out=self._fraction_buffer)
+        np.bitwise_and(index, self.table_mask, out=index)
+        np.take(self.table_diff, index, out=self._wave_buffer)
+        self._wave_buffer *= self._fraction_buffer
+        # The fractions aren't needed anymore, their buffer receives the table values
+        np.take(self.table, index, out=self._fraction_buffer)
+        self._wave_buffer += self._fraction_buffer
+
+        # Mix: sum over the voices of wave * amplitude
+        np.einsum('vs,vs->s', self._wave_buffer, self._amplitude_buffer, out=self._mix_buffer)
+        np.multiply(self._mix_buffer, self.gain, out=self._output_buffer, casting='same_kind')
+        self.samples_rendered += n_samples
+        return self._output_buffer
+
+
+    def _resolve_route(self, route: str) -> Optional[tuple]:
+        """
+        (param, first voice) driven by a route, or None if the route doesn't drive any voice
+        """
+        if route in self.voice_map:
+            return self.voice_map[route]
+        name, _, voice = route.rpartition('_')
+        if name in self.PARAMS and voice.isdigit() and int(voice) < self.n_voices:
+            return name, int(voice)
+        if route in self.PARAMS:
+            return route, 0
+        if route == 'volume':
+            return 'amplitude', 0
+        return None
+
+
+    def _set_targets(self, data) -> None:
+        """
+        Overrides audio.SinewaveGenerator._set_targets
+        Updates the targets of the voices driven by the routes of the audio parameters
+        """
+        if not data:
+            return
+        if type(data) != dict:
+            raise TypeError('Oscillator bank expects dict type with format Dict[str, float or list]')
+        for route, value in data.items():
+            resolved = self._resolve_route(route)
+            if resolved is None:
+                if route not in self._ignored_routes:
+                    self._ignored_routes.add(route)
+                    logger.warning(f'Route {route} does not drive any voice of the oscillator bank, it is ignored')
+                continue
+            param, voice = resolved
+            values = np.ravel(np.asarray(value, dtype=np.float64))[:self.n_voices - voice]
+            if param == 'amplitude':
+                values = np.clip(values, 0., 1.)
+            self.targets[param][voice:voice + values.size] = values
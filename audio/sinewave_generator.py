@@ -1,16 +1,286 @@
+import time
+import wave
+import logging
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
 from .audio_generator import AudioGenerator
-import pyaudio
+from .dsp import smoothing_decay, smooth_towards, accumulate_phase
+
+# pyaudio is only required by the pyaudio backend
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None
+
+logger = logging.getLogger(__name__)
+
 
 class SinewaveGenerator(AudioGenerator):
+    """
+    Generates a sinewave in-process, whose frequency and volume are driven by the audio parameters { 'frequency': Hz, 'volume': 0-1 }
+    (e.g output by feature_mapper.PinchGestureMapper). Unlike audio.OSCGenerator, no external program is required to output sound.
+
+    Samples are rendered buffer by buffer with vectorized operations and no per-buffer allocation:
+    + the phase is integrated sample by sample (phase accumulator), so that it stays continuous across buffers and frequency changes
+    + frequency and volume are smoothed towards their targets at every sample (closed-form one-pole smoothing), preventing zipper noise
+
+    Two backends are available:
+    + pyaudio: samples are rendered in the callback of a pyaudio output stream
+    + wav: samples are rendered at the pace of the system clock and written to a WAV file while the pipeline runs,
+      recording what the sound card would have played, without a sound card
+
+    The thread of the module only waits for new audio parameters and updates the targets read by the renderer.
+
+    To test and benchmark the generator without pipeline nor clock, `render_to_wav` renders a given duration offline,
+    faster than real time, with an optional automation of the audio parameters.
+    """
+
+    BACKENDS = ('pyaudio', 'wav')
+
+    def __init__(self, backend: str = 'pyaudio', sample_rate: int = 44100, buffer_size: int = 256,
+                 frequency: float = 440., volume: float = 0., frequency_smoothing: float = 20., volume_smoothing: float = 10.,
+                 output_path: str = 'sinewave.wav'):
+        """
+        Initializes the SinewaveGenerator.
+
+
+        Parameters:
+        ---
+        backend: str, default='pyaudio'
+            Either 'pyaudio' (sound card output) or 'wav' (real-time recording to output_path, see `render_to_wav` for offline rendering)
+
+        sample_rate: int, default=44100
+            Sampling rate in Hz
+
+        buffer_size: int, default=256
+            Number of samples rendered at once. Smaller buffers reduce the latency, at the cost of more frequent callbacks
+
+        frequency: float, default=440.
+            Initial frequency in Hz
+
+        volume: float, default=0.
+            Initial volume, between 0 and 1
+
+        frequency_smoothing: float, default=20.
+            Time constant of the frequency smoothing in milliseconds. Disabled if 0
+
+        volume_smoothing: float, default=10.
+            Time constant of the volume smoothing in milliseconds. Disabled if 0
+
+        output_path: str, default='sinewave.wav'
+            Path of the rendered file (wav backend only)
+        """
+        super().__init__()
+        if backend not in self.BACKENDS:
+            raise ValueError(f'Unknown backend {backend}. Available backends: {self.BACKENDS}')
+        if backend == 'pyaudio' and pyaudio is None:
+            raise ImportError('pyaudio is required by the pyaudio backend of SinewaveGenerator (use backend: wav to render to a file)')
+
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.buffer_size = buffer_size
+        self.frequency_smoothing = frequency_smoothing
+        self.volume_smoothing = volume_smoothing
+        self.output_path = output_path
+
+        # Current values (at the last rendered sample) and targets
+        self.frequency = self.target_frequency = float(frequency)
+        self.volume = self.target_volume = float(volume)
+        self.phase = 0.
+
+        self._allocate_buffers(buffer_size)
+        self.samples_rendered = 0
+        self._pyaudio = None
+        self._stream = None
+        self._wav = None
+        self._start_time = None
+        logger.info(f'Sinewave generator initialized ({backend} backend, {sample_rate}Hz, {buffer_size} samples per buffer)')
+
+
+    def _allocate_buffers(self, n_samples: int) -> None:
+        """
+        Allocates the rendering buffers for a given buffer size
+        """
+        self._frequency_decay = smoothing_decay(self.frequency_smoothing, self.sample_rate, n_samples)
+        self._volume_decay = smoothing_decay(self.volume_smoothing, self.sample_rate, n_samples)
+        self._frequency_buffer = np.empty(n_samples)
+        self._volume_buffer = np.empty(n_samples)
+        self._phase_buffer = np.empty(n_samples)
+        self._output_buffer = np.empty(n_samples, dtype=np.float32)
+
+
+    def render(self, n_samples: Optional[int] = None) -> np.ndarray:
+        """
+        Renders the next samples of the sinewave
+
+
+        Parameters:
+        ---
+        n_samples: int, default=None
+            Number of samples to render. buffer_size if None
+
+
+        Returns:
+        ---
+        samples: np.ndarray
+            float32 samples between -1 and 1. The array is a persistent buffer overwritten at the next call
+        """
+        n_samples = n_samples or self.buffer_size
+        if n_samples != self._output_buffer.size:
+            self._allocate_buffers(n_samples)
+
+        self.frequency = smooth_towards(self.frequency, self.target_frequency, self._frequency_decay, self._frequency_buffer)
+        self.volume = smooth_towards(self.volume, self.target_volume, self._volume_decay, self._volume_buffer)
+        self.phase = accumulate_phase(self.phase, self._frequency_buffer, self.sample_rate, self._phase_buffer)
+
+        np.sin(self._phase_buffer, out=self._phase_buffer)
+        np.multiply(self._phase_buffer, self._volume_buffer, out=self._output_buffer, casting='same_kind')
+        self.samples_rendered += n_samples
+        return self._output_buffer
+
+
+    def _set_targets(self, data) -> None:
+        """
+        Updates the targets of the renderer from audio parameters
+        """
+        if not data:
+            return
+        if type(data) != dict:
+            raise TypeError('Sinewave generator expects dict type with format { "frequency": float, "volume": float }')
+        if 'frequency' in data:
+            self.target_frequency = float(data['frequency'])
+        if 'volume' in data:
+            self.target_volume = float(np.clip(data['volume'], 0., 1.))
+
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        """
+        pyaudio stream callback, called by the audio thread of portaudio whenever a buffer must be output
+        """
+        return self.render(frame_count).tobytes(), pyaudio.paContinue
+
+
+    def _open_backend(self) -> None:
+        """
+        Opens the pyaudio output stream or the WAV file
+        """
+        if self.backend == 'pyaudio':
+            self._pyaudio = pyaudio.PyAudio()
+            self._stream = self._pyaudio.open(
+                format=pyaudio.paFloat32,
+                channels=1,
+                rate=self.sample_rate,
+                output=True,
+                frames_per_buffer=self.buffer_size,
+                stream_callback=self._callback
+            )
+        else:
+            self._wav = self._open_wav(self.output_path)
+            self._start_time = time.perf_counter()
+
+
+    def _open_wav(self, path: str) -> wave.Wave_write:
+        """
+        Opens a mono 16 bits WAV file at the sampling rate of the generator
+        """
+        wav = wave.open(path, 'wb')
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(self.sample_rate)
+        return wav
+
+
+    @staticmethod
+    def _write_wav(wav: wave.Wave_write, samples: np.ndarray) -> None:
+        """
+        Writes float samples between -1 and 1 as 16 bits integers
+        """
+        wav.writeframes((samples * 32767).astype(np.int16).tobytes())
+
+
+    def _render_to_wav(self) -> None:
+        """
+        Renders and writes as many buffers as elapsed since the start of the module, so that the file follows the timing of the parameters
+        """
+        due_samples = (time.perf_counter() - self._start_time) * self.sample_rate
+        while self.samples_rendered + self.buffer_size <= due_samples:
+            self._write_wav(self._wav, self.render())
+
+
+    def render_to_wav(self, path: str, duration: float, automation: Optional[Iterable[Tuple[float, dict]]] = None) -> None:
+        """
+        Renders a given duration of audio to a WAV file offline, as fast as possible: no clock, thread nor backend is involved.
+        The module doesn't need to be started, and rendering resumes from the current state of the generator
+
+
+        Parameters:
+        ---
+        path: str, required
+            Path of the rendered file
+
+        duration: float, required
+            Duration of the rendered audio, in seconds
+
+        automation: iterable, default=None
+            (time in seconds, audio parameters) pairs, e.g [(0., { 'volume': 0.5 }), (1.5, { 'frequency': 880. })].
+            The parameters are applied once rendering reaches their time, at the start of the buffer containing it
+        """
+        events = sorted(automation or [], key=lambda event: event[0])
+        n_samples = int(round(duration * self.sample_rate))
+        rendered = 0
+        next_event = 0
+        start = time.perf_counter()
+        wav = self._open_wav(path)
+        try:
+            while rendered < n_samples:
+                while next_event < len(events) and events[next_event][0] * self.sample_rate <= rendered:
+                    self._set_targets(events[next_event][1])
+                    next_event += 1
+                # The last buffer is rendered entirely, so that the buffers aren't reallocated for a smaller size
+                samples = self.render()[:n_samples - rendered]
+                self._write_wav(wav, samples)
+                rendered += samples.size
+        finally:
+            wav.close()
+        elapsed = time.perf_counter() - start
+        logger.info(f'Rendered {duration:.2f}s of audio to {path} in {elapsed:.2f}s ({duration / max(elapsed, 1e-9):.0f}x real time)')
+
+
+    def output_audio(self) -> None:
+        """
+        Waits for new audio parameters and updates the targets of the renderer
+        With the wav backend, buffers are also rendered here, at least once per buffer duration
+        """
+        timeout = self.buffer_size / self.sample_rate if self.backend == 'wav' else None
+        if self.wait_for_data(timeout):
+            data, trace = self._take_data()
+            self._set_targets(data)
+            self._record_dispatch(trace)
+        if self._wav is not None:
+            self._render_to_wav()
 
-    def __init__(self):
-        raise NotImplementedError('Sinewave generator not implemented yet')
 
-    def output_audio(self):
-        raise NotImplementedError('Sinewave generator not implemented yet')
+    def run(self):
+        """
+        Overrides audio.AudioGenerator.run
+        Opens the backend before entering the main loop
+        """
+        self._open_backend()
+        super().run()
 
-    def cleanup(self):
-        raise NotImplementedError('Sinewave generator not implemented yet')
 
-    def generate_sinewave(self):
-        raise NotImplementedError('Sinewave generator not implemented yet')
+    def cleanup(self) -> None:
+        """
+        Closes the stream or the WAV file, once the main loop ended (see: function`audio.AudioGenerator.stop`)
+        """
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._pyaudio.terminate()
+            self._stream = None
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+            logger.info(f'Rendered {self.samples_rendered / self.sample_rate:.2f}s of audio to {self.output_path}')
@@ -0,0 +1,88 @@
+"""
+Benchmark of the Flircam acquisition path against the simulated PySpin module (see video.simulated_pyspin), without camera nor SDK.
+For every output mode, it measures the time spent in `read_frame_into` besides waiting for the camera (conversion and copy),
+and checks that every camera buffer was released and that the delivered frames match the camera images.
+The simulated camera is paced at the configured framerate, so that the achieved framerate shows whether acquisition keeps up.
+
+Usage (from the root directory of the project):
+    python -m benchmarks.bench_flircam --duration 2 --height 270 --binning 1
+"""
+import time
+import argparse
+
+import numpy as np
+
+from video import simulated_pyspin
+simulated_pyspin.install()
+from video.flircam import Flircam
+
+
+def run(output: str, duration: float, **params) -> dict:
+    """
+    Grabs frames for the given duration with the given output mode and returns the acquisition statistics
+    """
+    cam = Flircam(output=output, **params)
+    frame = cam.read_frame()
+    out = np.empty_like(frame)
+    overheads = []
+    frame_ids = []
+    ready = []
+
+    # The simulated camera sleeps until the frame is due: only the time spent once the image is available is measured
+    get_next_image = cam.cam.GetNextImage
+    def timed_get_next_image(*args):
+        image = get_next_image(*args)
+        ready.append(time.perf_counter())
+        frame_ids.append(cam.cam.last_frame_id)
+        return image
+    cam.cam.GetNextImage = timed_get_next_image
+
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        if cam.read_frame_into(out):
+            overheads.append(time.perf_counter() - ready[-1])
+    elapsed = time.perf_counter() - start
+
+    # The last delivered frame must hold the camera image, not the recycled buffer
+    expected = np.empty(out.shape[:2], dtype=np.uint8)
+    cam.cam._render(frame_ids[-1], expected)
+    if output == 'bgr':
+        expected = simulated_pyspin.ImageProcessor().Convert(simulated_pyspin.Image(expected, simulated_pyspin.PixelFormat_BayerRG8), simulated_pyspin.PixelFormat_BGR8).GetNDArray()
+    valid = np.array_equal(out, expected)
+    outstanding = cam.cam.images_outstanding
+    frame_rate = cam.cam.AcquisitionFrameRate.GetValue()
+    roi = cam.roi
+    cam.cleanup()
+
+    overheads = np.array(overheads) * 1e6
+    return {
+        'shape': out.shape,
+        'roi': roi,
+        'camera_fps': frame_rate,
+        'fps': len(overheads) / elapsed,
+        'skipped': int(np.sum(np.diff(frame_ids) - 1)),
+        'overhead_p50': float(np.percentile(overheads, 50)),
+        'overhead_p99': float(np.percentile(overheads, 99)),
+        'valid': valid and outstanding == 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=2., help='Acquisition duration per output mode in seconds')
+    parser.add_argument('--outputs', type=str, nargs='+', default=['bgr', 'raw', 'mono'], help='Output modes to benchmark')
+    parser.add_argument('--width', type=int, default=None, help='Width of the region of interest')
+    parser.add_argument('--height', type=int, default=None, help='Height of the region of interest')
+    parser.add_argument('--binning', type=int, default=1, help='Binning factor')
+    parser.add_argument('--frame-rate', type=float, default=None, help='Acquisition framerate (maximum if not set)')
+    args = parser.parse_args()
+
+    print(f'{"output":<8}{"shape":<16}{"roi":<24}{"camera fps":>12}{"fps":>10}{"skipped":>10}{"p50 (us)":>11}{"p99 (us)":>11}{"valid":>8}')
+    for output in args.outputs:
+        result = run(output, args.duration, width=args.width, height=args.height, binning=args.binning, frame_rate=args.frame_rate)
+        print(f'{output:<8}{str(result["shape"]):<16}{str(result["roi"]):<24}{result["camera_fps"]:>12.1f}{result["fps"]:>10.1f}'
+              f'{result["skipped"]:>10}{result["overhead_p50"]:>11.1f}{result["overhead_p99"]:>11.1f}{str(result["valid"]):>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Micro-benchmark of the FrameDiffCalculator feature extractor.
+It compares the per-frame cost of the current implementation (with several decimation factors) with the original one,
+which copied the full BGR frame and converted both frames to grayscale at every call.
+
+Usage (from the root directory of the project):
+    python -m benchmarks.bench_frame_diff --resolution 720x540 --frames 2000
+"""
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+from feature_extractor import FrameDiffCalculator
+
+
+class LegacyFrameDiffCalculator:
+    """
+    Original implementation of FrameDiffCalculator.process, kept as the reference of the benchmark
+    """
+    def __init__(self):
+        self.previous_frame = None
+
+    def process(self, current_frame: np.ndarray) -> float:
+        mean_diff = None
+        frame_diff = np.zeros(current_frame.shape[:-1])
+        if self.previous_frame is not None:
+            previous_gray = cv2.cvtColor(self.previous_frame, cv2.COLOR_BGR2GRAY)
+            current_gray = cv2.cvtColor(current_frame, cv2.COLOR_BGR2GRAY)
+            frame_diff = cv2.absdiff(current_gray, previous_gray)
+            mean_diff = np.mean(frame_diff)
+        self.previous_frame = current_frame.copy()
+        return mean_diff
+
+
+def make_frames(width: int, height: int, n: int = 8, seed: int = 0) -> list:
+    """
+    Synthetic BGR frames with random noise, so that every difference is non trivial
+    """
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def time_per_frame(process, frames: list, n_frames: int) -> np.ndarray:
+    """
+    Calls process on n_frames frames (cycling through the synthetic ones) and returns the duration of each call in microseconds
+    """
+    durations = np.empty(n_frames)
+    for i in range(n_frames):
+        frame = frames[i % len(frames)]
+        start = time.perf_counter()
+        process(frame)
+        durations[i] = time.perf_counter() - start
+    return durations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--resolution', type=str, default='720x540', help='Frame resolution WIDTHxHEIGHT (default: Blackfly S BFS-U3-04S2C)')
+    parser.add_argument('--frames', type=int, default=2000, help='Number of processed frames per implementation')
+    args = parser.parse_args()
+
+    width, height = map(int, args.resolution.split('x'))
+    frames = make_frames(width, height)
+    implementations = {
+        'legacy': LegacyFrameDiffCalculator(),
+        'current (decimation=1)': FrameDiffCalculator(),
+        'current (decimation=2)': FrameDiffCalculator(decimation=2),
+        'current (decimation=4)': FrameDiffCalculator(decimation=4),
+    }
+
+    # Both implementations must agree without decimation
+    legacy, current = LegacyFrameDiffCalculator(), FrameDiffCalculator()
+    for frame in frames:
+        expected, value = legacy.process(frame), current.process(frame)
+        assert (expected is None and value is None) or abs(expected - value) < 1e-9, (expected, value)
+
+    print(f'FrameDiffCalculator, {width}x{height}, {args.frames} frames')
+    print(f'{"implementation":<26}{"mean (us)":>12}{"p50 (us)":>12}{"p99 (us)":>12}{"max fps":>12}')
+    reference = None
+    for name, extractor in implementations.items():
+        durations = time_per_frame(extractor.process, frames, args.frames)
+        mean = durations.mean()
+        reference = reference or mean
+        print(f'{name:<26}{mean:>12.1f}{np.percentile(durations, 50):>12.1f}{np.percentile(durations, 99):>12.1f}{1e6 / mean:>12.0f}'
+              f'   x{reference / mean:.2f}')
+
+
+if __name__ == '__main__':
+    main()
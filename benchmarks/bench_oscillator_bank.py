@@ -0,0 +1,63 @@
+"""
+Benchmark of the OscillatorBankGenerator renderer.
+For several buffer sizes, it measures the rendering time of one buffer with an increasing number of voices,
+and reports how many voices fit in real time, i.e when rendering a buffer takes less time than playing it.
+Rendering is single threaded, hence results are given for one core.
+
+Usage (from the root directory of the project):
+    python -m benchmarks.bench_oscillator_bank --sample-rate 48000 --buffer-sizes 64 256
+"""
+import time
+import argparse
+
+import numpy as np
+
+from audio import OscillatorBankGenerator
+
+
+def time_per_buffer(generator: OscillatorBankGenerator, n_buffers: int) -> np.ndarray:
+    """
+    Renders n_buffers buffers and returns the duration of each one in microseconds
+    """
+    durations = np.empty(n_buffers)
+    rng = np.random.default_rng(0)
+    for i in range(n_buffers):
+        # Targets change regularly, like with a mapper running at 100+fps
+        if i % 8 == 0:
+            generator.targets['frequency'][:] = rng.uniform(100, 2000, generator.n_voices)
+        start = time.perf_counter()
+        generator.render()
+        durations[i] = time.perf_counter() - start
+    return durations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sample-rate', type=int, default=48000, help='Sampling rate in Hz')
+    parser.add_argument('--buffer-sizes', type=int, nargs='+', default=[64, 256], help='Buffer sizes in samples')
+    parser.add_argument('--max-voices', type=int, default=4096, help='Maximum number of voices (powers of 2 are tested up to this one)')
+    parser.add_argument('--buffers', type=int, default=500, help='Number of rendered buffers per configuration')
+    parser.add_argument('--waveform', type=str, default='saw', help='Waveform of the wavetable')
+    args = parser.parse_args()
+
+    voice_counts = [2 ** i for i in range(int(np.log2(args.max_voices)) + 1)]
+    for buffer_size in args.buffer_sizes:
+        budget = 1e6 * buffer_size / args.sample_rate
+        print(f'\nOscillator bank, {args.sample_rate}Hz, {buffer_size} samples per buffer (real time budget: {budget:.0f} us)')
+        print(f'{"voices":>8}{"mean (us)":>12}{"p99 (us)":>12}{"load (p99)":>12}')
+        max_voices = 0
+        for n_voices in voice_counts:
+            generator = OscillatorBankGenerator(n_voices=n_voices, waveform=args.waveform, amplitudes=0.5, backend='wav',
+                                                sample_rate=args.sample_rate, buffer_size=buffer_size)
+            generator.render()
+            durations = time_per_buffer(generator, args.buffers)
+            p99 = np.percentile(durations, 99)
+            print(f'{n_voices:>8}{durations.mean():>12.1f}{p99:>12.1f}{100 * p99 / budget:>11.0f}%')
+            if p99 >= budget:
+                break
+            max_voices = n_voices
+        print(f'Voices fitting in real time (p99 rendering time below the budget): {max_voices}')
+
+
+if __name__ == '__main__':
+    main()
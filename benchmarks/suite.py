@@ -0,0 +1,283 @@
+"""
+Benchmark suite of the hot path of the pipeline: feature extractors, mappers and audio generators.
+Every case is run on synthetic inputs (or frames of a recorded video with --video) at several resolutions,
+and per-call latency distributions and throughput are reported. Results can be written to a JSON file,
+and compared with a previous JSON file used as a baseline: cases whose latency grew beyond the threshold are reported as regressions
+(and the exit code is 1).
+
+Landmarker cases are skipped if the model files aren't available.
+
+Usage (from the root directory of the project):
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --baseline results.json --threshold 0.15
+    python -m benchmarks.suite --filter extractor/FrameDiff --resolutions 720x540 --video recording.mp4
+"""
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import platform
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from feature_extractor import FrameDiffCalculator, MotionGridExtractor, MotionGatedExtractor, LandmarkResult
+from feature_mapper import PinchGestureMapper, BarycenterMapper, PulseMapper
+from audio import OSCGenerator, SinewaveGenerator, OscillatorBankGenerator
+from utils.mediapipe import resolve_model_path
+from utils import registry
+
+# A case factory builds the objects under test and returns the function to time, called with the index of the iteration,
+# and the function releasing the resources of the case (sockets, files, processes) once it's timed, or None
+CaseFactory = Callable[[], Tuple[Callable[[int], object], Optional[Callable[[], None]]]]
+
+DEFAULT_RESOLUTIONS = ['320x240', '720x540', '1280x720']
+METRICS = ('mean', 'p50', 'p95', 'p99', 'max')
+
+
+def synthetic_frames(width: int, height: int, n: int = 16, seed: int = 0) -> List[np.ndarray]:
+    """
+    BGR frames made of a fixed noisy background and a bright square moving across it, so that motion is localized like with a real scene
+    """
+    rng = np.random.default_rng(seed)
+    background = rng.integers(0, 64, (height, width, 3), dtype=np.uint8)
+    side = max(4, min(width, height) // 6)
+    frames = []
+    for i in range(n):
+        frame = background.copy()
+        x = (i * (width - side)) // max(n - 1, 1)
+        y = (height - side) // 2
+        frame[y:y + side, x:x + side] = 220
+        frames.append(frame)
+    return frames
+
+
+def recorded_frames(path: str, width: int, height: int, n: int = 64) -> List[np.ndarray]:
+    """
+    First n frames of a video file, resized to the benchmarked resolution
+    """
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < n:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA))
+    cap.release()
+    if not frames:
+        raise ValueError(f'No frame could be read from {path}')
+    return frames
+
+
+def synthetic_landmarks(n: int = 64, seed: int = 0) -> List[LandmarkResult]:
+    """
+    Results of two hands (a left one and a right one, pinching every other frame) with random landmarks
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for i in range(n):
+        landmarks = rng.uniform(0.2, 0.8, (2, 21, 3)).astype(np.float32)
+        if i % 2:
+            landmarks[1, 4] = landmarks[1, 8] + 0.01
+        results.append(LandmarkResult(landmarks, handedness=np.array([LandmarkResult.LEFT, LandmarkResult.RIGHT], dtype=np.int8)))
+    return results
+
+
+def extractor_cases(resolutions: List[str], video: Optional[str] = None) -> Dict[str, CaseFactory]:
+    """
+    Feature extractor cases, for every resolution
+    """
+    models_available = True
+    try:
+        resolve_model_path('hand_landmarker.task')
+    except FileNotFoundError:
+        models_available = False
+
+    extractors = {
+        'FrameDiffCalculator': lambda: FrameDiffCalculator(),
+        'FrameDiffCalculator(decimation=4)': lambda: FrameDiffCalculator(decimation=4),
+        'MotionGridExtractor(4x4)': lambda: MotionGridExtractor(rows=4, cols=4),
+        'MotionGridExtractor(zones)': lambda: MotionGridExtractor(zones={
+            'left': [[0, 0], [0.5, 0], [0.5, 1], [0, 1]],
+            'center': [[0.25, 0.25], [0.75, 0.25], [0.75, 0.75], [0.25, 0.75]],
+            'right': [[0.5, 0], [1, 0], [1, 1], [0.5, 1]],
+        }),
+        'MotionGatedExtractor(FrameDiffCalculator)': lambda: MotionGatedExtractor('FrameDiffCalculator'),
+    }
+    if models_available:
+        extractors['HandLandmarker'] = lambda: registry.resolve('HandLandmarker')(output_format='array')
+        extractors['HandLandmarker(video)'] = lambda: registry.resolve('HandLandmarker')(running_mode='video', output_format='array')
+
+    cases = {}
+    for resolution in resolutions:
+        width, height = map(int, resolution.split('x'))
+        for name, create in extractors.items():
+            def factory(create=create, width=width, height=height):
+                frames = recorded_frames(video, width, height) if video else synthetic_frames(width, height)
+                extractor = create()
+                return lambda i: extractor.process(frames[i % len(frames)], time.perf_counter()), extractor.close
+            cases[f'extractor/{name}/{resolution}'] = factory
+    return cases
+
+
+def mapper_cases() -> Dict[str, CaseFactory]:
+    """
+    Feature mapper cases, fed with the kind of features they expect
+    """
+    def landmark_mapper(mapper_class):
+        def factory():
+            landmarks = synthetic_landmarks()
+            mapper = mapper_class()
+            return lambda i: mapper.process_features(landmarks[i % len(landmarks)]), None
+        return factory
+
+    def pulse_factory():
+        values = np.random.default_rng(0).uniform(0, 3, 64).tolist()
+        mapper = PulseMapper(threshold=1.25, cooldown=0)
+        return lambda i: mapper.process_features(values[i % len(values)]), None
+
+    return {
+        'mapper/PinchGestureMapper': landmark_mapper(PinchGestureMapper),
+        'mapper/BarycenterMapper': landmark_mapper(BarycenterMapper),
+        'mapper/PulseMapper': pulse_factory,
+    }
+
+
+def audio_cases() -> Dict[str, CaseFactory]:
+    """
+    Audio generator cases. The main loop iteration (`output_audio`) of the OSC generator is timed with new parameters at every call,
+    and the rendering of one buffer for the in-process generators
+    """
+    def osc_factory(**params):
+        def factory():
+            # Local receiver, never read: datagrams are dropped once its buffer is full
+            receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            receiver.bind(('127.0.0.1', 0))
+            generator = OSCGenerator(port=receiver.getsockname()[1], keepalive=None, **params)
+            def run(i):
+                generator.send({'frequency': 440. + i % 100, 'volume': (i % 10) / 10, 'pulse': i % 2})
+                generator.output_audio()
+            def cleanup():
+                generator.cleanup()
+                receiver.close()
+            return run, cleanup
+        return factory
+
+    def render_factory(generator_class, **params):
+        def factory():
+            generator = generator_class(backend='wav', sample_rate=48000, buffer_size=256, **params)
+            return lambda i: generator.render(), None
+        return factory
+
+    return {
+        'audio/OSCGenerator': osc_factory(),
+        'audio/OSCGenerator(bundle)': osc_factory(bundle=True),
+        'audio/SinewaveGenerator(256 samples)': render_factory(SinewaveGenerator, volume=0.5),
+        'audio/OscillatorBankGenerator(16 voices, 256 samples)': render_factory(OscillatorBankGenerator, n_voices=16, amplitudes=0.5),
+    }
+
+
+def time_case(factory: CaseFactory, iterations: int, warmup: int) -> dict:
+    """
+    Runs a case and returns its latency distribution in microseconds and its throughput in calls per second
+    """
+    run, cleanup = factory()
+    try:
+        for i in range(warmup):
+            run(i)
+        durations = np.empty(iterations)
+        for i in range(iterations):
+            start = time.perf_counter()
+            run(i)
+            durations[i] = time.perf_counter() - start
+    finally:
+        if cleanup is not None:
+            cleanup()
+    durations *= 1e6
+    return {
+        'iterations': iterations,
+        'mean': float(durations.mean()),
+        'p50': float(np.percentile(durations, 50)),
+        'p95': float(np.percentile(durations, 95)),
+        'p99': float(np.percentile(durations, 99)),
+        'max': float(durations.max()),
+        'throughput': float(1e6 / durations.mean()),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float, metric: str) -> List[str]:
+    """
+    Prints the comparison of the results with a baseline and returns the names of the regressed cases
+    """
+    regressions = []
+    print(f'\nComparison with the baseline ({metric}, regression threshold +{100 * threshold:.0f}%)')
+    print(f'{"case":<66}{"baseline (us)":>15}{"current (us)":>15}{"change":>10}')
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f'{name:<66}{"-":>15}{result[metric]:>15.1f}{"new":>10}')
+            continue
+        change = result[metric] / reference[metric] - 1
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f'{name:<66}{reference[metric]:>15.1f}{result[metric]:>15.1f}{100 * change:>+9.1f}%{flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--resolutions', type=str, nargs='+', default=DEFAULT_RESOLUTIONS, help='Frame resolutions WIDTHxHEIGHT of the extractor cases')
+    parser.add_argument('--video', type=str, default=None, help='Video file whose frames are used instead of synthetic ones')
+    parser.add_argument('--iterations', type=int, default=500, help='Number of timed calls per case')
+    parser.add_argument('--warmup', type=int, default=20, help='Number of untimed calls before timing a case')
+    parser.add_argument('--filter', type=str, default=None, help='Only run cases whose name contains this string')
+    parser.add_argument('--output', type=str, default=None, help='JSON file the results are written to')
+    parser.add_argument('--baseline', type=str, default=None, help='JSON file of previous results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Relative latency increase considered as a regression (0.2 = +20%%)')
+    parser.add_argument('--metric', type=str, default='p50', choices=METRICS, help='Latency metric compared with the baseline')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    cases = {**extractor_cases(args.resolutions, args.video), **mapper_cases(), **audio_cases()}
+    if args.filter:
+        cases = {name: factory for name, factory in cases.items() if args.filter in name}
+
+    results = {}
+    print(f'{"case":<66}{"mean (us)":>12}{"p50 (us)":>12}{"p99 (us)":>12}{"calls/s":>12}')
+    for name, factory in cases.items():
+        result = results[name] = time_case(factory, args.iterations, args.warmup)
+        print(f'{name:<66}{result["mean"]:>12.1f}{result["p50"]:>12.1f}{result["p99"]:>12.1f}{result["throughput"]:>12.0f}')
+
+    if args.output:
+        report = {
+            'metadata': {
+                'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'platform': platform.platform(),
+                'processor': platform.processor(),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'opencv': cv2.__version__,
+                'video': args.video,
+            },
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nResults written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold, args.metric)
+        if regressions:
+            print(f'\n{len(regressions)} regression(s): {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,12 @@
-from .display import Display
+from .null_display import NullDisplay
 
-__all__ = ['Display']
+
+def __getattr__(name):
+    # Display is imported on first access only, so that headless runs never load the GUI dependencies
+    if name == 'Display':
+        from .display import Display
+        return Display
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+__all__ = ['Display', 'NullDisplay']
@@ -2,12 +2,9 @@ import logging
 
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
 
-import mediapipe as mp
-from mediapipe.python.solutions.drawing_utils import DrawingSpec
-
-from threading import Thread, Event, Lock
+from threading import Thread, Event, Lock, Condition
+from typing import Optional
 import time
 
 
@@ -17,13 +14,17 @@ class Display(Thread):
     """
     Display module providing a feedback of the video_input or any processed version of this input (it doesn't have to be the raw frame)
 
-    To avoid any drop in performance, the module runs its own thread, and the image to be displayed is stored in the _frame variable.
-    A setter and a getter are defined to preven from accessing this variable directly, hence avoiding concurrent access.
+    To avoid any drop in performance, the module runs its own thread and the pipeline only publishes frames through the `frame` setter.
+    Publishing a frame costs a single copy into a reused buffer, and only happens when the preview is due (the preview fps is capped by `max_fps`,
+    independently of the capture fps). Frames published while the display thread reads the previous one are dropped from the preview.
+    The display thread sleeps until a new frame is published, then resizes it into a reused working buffer, to which components are applied in place.
+    Single channel frames (e.g the 'mono' and 'raw' outputs of video.Flircam) are converted to BGR by the display thread,
+    as grayscale or, with `bayer=True`, demosaiced from a Bayer RG mosaic before being resized.
 
     A system of *components* allows to add some predefined features to the display, like an FPS counter or any other relevant information.
     """
 
-    def __init__(self, width=800, height=600, display_name='Display'):
+    def __init__(self, width=800, height=600, display_name='Display', max_fps: Optional[float] = 30, bayer: bool = False):
         """
         Initializes the Display module.
 
@@ -38,15 +39,35 @@ class Display(Thread):
 
         display_name: str, default='Display'
             The name of the display window.
+
+        max_fps: float, default=30
+            Maximum refresh rate of the preview. Every published frame is displayed if None
+
+        bayer: bool, default=False
+            Whether single channel frames are Bayer RG mosaics (video.Flircam 'raw' output) rather than grayscale images
         """
         super().__init__()
         self.display_name = display_name
-        self._frame = np.zeros((width, height, 3))
         self.components = []
         self.stop_event = Event()
         self.lock = Lock()
+        self._new_frame = Condition(self.lock)
         self.width = width
         self.height = height
+        self.min_interval = 1 / max_fps if max_fps else 0.
+        self.bayer = bayer
+
+        # Copy of the last published frame (input resolution), and working buffer at the display resolution
+        self._pending: Optional[np.ndarray] = None
+        self._has_new_frame = False
+        self._reading_pending = False
+        self._frame = np.zeros((height, width, 3), dtype=np.uint8)
+        # Conversion buffers of single channel frames: grayscale at the display resolution, demosaiced at the input resolution
+        self._gray = np.empty((height, width), dtype=np.uint8)
+        self._color: Optional[np.ndarray] = None
+        self.last_publish_time = 0.
+        self.frames_displayed = 0
+
         self.frame_count = 0
         self.fps = 0
         self.last_fps_update = time.time() # required for the fps_counter component
@@ -58,6 +79,8 @@ class Display(Thread):
         """
         Getter for the _frame attribute
         Prevents from concurrent access with a mutex
+
+        Returns a copy of the last displayed frame (components included)
         """
         with self.lock:
             return self._frame.copy()
@@ -69,18 +92,27 @@ class Display(Thread):
         Setter for the _frame attribute
         Prevents from concurrent access with a mutex
 
-        To ensure that the framerate accurately reflects the input video stream's framerate, it's computed every time the setter is called
+        To ensure that the framerate accurately reflects the input video stream's framerate, it's computed every time the setter is called.
+        The frame is only copied if the preview is due and the display thread isn't reading the previous one, resizing is left to the display thread.
         """
+        current_time = time.time()
         with self.lock:
-            self._frame = cv2.resize(new_frame, (self.width, self.height))
             self.frame_count += 1
-            current_time = time.time()
             time_diff = current_time - self.last_fps_update
             if time_diff >= 1.0:  # update fps every second
                 self.fps = self.frame_count / time_diff
                 self.frame_count = 0
                 self.last_fps_update = current_time
 
+            if self._reading_pending or current_time - self.last_publish_time < self.min_interval:
+                return
+            if self._pending is None or self._pending.shape != new_frame.shape:
+                self._pending = np.empty_like(new_frame)
+            np.copyto(self._pending, new_frame)
+            self._has_new_frame = True
+            self.last_publish_time = current_time
+            self._new_frame.notify()
+
 
 
     def add_component(self, component):
@@ -96,27 +128,69 @@ class Display(Thread):
             self.components.append(component)
 
 
+    def _to_display(self, frame: np.ndarray, out: np.ndarray) -> None:
+        """
+        Resizes the frame into the BGR working buffer, converting single channel frames on the way.
+        Conversion buffers are reused from one frame to the next
+        """
+        if frame.ndim == 3:
+            cv2.resize(frame, (self.width, self.height), dst=out)
+            return
+        if self.bayer:
+            # The mosaic is demosaiced at full resolution, as resizing it would mix the colors.
+            # OpenCV names Bayer patterns after the second row, RGGB sensors are decoded with the BG code
+            if self._color is None or self._color.shape[:2] != frame.shape:
+                self._color = np.empty(frame.shape + (3,), dtype=np.uint8)
+            cv2.cvtColor(frame, cv2.COLOR_BayerBG2BGR, dst=self._color)
+            cv2.resize(self._color, (self.width, self.height), dst=out)
+            return
+        cv2.resize(frame, (self.width, self.height), dst=self._gray)
+        cv2.cvtColor(self._gray, cv2.COLOR_GRAY2BGR, dst=out)
+
+
     def run(self):
         """
         Abstract method implmentation from threading.Thread
-        Displays the content of the _frame variable (through its getter) after applying components
+        Waits for a new frame, resizes it into the working buffer, applies components and displays it.
+        The window keeps being refreshed (events handled) while no frame is published
         """
+        display_frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
         while not self.stop_event.is_set():
-            display_frame = self.frame.copy()
-            # Apply components to the frame to display
-            for comp in self.components:
-                comp(display_frame)
+            with self.lock:
+                if self._new_frame.wait_for(lambda: self._has_new_frame or self.stop_event.is_set(), timeout=0.05) and self._has_new_frame:
+                    self._has_new_frame = False
+                    self._reading_pending = True
+                    pending = self._pending
+                else:
+                    pending = None
+
+            if pending is not None:
+                # The setter doesn't write into the pending buffer while it's being read
+                self._to_display(pending, display_frame)
+                with self.lock:
+                    self._reading_pending = False
+                    components = list(self.components)
+
+                # Apply components to the frame to display
+                for comp in components:
+                    comp(display_frame)
+
+                cv2.imshow(self.display_name, display_frame)
+                self.frames_displayed += 1
+                with self.lock:
+                    self._frame, display_frame = display_frame, self._frame
 
-            cv2.imshow(self.display_name, display_frame)
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 self.stop_event.set()
                 break
         cv2.destroyAllWindows()
 
-       
+
     def stop(self):
         """
         Abstract method implementation from threading.Thread
         """
-        logger.info('Stopping display stream')
+        logger.info(f'Stopping display stream ({self.frames_displayed} frames displayed)')
         self.stop_event.set()
+        with self.lock:
+            self._new_frame.notify_all()
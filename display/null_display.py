@@ -0,0 +1,88 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class NullDisplay:
+    """
+    No-op replacement of display.Display for headless runs (no X server, benchmarks).
+    It exposes the same interface, but frames are dropped without any copy and no window nor thread is created.
+    The framerate of the published frames is still computed, and logged periodically instead of being drawn.
+    """
+
+    def __init__(self, log_interval: float = 5.0, **kwargs):
+        """
+        Initializes the NullDisplay.
+
+
+        Parameters:
+        ---
+        log_interval: float, default=5.0
+            Interval in seconds between two logs of the framerate
+
+        **kwargs:
+            Parameters of display.Display, ignored
+        """
+        self.log_interval = log_interval
+        self.components = []
+        self.frame_count = 0
+        self.total_frames = 0
+        self.fps = 0
+        self.start_time = None
+        self.last_fps_update = time.time()
+
+
+    @property
+    def frame(self):
+        """
+        No frame is kept
+        """
+        return None
+
+
+    @frame.setter
+    def frame(self, new_frame):
+        """
+        Only counts frames to compute the framerate
+        """
+        self.frame_count += 1
+        current_time = time.time()
+        time_diff = current_time - self.last_fps_update
+        if time_diff >= self.log_interval:
+            self.fps = self.frame_count / time_diff
+            self.total_frames += self.frame_count
+            self.frame_count = 0
+            self.last_fps_update = current_time
+            logger.info(f'Pipeline running at {self.fps:.1f} fps')
+
+
+    def add_component(self, component):
+        """
+        Components are kept for compatibility but never applied
+        """
+        self.components.append(component)
+
+
+    def start(self):
+        self.start_time = time.time()
+        logger.info('Running headless, frames are not displayed')
+
+
+    def is_alive(self) -> bool:
+        return False
+
+
+    def join(self, timeout=None):
+        pass
+
+
+    def stop(self):
+        """
+        Logs the mean framerate of the run
+        """
+        if self.start_time is None:
+            return
+        total_frames = self.total_frames + self.frame_count
+        duration = time.time() - self.start_time
+        logger.info(f'Stopping null display: {total_frames} frames in {duration:.1f}s ({total_frames / max(duration, 1e-9):.1f} fps)')
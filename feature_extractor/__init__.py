@@ -1,11 +1,21 @@
-from .hand_landmarker import HandLandmarker
-from .frame_diff_calculator import FrameDiffCalculator
+from utils import registry
 
-# Step 5. of the tutorial on how to create a feature extractor
-from .pose_landmarker import PoseLandmarker
+# Classes are imported on first access only (see utils.registry),
+# so that a scenario doesn't import the dependencies (e.g mediapipe) of the extractors it doesn't use
+MODULES = {
+    'HandLandmarker': '.hand_landmarker',
+    'FrameDiffCalculator': '.frame_diff_calculator',
+    'MotionGridExtractor': '.motion_grid',
+    'ProcessPoolExtractor': '.process_pool',
+    'MotionGatedExtractor': '.motion_gate',
+    'LandmarkResult': '.landmark_result',
+    'RecordingExtractor': '.recording',
+    'FeatureRecording': '.recording',
+    'ReplayExtractor': '.replay',
+    # Step 5. of the tutorial on how to create a feature extractor
+    'PoseLandmarker': '.pose_landmarker',
+}
 
-__all__ = [
-    'HandLandmarker',
-    'FrameDiffCalculator',
-    'PoseLandmarker' # Step 5.
-]
+__all__ = list(MODULES)
+
+__getattr__ = registry.lazy_getattr(__name__, MODULES)
@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
 
 import numpy as np
-from typing import Any
+from typing import Any, Optional
+
+from utils import registry
 
 
 class FeatureExtractor(ABC):
@@ -12,10 +14,41 @@ class FeatureExtractor(ABC):
     """
 
     @abstractmethod
-    def process(self, frame: np.ndarray) -> Any:
+    def process(self, frame: np.ndarray, timestamp: Optional[float] = None) -> Any:
         """
         Extract features from a raw captured frame.
         Hence it also include all the potential preprocessing steps required to extract features.
         It's executed at each iteration of the main loop of the program
+
+        Parameters
+        ---
+        frame: np.ndarray, required
+            Frame to be processed
+
+        timestamp: float, default=None
+            Capture time of the frame, in seconds from the time.perf_counter clock (see: class`video.video_input.FrameSlot`).
+            Extractors which don't need it can ignore it
+        """
+        pass
+
+
+    def close(self) -> None:
+        """
+        Releases the resources held by the extractor (e.g worker processes).
+        It's called once when the program stops. Nothing needs to be released by default
         """
         pass
+
+
+def resolve_extractor(name: str) -> type:
+    """
+    Returns the feature extractor class registered under the given name (see utils.registry), importing its module only.
+    It's used by extractors wrapping another one (e.g feature_extractor.ProcessPoolExtractor)
+
+
+    Parameters
+    ---
+    name: str, required
+        Name of the class, as written in scenario files (e.g 'HandLandmarker')
+    """
+    return registry.resolve(name)
@@ -1,5 +1,6 @@
 import cv2
 import numpy as np
+from typing import Optional
 
 from .feature_extractor import FeatureExtractor
 
@@ -10,17 +11,65 @@ class FrameDiffCalculator(FeatureExtractor):
     It computes the mean of the absolute difference between the current frame and the previous one
     In the current context, this feature extractor is mainly intended for timing measurement purposes.
 
+    As it runs on every frame of high framerate cameras, no array is allocated per frame:
+    only the grayscale version of the previous frame is kept, and every conversion writes into persistent buffers allocated with the first frame.
+    Each frame is converted to grayscale once, and optionally decimated beforehand to reduce the cost further.
+    Single channel frames (e.g the 'mono' and 'raw' outputs of video.Flircam) are used as is, without any color conversion.
+    With a raw Bayer mosaic, an even decimation factor keeps pixels of a single color only.
+
 
     Attributes
     ---
-    previous_frame: np.ndarray
-        The previous frame is stored in order to compute the difference with the current one
+    previous_gray: np.ndarray
+        Grayscale version of the previous frame, used to compute the difference with the current one
+
+    diff: np.ndarray
+        Absolute difference image between the last two frames
     """
-    def __init__(self):
-        self.previous_frame = None
+    def __init__(self, decimation: int = 1):
+        """
+        Initializes the FrameDiffCalculator.
 
+        Parameters
+        ---
+        decimation: int, default=1
+            Only one pixel out of `decimation` is kept along each axis before computing the difference (nearest neighbor downscaling)
+        """
+        if decimation < 1:
+            raise ValueError(f'Decimation factor must be at least 1, got {decimation}')
+        self.decimation = decimation
+        self.input_shape = None
+        self.small_frame = None
+        self.current_gray = None
+        self.previous_gray = None
+        self.diff = None
+        self.has_previous = False
+
+
+    def _allocate_buffers(self, frame: np.ndarray) -> None:
+        """
+        Allocates the persistent buffers based on the shape of the frame
+        """
+        height, width = frame.shape[:2]
+        self.input_shape = frame.shape
+        self.size = self._processing_size(width, height)
+        self.decimated = self.size != (width, height)
+        # Single channel frames are decimated straight into the grayscale buffer
+        self.small_frame = np.empty((self.size[1], self.size[0]) + frame.shape[2:], dtype=np.uint8) if self.decimated and frame.ndim == 3 else None
+        self.current_gray = np.empty(self.size[::-1], dtype=np.uint8)
+        self.previous_gray = np.empty_like(self.current_gray)
+        self.diff = np.empty_like(self.current_gray)
+        self.has_previous = False
+
+
+    def _processing_size(self, width: int, height: int) -> tuple:
+        """
+        Size (width, height) of the grayscale images the difference is computed on
+        """
+        return max(1, width // self.decimation), max(1, height // self.decimation)
 
-    def process(self, current_frame: np.ndarray) -> float:
+
+    def process(self, current_frame: np.ndarray, timestamp: Optional[float] = None) -> float:
         """
         Implementation of the abstract method coming from feature_extractor.FeatureExtractor class.
         Computes per-pixel difference_image = |previous_frame - current_frame|.
@@ -32,27 +81,42 @@ class FrameDiffCalculator(FeatureExtractor):
         current_frame: np.ndarray, required
             Frame used to compute the difference with the stored previous frame=
 
+        timestamp: float, default=None
+            Unused
+
 
         Returns
         ---
         mean_diff: float
-            Mean difference between current and previous frames
+            Mean difference between current and previous frames, or None for the first frame
         """
-
-        mean_diff = None
-        frame_diff = np.zeros(current_frame.shape[:-1])
-        if self.previous_frame is not None:
-            frame_diff = self._compute_abs_frame_diff(current_frame, self.previous_frame)
-            mean_diff = np.mean(frame_diff)
-
-        self.previous_frame = current_frame.copy()
-        return mean_diff
-
+        frame_diff = self._compute_abs_frame_diff(current_frame)
+        if frame_diff is None:
+            return None
+        # uint8 pixels are summed as integers, which is exact and cheaper than a float64 mean
+        return int(frame_diff.sum(dtype=np.uint64)) / frame_diff.size
 
 
-    def _compute_abs_frame_diff(self, previous_frame: np.ndarray, current_frame: np.ndarray):
+    def _to_gray(self, frame: np.ndarray, out: np.ndarray) -> None:
         """
-        Converts input frames to grayscale and computes per-pixel absolute difference.
+        Decimates the frame if required and converts it to grayscale into the out buffer
+        """
+        if frame.ndim == 2:
+            if self.decimated:
+                cv2.resize(frame, self.size, dst=out, interpolation=cv2.INTER_NEAREST)
+            else:
+                np.copyto(out, frame)
+            return
+        if self.small_frame is not None:
+            cv2.resize(frame, self.size, dst=self.small_frame, interpolation=cv2.INTER_NEAREST)
+            frame = self.small_frame
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=out)
+
+
+    def _compute_abs_frame_diff(self, current_frame: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Converts the current frame to grayscale and computes per-pixel absolute difference with the previous one.
+        The grayscale frame is then kept as the previous frame of the next call, by swapping buffers rather than copying.
 
 
         Parameters:
@@ -60,17 +124,22 @@ class FrameDiffCalculator(FeatureExtractor):
         current_frame: np.ndarray
             The most recent frame.
 
-        previous_frame: np.ndarray
-            The frame to be compared with the current frame
-
 
         Returns:
         ---
-        frame_diff: np.ndarray
-            Image of the absolute difference between current and previous frames
+        frame_diff: np.ndarray or None
+            Image of the absolute difference between current and previous frames (persistent buffer overwritten at the next call),
+            or None if there is no previous frame
         """
-        previous_gray = cv2.cvtColor(previous_frame, cv2.COLOR_BGR2GRAY)
-        current_gray = cv2.cvtColor(current_frame, cv2.COLOR_BGR2GRAY)
+        if current_frame.shape != self.input_shape:
+            self._allocate_buffers(current_frame)
+
+        self._to_gray(current_frame, self.current_gray)
+        frame_diff = None
+        if self.has_previous:
+            cv2.absdiff(self.current_gray, self.previous_gray, dst=self.diff)
+            frame_diff = self.diff
 
-        frame_diff = cv2.absdiff(current_gray, previous_gray)
+        self.previous_gray, self.current_gray = self.current_gray, self.previous_gray
+        self.has_previous = True
         return frame_diff
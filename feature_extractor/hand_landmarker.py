@@ -1,5 +1,6 @@
 import time
 import logging
+from threading import Lock, Condition
 
 import cv2
 import numpy as np
@@ -9,12 +10,14 @@ from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 
 # For typing
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from mediapipe.tasks.python.components.containers import landmark as landmark_module
 from mediapipe.framework.formats import landmark_pb2
-from utils.mediapipe import convert_to_landmark_list
+from utils.mediapipe import convert_to_landmark_list, get_running_mode, TimestampConverter, load_model, warm_up, StartupProfile
+from utils import registry
 
 from .feature_extractor import FeatureExtractor
+from .landmark_result import LandmarkResult
 
 logger = logging.getLogger(__name__)
 
@@ -23,9 +26,27 @@ class HandLandmarker(FeatureExtractor):
     """
     Extracts hand landmarks from frames. It uses the Mediapipe hand landmarker model to detect hands.
     In addition to the hand(s) landmarks, handedness is returned as well
+
+    Three mediapipe running modes are available:
+    + image: palm detection runs from scratch on every frame
+    + video: frames are processed with their capture timestamp, which allows mediapipe to track hands from one frame to another and to skip palm detection
+    + live_stream: same tracking as the video mode, but inference runs asynchronously. `process` returns immediately with the latest available result
+
+    In ROI mode (image running mode only), the model runs on a crop around the hands detected in the previous frame instead of the whole frame.
+    The crop is the bounding box of the previous landmarks, enlarged by a margin. When no hand is found in the crop, or every `reacquire_interval` frames to catch new hands,
+    the whole frame is processed again, optionally downscaled. Landmarks are always returned in full-frame normalized coordinates, so mappers aren't affected.
+
+    Results are returned either as mediapipe objects in a dictionary (default) or as a compact feature_extractor.LandmarkResult holding numpy arrays (`output_format='array'`)
+
+    The model file is read once (independently of the working directory) and given to mediapipe as a buffer.
+    A few dummy inferences are run at construction (i.e before the video input starts), so that the first real frames are processed as fast as the next ones.
+    The duration of each startup phase (import, model load, graph creation, warm-up) is logged.
     """
 
-    def __init__(self, n_hands=2, device: str = 'cpu'):
+    def __init__(self, n_hands=2, device: str = 'cpu', running_mode: str = 'image', output_format: str = 'mediapipe',
+                 roi: bool = False, roi_margin: float = 0.3, roi_min_size: float = 0.15,
+                 reacquire_scale: float = 1.0, reacquire_interval: int = 30,
+                 model_path: str = 'hand_landmarker.task', warmup_frames: int = 3, warmup_size: Tuple[int, int] = (640, 480)):
         """
         Initializes the HandLandmarker.
 
@@ -37,24 +58,134 @@ class HandLandmarker(FeatureExtractor):
 
         device: str, default = 'cpu'
             The device to run the model on. Choose between 'cpu' and 'gpu'.
+
+        running_mode: str, default='image'
+            Mediapipe running mode. Choose between 'image', 'video' and 'live_stream'
+
+        output_format: str, default='mediapipe'
+            Either 'mediapipe' (dictionary of mediapipe objects) or 'array' (feature_extractor.LandmarkResult)
+
+        roi: bool, default=False
+            Whether to run the model on a region of interest around the previously detected hands. Requires the image running mode
+
+        roi_margin: float, default=0.3
+            Margin added on each side of the landmarks bounding box, as a fraction of its size
+
+        roi_min_size: float, default=0.15
+            Minimal side of the region of interest, as a fraction of the smallest frame dimension
+
+        reacquire_scale: float, default=1.0
+            Scale factor applied to the whole frame when hands have to be reacquired (e.g 0.5 to halve the resolution)
+
+        reacquire_interval: int, default=30
+            Maximum number of frames processed in ROI mode before the whole frame is processed again
+
+        model_path: str, default='hand_landmarker.task'
+            Path of the model file. Relative paths are looked up in the working directory, then in the root directory of the project
+
+        warmup_frames: int, default=3
+            Number of dummy inferences run at construction. Disabled if 0
+
+        warmup_size: tuple, default=(640, 480)
+            [width, height] of the dummy frames, which should match the frames of the video input
         """
+        if output_format not in ('mediapipe', 'array'):
+            raise ValueError(f"Unknown output format {output_format}. Choose between 'mediapipe' and 'array'")
+        if roi and running_mode != 'image':
+            raise ValueError('ROI mode is only available with the image running mode, as tracking expects full frames')
         self.mp_hands = mp.solutions.hands
         self.mp_drawing = mp.solutions.drawing_utils
+        self.running_mode = running_mode
+        self.output_format = output_format
+        self.timestamps = TimestampConverter()
+        self.result_lock = Lock()
+        self.result_ready = Condition(self.result_lock)
+        self.result_timestamp_ms = -1
+        self.latest_result = self._empty_result()
+
+        self.roi = roi
+        self.roi_margin = roi_margin
+        self.roi_min_size = roi_min_size
+        self.reacquire_scale = reacquire_scale
+        self.reacquire_interval = reacquire_interval
+        self.roi_box = None # (x0, y0, x1, y1) in pixels
+        self.frames_since_reacquisition = 0
+        self.roi_runs = 0
+        self.full_frame_runs = 0
+
+        profile = StartupProfile(type(self).__name__)
+        if __name__ in registry.import_times:
+            profile.add('import', registry.import_times[__name__])
+        with profile.phase('model load'):
+            model = load_model(model_path)  # You'll need to download this model
+
         base_options = python.BaseOptions(
-            model_asset_path='hand_landmarker.task',  # You'll need to download this model
+            model_asset_buffer=model,
             delegate=python.BaseOptions.Delegate.GPU if device == 'gpu' else python.BaseOptions.Delegate.CPU
         )
         options = vision.HandLandmarkerOptions(
             base_options=base_options,
+            running_mode=get_running_mode(running_mode),
             num_hands=n_hands,
             min_hand_detection_confidence=0.5,
             min_hand_presence_confidence=0.5,
             min_tracking_confidence=0.5,
+            result_callback=self._publish_result if running_mode == 'live_stream' else None,
         )
-        self.hands = vision.HandLandmarker.create_from_options(options)
+        with profile.phase('graph creation'):
+            self.hands = vision.HandLandmarker.create_from_options(options)
+
+        with profile.phase('warm-up'):
+            # Asynchronous inferences are waited for, so that graph initialization doesn't land on the first real frames
+            durations = warm_up(self.process, warmup_frames, warmup_size, self._wait_for_result if running_mode == 'live_stream' else None)
+        # Results of the black warm-up frames mustn't be returned for the first real frames
+        with self.result_lock:
+            self.latest_result = self._empty_result()
+        # Warm-up frames mustn't be taken into account by the ROI mode
+        self.roi_box = None
+        self.frames_since_reacquisition = self.roi_runs = self.full_frame_runs = 0
+        profile.log(f', warm-up inferences: first {1000 * durations[0]:.1f}ms, last {1000 * durations[-1]:.1f}ms' if durations else '')
+
+
+    def _empty_result(self):
+        """
+        Result without any detection, in the output format returned by `process`
+        """
+        return LandmarkResult.empty(21) if self.output_format == 'array' else {'landmarks': [], 'handedness': []}
+
+
+    def _format_result(self, detection_result):
+        """
+        Reformats mediapipe detection results into the output format returned by `process`
+        """
+        if self.output_format == 'array':
+            return LandmarkResult.from_hand_result(detection_result)
+        return {
+            'landmarks': detection_result.hand_landmarks,
+            'handedness': detection_result.handedness
+        }
+
+
+    def _publish_result(self, detection_result, output_image, timestamp_ms: int) -> None:
+        """
+        Result callback of the live_stream running mode, called from a mediapipe thread
+        """
+        res = self._format_result(detection_result)
+        with self.result_lock:
+            self.latest_result = res
+            self.result_timestamp_ms = timestamp_ms
+            self.result_ready.notify_all()
+
+
+    def _wait_for_result(self, timeout: float = 5.) -> bool:
+        """
+        Waits until the live_stream callback published the result of the last submitted frame. Returns False if it timed out
+        """
+        with self.result_lock:
+            return self.result_ready.wait_for(lambda: self.result_timestamp_ms >= self.timestamps.last_ms, timeout)
 
 
-    def process(self, image: np.ndarray) -> Dict[str, List[List[Any]]]:
+    def process(self, image: np.ndarray, timestamp: Optional[float] = None):
         """
         Implementation of the abstract method coming from feature_extractor.FeatureExtractor class.
         Runs mediapipe model inference on the frame. The model determines landmarks and handedness of detected hand(s)
@@ -65,22 +196,132 @@ class HandLandmarker(FeatureExtractor):
         image: np.ndarray, required
             Frame to be processed
 
+        timestamp: float, default=None
+            Capture time of the frame in seconds, used by the video and live_stream modes. The current time is used if None
+
 
         Returns
         ---
         res: dict[lansmarks, handedness] or None
             Hand landmarker detection results or None if no hand is detected
+            In live_stream mode, it's the latest result published by mediapipe, which may belong to a previous frame
+            With the array output format, a feature_extractor.LandmarkResult is returned instead of the dictionary
+        """
+        if self.roi:
+            return self._process_roi(image)
+
+        mp_image = self._to_mp_image(image)
+        if self.running_mode == 'video':
+            detection_result = self.hands.detect_for_video(mp_image, self.timestamps.to_ms(timestamp))
+        elif self.running_mode == 'live_stream':
+            self.hands.detect_async(mp_image, self.timestamps.to_ms(timestamp))
+            with self.result_lock:
+                return self.latest_result
+        else:
+            detection_result = self.hands.detect(mp_image)
+        return self._format_result(detection_result)
+
+
+    def _to_mp_image(self, image: np.ndarray) -> mp.Image:
+        """
+        Converts a BGR frame (or a crop of it) to a mediapipe RGB image
         """
         image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=image_rgb)
-        detection_result = self.hands.detect(mp_image)
-        res = {
-            'landmarks': detection_result.hand_landmarks,
-            'handedness': detection_result.handedness
-        }
+        return mp.Image(image_format=mp.ImageFormat.SRGB, data=image_rgb)
+
+
+    def _process_roi(self, image: np.ndarray):
+        """
+        ROI mode implementation of `process`
+        Runs the model on the region of interest if there is one, and falls back to the whole frame if no hand is found in it
+        """
+        height, width = image.shape[:2]
+        self.frames_since_reacquisition += 1
+
+        if self.roi_box is not None and self.frames_since_reacquisition < self.reacquire_interval:
+            x0, y0, x1, y1 = self.roi_box
+            detection_result = self.hands.detect(self._to_mp_image(image[y0:y1, x0:x1]))
+            self.roi_runs += 1
+            if detection_result.hand_landmarks:
+                res = self._crop_to_frame(self._format_result(detection_result), self.roi_box, width, height)
+                self.roi_box = self._compute_roi(res, width, height)
+                return res
+
+        # Reacquisition on the whole frame. Normalized coordinates don't depend on the scale
+        if self.reacquire_scale != 1.0:
+            image = cv2.resize(image, None, fx=self.reacquire_scale, fy=self.reacquire_scale, interpolation=cv2.INTER_AREA)
+        detection_result = self.hands.detect(self._to_mp_image(image))
+        self.full_frame_runs += 1
+        self.frames_since_reacquisition = 0
+        res = self._format_result(detection_result)
+        self.roi_box = self._compute_roi(res, width, height) if detection_result.hand_landmarks else None
+        return res
+
+
+    def _compute_roi(self, res, width: int, height: int) -> Optional[tuple]:
+        """
+        Computes the square region of interest enclosing every detected hand, enlarged by the margin and clipped to the frame
+
+
+        Returns
+        ---
+        roi_box: tuple or None
+            (x0, y0, x1, y1) in pixels or None if the region is empty
+        """
+        if isinstance(res, LandmarkResult):
+            coords = res.landmarks[..., :2].reshape(-1, 2) * (width, height)
+        else:
+            coords = np.array([[lm.x, lm.y] for landmarks in res['landmarks'] for lm in landmarks], dtype=np.float32) * (width, height)
+        (x_min, y_min), (x_max, y_max) = coords.min(axis=0), coords.max(axis=0)
+        side = max(x_max - x_min, y_max - y_min) * (1 + 2 * self.roi_margin)
+        side = max(side, self.roi_min_size * min(width, height))
+        center_x, center_y = (x_min + x_max) / 2, (y_min + y_max) / 2
+
+        x0, x1 = int(max(center_x - side / 2, 0)), int(min(center_x + side / 2, width))
+        y0, y1 = int(max(center_y - side / 2, 0)), int(min(center_y + side / 2, height))
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return None
+        return x0, y0, x1, y1
+
+
+    def _crop_to_frame(self, res, roi_box: tuple, width: int, height: int):
+        """
+        Maps landmarks normalized with respect to the region of interest back to full-frame normalized coordinates, in place.
+        As mediapipe normalizes z with the same scale as x, z is rescaled with the width ratio
+        """
+        x0, y0, x1, y1 = roi_box
+        scale_x, scale_y = (x1 - x0) / width, (y1 - y0) / height
+        offset_x, offset_y = x0 / width, y0 / height
+
+        if isinstance(res, LandmarkResult):
+            res.landmarks *= (scale_x, scale_y, scale_x)
+            res.landmarks[..., 0] += offset_x
+            res.landmarks[..., 1] += offset_y
+            return res
+
+        res['landmarks'] = [
+            [
+                landmark_module.NormalizedLandmark(
+                    x=offset_x + lm.x * scale_x,
+                    y=offset_y + lm.y * scale_y,
+                    z=lm.z * scale_x,
+                    visibility=lm.visibility,
+                    presence=lm.presence
+                )
+                for lm in landmarks
+            ]
+            for landmarks in res['landmarks']
+        ]
         return res
 
 
+    def close(self) -> None:
+        """
+        Overrides feature_extractor.FeatureExtractor.close
+        """
+        self.hands.close()
+
+
     def draw_landmarks(self, image, hand_landmarks: List[List[landmark_module.NormalizedLandmark]]):
         """
         Draws hand landmarks on the image
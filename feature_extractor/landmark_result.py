@@ -0,0 +1,121 @@
+from typing import Any, Optional
+
+import numpy as np
+
+
+class LandmarkResult:
+    """
+    Compact representation of landmarker outputs, holding landmarks in contiguous float32 arrays instead of per-landmark mediapipe objects.
+    It's emitted by the landmarkers when they're created with `output_format='array'`, and allows mappers to work with vectorized operations.
+
+
+    Attributes
+    ---
+    landmarks: np.ndarray
+        float32 array of shape (n_detections, n_landmarks, 3) with normalized (x, y, z) coordinates
+        (e.g n_landmarks=21 for hands, 33 for poses)
+
+    world_landmarks: np.ndarray
+        float32 array of shape (n_detections, n_landmarks, 3) with world coordinates in meters
+
+    handedness: np.ndarray
+        int8 array of shape (n_detections,). LEFT, RIGHT or UNKNOWN (e.g for poses)
+
+    handedness_scores: np.ndarray
+        float32 array of shape (n_detections,) with the confidence of the handedness classification
+    """
+    __slots__ = ('landmarks', 'world_landmarks', 'handedness', 'handedness_scores')
+
+    UNKNOWN = -1
+    LEFT = 0
+    RIGHT = 1
+    HANDEDNESS = {'Left': LEFT, 'Right': RIGHT}
+
+    def __init__(self, landmarks: np.ndarray, world_landmarks: Optional[np.ndarray] = None,
+                 handedness: Optional[np.ndarray] = None, handedness_scores: Optional[np.ndarray] = None):
+        n_detections = landmarks.shape[0]
+        self.landmarks = landmarks
+        self.world_landmarks = world_landmarks if world_landmarks is not None else np.zeros_like(landmarks)
+        self.handedness = handedness if handedness is not None else np.full(n_detections, self.UNKNOWN, dtype=np.int8)
+        self.handedness_scores = handedness_scores if handedness_scores is not None else np.zeros(n_detections, dtype=np.float32)
+
+
+    def __len__(self) -> int:
+        """
+        Number of detections (hands or poses)
+        """
+        return self.landmarks.shape[0]
+
+
+    def __repr__(self) -> str:
+        return f'LandmarkResult(n_detections={len(self)}, n_landmarks={self.landmarks.shape[1]})'
+
+
+    @staticmethod
+    def _to_array(landmark_lists, n_landmarks: int) -> np.ndarray:
+        """
+        Converts a list of detections, each one being a list of mediapipe landmarks, to a (n_detections, n_landmarks, 3) float32 array
+        """
+        if not landmark_lists:
+            return np.zeros((0, n_landmarks, 3), dtype=np.float32)
+        return np.array([[(lm.x, lm.y, lm.z) for lm in landmarks] for landmarks in landmark_lists], dtype=np.float32)
+
+
+    @classmethod
+    def empty(cls, n_landmarks: int = 21) -> 'LandmarkResult':
+        """
+        Result without any detection
+        """
+        return cls(np.zeros((0, n_landmarks, 3), dtype=np.float32))
+
+
+    @classmethod
+    def from_hand_result(cls, detection_result) -> 'LandmarkResult':
+        """
+        Converts a mediapipe HandLandmarkerResult
+        """
+        handedness = detection_result.handedness
+        return cls(
+            cls._to_array(detection_result.hand_landmarks, 21),
+            cls._to_array(detection_result.hand_world_landmarks, 21),
+            np.array([cls.HANDEDNESS.get(categories[0].category_name, cls.UNKNOWN) for categories in handedness], dtype=np.int8),
+            np.array([categories[0].score for categories in handedness], dtype=np.float32),
+        )
+
+
+    @classmethod
+    def from_pose_result(cls, detection_result) -> 'LandmarkResult':
+        """
+        Converts a mediapipe PoseLandmarkerResult
+        """
+        return cls(
+            cls._to_array(detection_result.pose_landmarks, 33),
+            cls._to_array(detection_result.pose_world_landmarks, 33),
+        )
+
+
+    @classmethod
+    def from_features(cls, features: Any) -> 'LandmarkResult':
+        """
+        Returns the features as a LandmarkResult.
+        It allows mappers to accept both output formats of the landmarkers: LandmarkResult instances are returned as is,
+        and dictionaries { 'landmarks': ..., 'handedness': ... } holding mediapipe objects are converted
+
+
+        Parameters
+        ---
+        features: LandmarkResult or dict, required
+            Output of a landmarker
+        """
+        if isinstance(features, cls):
+            return features
+        hand_landmarks = features['landmarks']
+        n_landmarks = len(hand_landmarks[0]) if hand_landmarks else 21
+        handedness = features.get('handedness')
+        if handedness is None:
+            return cls(cls._to_array(hand_landmarks, n_landmarks))
+        return cls(
+            cls._to_array(hand_landmarks, n_landmarks),
+            handedness=np.array([cls.HANDEDNESS.get(categories[0].category_name, cls.UNKNOWN) for categories in handedness], dtype=np.int8),
+            handedness_scores=np.array([categories[0].score for categories in handedness], dtype=np.float32),
+        )
@@ -0,0 +1,135 @@
+import time
+import logging
+from typing import Any, Optional
+
+import cv2
+import numpy as np
+
+from .feature_extractor import FeatureExtractor, resolve_extractor
+
+logger = logging.getLogger(__name__)
+
+
+class MotionGatedExtractor(FeatureExtractor):
+    """
+    Wraps any feature extractor and skips it when the scene is static.
+    Before running the wrapped extractor, a cheap motion check is performed on a downscaled grayscale version of the frame:
+    the mean absolute difference with the frame of the last inference (see: class`feature_extractor.FrameDiffCalculator`).
+    Comparing with the frame of the last inference rather than the previous frame allows to catch slow movements as well.
+
+    When motion stays below the threshold, the last result of the wrapped extractor is returned again.
+    The wrapped extractor is run anyway once the last result is older than `max_staleness` milliseconds.
+
+
+    Attributes
+    ---
+    inferences_run: int
+        Number of frames processed by the wrapped extractor
+
+    inferences_skipped: int
+        Number of frames for which the last result was reused
+    """
+
+    def __init__(self, extractor: str, extractor_params: Optional[dict] = None,
+                 threshold: float = 2.0, max_staleness: int = 1000, gate_width: int = 80):
+        """
+        Initializes the MotionGatedExtractor.
+
+        Parameters
+        ---
+        extractor: str, required
+            Name of the wrapped feature extractor class (e.g 'HandLandmarker')
+
+        extractor_params: dict, default=None
+            Parameters of the wrapped feature extractor
+
+        threshold: float, default=2.0
+            Mean absolute pixel difference (0-255 scale) below which the scene is considered static
+
+        max_staleness: int, default=1000
+            Maximum age in milliseconds of a reused result. The wrapped extractor is run once this age is reached, even without motion
+
+        gate_width: int, default=80
+            Width in pixels of the downscaled frame used for the motion check. The aspect ratio is kept
+        """
+        self.extractor = resolve_extractor(extractor)(**(extractor_params or {}))
+        self.threshold = threshold
+        self.max_staleness = max_staleness / 1000
+        self.gate_width = gate_width
+
+        self.small_frame = None
+        self.gray = None
+        self.reference_gray = None
+        self.diff = None
+        self.last_result = None
+        self.last_inference_time = 0.
+        self.inferences_run = 0
+        self.inferences_skipped = 0
+
+
+    def _allocate_buffers(self, frame: np.ndarray) -> None:
+        """
+        Allocates the downscaled buffers based on the shape of the first frame
+        """
+        height, width = frame.shape[:2]
+        self.gate_size = (self.gate_width, max(1, round(height * self.gate_width / width)))
+        self.small_frame = np.empty((self.gate_size[1], self.gate_size[0], 3), dtype=np.uint8)
+        self.gray = np.empty(self.gate_size[::-1], dtype=np.uint8)
+        self.reference_gray = np.empty_like(self.gray)
+        self.diff = np.empty_like(self.gray)
+
+
+    def process(self, frame: np.ndarray, timestamp: Optional[float] = None) -> Any:
+        """
+        Implementation of the abstract method coming from feature_extractor.FeatureExtractor class.
+        Runs the wrapped extractor only if motion was detected since its last inference or if its last result is too old
+
+
+        Parameters
+        ---
+        frame: np.ndarray, required
+            Frame to be processed
+
+        timestamp: float, default=None
+            Capture time of the frame in seconds, forwarded to the wrapped extractor. The current time is used for staleness if None
+
+
+        Returns
+        ---
+        features: Any
+            Output of the wrapped extractor, possibly computed on a previous frame
+        """
+        now = timestamp if timestamp is not None else time.perf_counter()
+        if self.small_frame is None:
+            self._allocate_buffers(frame)
+
+        if frame.ndim == 2:
+            # Single channel frames (e.g video.Flircam 'mono' output) are already grayscale
+            cv2.resize(frame, self.gate_size, dst=self.gray, interpolation=cv2.INTER_AREA)
+        else:
+            cv2.resize(frame, self.gate_size, dst=self.small_frame, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(self.small_frame, cv2.COLOR_BGR2GRAY, dst=self.gray)
+
+        if self.last_result is not None and now - self.last_inference_time < self.max_staleness:
+            cv2.absdiff(self.gray, self.reference_gray, dst=self.diff)
+            if cv2.mean(self.diff)[0] < self.threshold:
+                self.inferences_skipped += 1
+                return self.last_result
+
+        self.last_result = self.extractor.process(frame, timestamp)
+        self.last_inference_time = now
+        self.inferences_run += 1
+        # The current frame becomes the reference of the next motion checks
+        self.gray, self.reference_gray = self.reference_gray, self.gray
+        return self.last_result
+
+
+    def close(self) -> None:
+        """
+        Overrides feature_extractor.FeatureExtractor.close
+        Closes the wrapped extractor and logs how many inferences were skipped
+        """
+        total = self.inferences_run + self.inferences_skipped
+        logger.info(f'Motion gate skipped {self.inferences_skipped}/{total} inferences '
+                    f'({100 * self.inferences_skipped / max(total, 1):.1f}%)')
+        self.extractor.close()
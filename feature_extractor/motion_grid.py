@@ -0,0 +1,131 @@
+import logging
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from .frame_diff_calculator import FrameDiffCalculator
+
+logger = logging.getLogger(__name__)
+
+
+class MotionGridExtractor(FrameDiffCalculator):
+    """
+    Computes the motion energy (mean absolute difference between two consecutive frames) over several areas of the frame at once.
+    It allows to trigger different sounds for motions in different parts of the stage, without running any landmarker model.
+
+    Areas are either the cells of a regular grid or named polygons (zones).
+    + grid: the difference image is computed at a size which is a multiple of the grid, so that cells are reduced with a single reshape and sum (block reduce)
+    + zones: polygons are rasterized once into a normalized weight matrix, so that all zones are reduced with a single matrix product
+
+    The output is a float32 vector with one value per cell (row major order) or per zone (in the order they're defined), on the 0-255 scale.
+    Motion energies of the first frame are all 0.
+
+
+    Attributes
+    ---
+    zone_names: list
+        Name of each value of the output vector ('row,col' in grid mode)
+    """
+
+    def __init__(self, rows: int = 4, cols: int = 4, zones: Optional[Dict[str, List[List[float]]]] = None, decimation: int = 4):
+        """
+        Initializes the MotionGridExtractor.
+
+        Parameters
+        ---
+        rows: int, default=4
+            Number of rows of the grid. Ignored if zones are defined
+
+        cols: int, default=4
+            Number of columns of the grid. Ignored if zones are defined
+
+        zones: dict, default=None
+            Named polygons { name: [[x, y], ...] } with vertices in normalized coordinates (between 0 and 1).
+            Overlapping zones are allowed
+
+        decimation: int, default=4
+            Only one pixel out of `decimation` is kept along each axis before computing the difference
+        """
+        super().__init__(decimation=decimation)
+        self.rows = rows
+        self.cols = cols
+        self.zones = zones
+        if zones:
+            self.zone_names = list(zones)
+        else:
+            self.zone_names = [f'{row},{col}' for row in range(rows) for col in range(cols)]
+        self.n_values = len(self.zone_names)
+        self.cell_sums = np.empty((rows, cols), dtype=np.uint32)
+        self.zone_weights = None
+        self.diff_float = None
+
+
+    def _processing_size(self, width: int, height: int) -> tuple:
+        """
+        Overrides feature_extractor.FrameDiffCalculator._processing_size
+        In grid mode, the size is rounded down to a multiple of the grid so that every cell has the same number of pixels
+        """
+        width, height = super()._processing_size(width, height)
+        if self.zones:
+            return width, height
+        cell_width, cell_height = max(1, width // self.cols), max(1, height // self.rows)
+        return cell_width * self.cols, cell_height * self.rows
+
+
+    def _allocate_buffers(self, frame: np.ndarray) -> None:
+        """
+        Overrides feature_extractor.FrameDiffCalculator._allocate_buffers
+        Also rasterizes the zones at the processing size
+        """
+        super()._allocate_buffers(frame)
+        if not self.zones:
+            return
+        width, height = self.size
+        self.zone_weights = np.zeros((self.n_values, height * width), dtype=np.float32)
+        mask = np.empty((height, width), dtype=np.uint8)
+        for i, (name, polygon) in enumerate(self.zones.items()):
+            mask.fill(0)
+            vertices = np.round(np.asarray(polygon, dtype=np.float32) * (width - 1, height - 1)).astype(np.int32)
+            cv2.fillPoly(mask, [vertices], 1)
+            area = int(mask.sum())
+            if area == 0:
+                logger.warning(f'Zone {name} is empty at {width}x{height}, its motion energy will always be 0')
+                continue
+            self.zone_weights[i] = mask.ravel() / area
+        self.diff_float = np.empty(height * width, dtype=np.float32)
+
+
+    def process(self, current_frame: np.ndarray, timestamp: Optional[float] = None) -> np.ndarray:
+        """
+        Overrides feature_extractor.FrameDiffCalculator.process
+        Computes the motion energy of every cell or zone
+
+
+        Parameters
+        ---
+        current_frame: np.ndarray, required
+            Frame used to compute the difference with the previous frame
+
+        timestamp: float, default=None
+            Unused
+
+
+        Returns
+        ---
+        motion_energy: np.ndarray
+            float32 vector of size rows * cols (grid mode) or number of zones
+        """
+        frame_diff = self._compute_abs_frame_diff(current_frame)
+        if frame_diff is None:
+            return np.zeros(self.n_values, dtype=np.float32)
+
+        if self.zones:
+            np.copyto(self.diff_float, frame_diff.ravel())
+            return self.zone_weights @ self.diff_float
+
+        height, width = frame_diff.shape
+        cell_height, cell_width = height // self.rows, width // self.cols
+        blocks = frame_diff.reshape(self.rows, cell_height, self.cols, cell_width)
+        blocks.sum(axis=(1, 3), dtype=np.uint32, out=self.cell_sums)
+        return np.multiply(self.cell_sums, 1 / (cell_height * cell_width), dtype=np.float32).ravel()
@@ -7,6 +7,7 @@ The step-by-step creation of this class is detailed in the README file of this m
 
 # 2. Necessary imports
 from .feature_extractor import FeatureExtractor
+from .landmark_result import LandmarkResult
 
 import cv2
 import numpy as np
@@ -16,22 +17,26 @@ from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 
 # Optional imports for typing
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from mediapipe.tasks.python.components.containers import landmark as landmark_module
 from mediapipe.framework.formats import landmark_pb2
-from utils.mediapipe import convert_to_landmark_list
+from utils.mediapipe import convert_to_landmark_list, get_running_mode, TimestampConverter, load_model, warm_up, StartupProfile
+from utils import registry
 
 
 import logging
+from threading import Lock, Condition
 logger = logging.getLogger(__name__)
 
 # 3. Definition of the PoseLandmarker class
 class PoseLandmarker(FeatureExtractor):
     """
     Extracts pose landmarks from frames. It uses the Mediapipe pose landmarker model to detect human poses.
+    The same running modes, model loading and warm-up as the HandLandmarker are available (see: class`feature_extractor.HandLandmarker`)
     """
 
-    def __init__(self, device: str = 'cpu'):
+    def __init__(self, device: str = 'cpu', running_mode: str = 'image', output_format: str = 'mediapipe',
+                 model_path: str = 'pose_landmarker_lite.task', warmup_frames: int = 3, warmup_size: Tuple[int, int] = (640, 480)):
         """
         Initializes the PoseLandmarker.
 
@@ -39,22 +44,101 @@ class PoseLandmarker(FeatureExtractor):
         ---
         device: str, default = 'cpu'
             The device to run the model on. Choose between 'cpu' and 'gpu'.
+
+        running_mode: str, default='image'
+            Mediapipe running mode. Choose between 'image', 'video' and 'live_stream'
+
+        output_format: str, default='mediapipe'
+            Either 'mediapipe' (dictionary of mediapipe objects) or 'array' (feature_extractor.LandmarkResult)
+
+        model_path: str, default='pose_landmarker_lite.task'
+            Path of the model file. Relative paths are looked up in the working directory, then in the root directory of the project
+
+        warmup_frames: int, default=3
+            Number of dummy inferences run at construction. Disabled if 0
+
+        warmup_size: tuple, default=(640, 480)
+            [width, height] of the dummy frames, which should match the frames of the video input
         """
+        if output_format not in ('mediapipe', 'array'):
+            raise ValueError(f"Unknown output format {output_format}. Choose between 'mediapipe' and 'array'")
         self.mp_pose = mp.solutions.pose
         self.mp_drawing = mp.solutions.drawing_utils
+        self.running_mode = running_mode
+        self.output_format = output_format
+        self.timestamps = TimestampConverter()
+        self.result_lock = Lock()
+        self.result_ready = Condition(self.result_lock)
+        self.result_timestamp_ms = -1
+        self.latest_result = self._empty_result()
+
+        profile = StartupProfile(type(self).__name__)
+        if __name__ in registry.import_times:
+            profile.add('import', registry.import_times[__name__])
+        with profile.phase('model load'):
+            model = load_model(model_path)  # You'll need to download this model
+
         base_options = python.BaseOptions(
-            model_asset_path='pose_landmarker_lite.task',  # You'll need to download this model
+            model_asset_buffer=model,
             delegate=python.BaseOptions.Delegate.GPU if device == 'gpu' else python.BaseOptions.Delegate.CPU
         )
         options = vision.PoseLandmarkerOptions(
             base_options=base_options,
+            running_mode=get_running_mode(running_mode),
             output_segmentation_masks=False,  # Optional, for segmenting the person from the background
+            result_callback=self._publish_result if running_mode == 'live_stream' else None,
         )
-        self.pose = vision.PoseLandmarker.create_from_options(options)
+        with profile.phase('graph creation'):
+            self.pose = vision.PoseLandmarker.create_from_options(options)
+
+        with profile.phase('warm-up'):
+            # Asynchronous inferences are waited for, so that graph initialization doesn't land on the first real frames
+            durations = warm_up(self.process, warmup_frames, warmup_size, self._wait_for_result if running_mode == 'live_stream' else None)
+        # Results of the black warm-up frames mustn't be returned for the first real frames
+        with self.result_lock:
+            self.latest_result = self._empty_result()
+        profile.log(f', warm-up inferences: first {1000 * durations[0]:.1f}ms, last {1000 * durations[-1]:.1f}ms' if durations else '')
+
+
+    def _empty_result(self):
+        """
+        Result without any detection, in the output format returned by `process`
+        """
+        return LandmarkResult.empty(33) if self.output_format == 'array' else {'landmarks': []}
+
+
+    def _format_result(self, detection_result):
+        """
+        Reformats mediapipe detection results into the output format returned by `process`
+        """
+        if self.output_format == 'array':
+            return LandmarkResult.from_pose_result(detection_result)
+        return {
+            'landmarks': detection_result.pose_landmarks,
+        }
+
+
+    def _publish_result(self, detection_result, output_image, timestamp_ms: int) -> None:
+        """
+        Result callback of the live_stream running mode, called from a mediapipe thread
+        """
+        res = self._format_result(detection_result)
+        with self.result_lock:
+            self.latest_result = res
+            self.result_timestamp_ms = timestamp_ms
+            self.result_ready.notify_all()
+
+
+    def _wait_for_result(self, timeout: float = 5.) -> bool:
+        """
+        Waits until the live_stream callback published the result of the last submitted frame. Returns False if it timed out
+        """
+        with self.result_lock:
+            return self.result_ready.wait_for(lambda: self.result_timestamp_ms >= self.timestamps.last_ms, timeout)
 
 
     # 4. implementation of the process abstract method defined in FeatureExtractor
-    def process(self, image: np.ndarray) -> Dict[str, List[Any]]:
+    def process(self, image: np.ndarray, timestamp: Optional[float] = None):
         """
         Runs mediapipe model inference on the frame. The model determines landmarks of detected pose(s)
 
@@ -64,16 +148,32 @@ class PoseLandmarker(FeatureExtractor):
         image: np.ndarray, required
             Frame to be processed
 
+        timestamp: float, default=None
+            Capture time of the frame in seconds, used by the video and live_stream modes. The current time is used if None
+
 
         Returns
         ---
         res: dict[landmarks] or None
             Pose landmarker detection results or None if no pose is detected
+            With the array output format, a feature_extractor.LandmarkResult is returned instead of the dictionary
         """
         image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=image_rgb)
-        detection_result = self.pose.detect(mp_image)
-        res = {
-            'landmarks': detection_result.pose_landmarks,
-        }
-        return res
+
+        if self.running_mode == 'video':
+            detection_result = self.pose.detect_for_video(mp_image, self.timestamps.to_ms(timestamp))
+        elif self.running_mode == 'live_stream':
+            self.pose.detect_async(mp_image, self.timestamps.to_ms(timestamp))
+            with self.result_lock:
+                return self.latest_result
+        else:
+            detection_result = self.pose.detect(mp_image)
+        return self._format_result(detection_result)
+
+
+    def close(self) -> None:
+        """
+        Overrides feature_extractor.FeatureExtractor.close
+        """
+        self.pose.close()
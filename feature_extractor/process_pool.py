@@ -0,0 +1,241 @@
+import queue
+import signal
+import logging
+import traceback
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .feature_extractor import FeatureExtractor, resolve_extractor
+
+logger = logging.getLogger(__name__)
+
+# Extractors whose output depends on the previous frames (differences, gating, recording, playback).
+# Workers only see a scattered subset of the frames, so they can't be run in the pool
+STATEFUL_EXTRACTORS = ('FrameDiffCalculator', 'MotionGridExtractor', 'MotionGatedExtractor', 'RecordingExtractor', 'ReplayExtractor')
+
+
+def _worker_main(extractor_name: str, extractor_params: dict, task_queue, result_queue) -> None:
+    """
+    Main function of a worker process.
+    It instantiates its own extractor, then processes frames read from shared memory slots until it receives None.
+
+    Tasks are tuples (seq, slot_index, shm_name, shape, dtype, timestamp) and results are tuples (seq, slot_index, features, error)
+    """
+    # Interruptions are handled by the main process, which stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        extractor = resolve_extractor(extractor_name)(**extractor_params)
+    except Exception:
+        result_queue.put((-1, -1, None, traceback.format_exc()))
+        return
+    result_queue.put((-1, -1, 'ready', None))
+
+    attached: Dict[str, shared_memory.SharedMemory] = {}
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            seq, slot_index, shm_name, shape, dtype, timestamp = task
+            if shm_name not in attached:
+                attached[shm_name] = shared_memory.SharedMemory(name=shm_name)
+            frame = np.ndarray(shape, dtype=dtype, buffer=attached[shm_name].buf)
+            try:
+                result_queue.put((seq, slot_index, extractor.process(frame, timestamp), None))
+            except Exception:
+                result_queue.put((seq, slot_index, None, traceback.format_exc()))
+            del frame
+    finally:
+        for shm in attached.values():
+            shm.close()
+
+
+class ProcessPoolExtractor(FeatureExtractor):
+    """
+    Fans frames out to several worker processes, each one holding its own instance of a feature extractor (e.g HandLandmarker).
+    It allows to use several cores for inference, at the cost of some added latency.
+
+    Frames are passed to the workers through `multiprocessing.shared_memory` slots instead of being pickled.
+    As workers may finish out of order, results are re-ordered by frame sequence number before being returned,
+    so the mapper always receives features in capture order.
+
+    Processing is asynchronous: `process` submits the frame and returns the oldest result not delivered yet, which may belong to a previous frame.
+    If no new result is available, the last delivered one is returned again. At most `n_workers` frames are in flight at the same time.
+
+    Only stateless extractors are supported: every worker takes the next frame from a shared queue, so each one sees a scattered subset of the frames.
+    Extractors relying on the previous frames (frame differences, motion gating, recording) and landmarkers tracking between frames
+    (`running_mode` other than 'image', `roi=True`) are rejected with a ValueError.
+
+
+    Attributes
+    ---
+    result_seq: int
+        Sequence number (submission order) of the frame the last returned features belong to
+
+    frames_submitted: int
+        Number of frames sent to the workers
+    """
+
+    def __init__(self, extractor: str, extractor_params: Optional[dict] = None, n_workers: int = 2, start_method: str = 'spawn'):
+        """
+        Initializes the ProcessPoolExtractor and starts the workers.
+
+        Parameters
+        ---
+        extractor: str, required
+            Name of the feature extractor class run by the workers (e.g 'HandLandmarker')
+
+        extractor_params: dict, default=None
+            Parameters of the feature extractor
+
+        n_workers: int, default=2
+            Number of worker processes
+
+        start_method: str, default='spawn'
+            Multiprocessing start method. 'spawn' is the safest choice with MediaPipe
+        """
+        self._check_stateless(extractor, extractor_params or {})
+        self.extractor_name = extractor
+        self.n_workers = n_workers
+        self.n_slots = 2 * n_workers # a result can come back while the next frames are already submitted
+        self.slots: Optional[List[shared_memory.SharedMemory]] = None
+        self.frames: List[np.ndarray] = []
+        self.free_slots: List[int] = []
+        self.ready: Dict[int, Any] = {} # re-ordering buffer
+        self.next_seq = 0 # sequence number of the next submitted frame
+        self.next_result_seq = 0 # sequence number of the next result to deliver
+        self.last_result = None
+        self.result_seq = -1
+        self.frames_submitted = 0
+        ctx = mp.get_context(start_method)
+        self.task_queue = ctx.Queue()
+        self.result_queue = ctx.Queue()
+        self.workers = [
+            ctx.Process(target=_worker_main, args=(extractor, extractor_params or {}, self.task_queue, self.result_queue), daemon=True)
+            for _ in range(n_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+        # Waiting for every worker to be ready, so that model loading isn't part of the first frames
+        for _ in range(n_workers):
+            _, _, _, error = self.result_queue.get()
+            if error is not None:
+                self.close()
+                raise RuntimeError(f'Failed to start a {extractor} worker:\n{error}')
+        logger.info(f'{n_workers} {extractor} workers started')
+
+
+    @staticmethod
+    def _check_stateless(extractor: str, extractor_params: dict) -> None:
+        """
+        Raises a ValueError if the extractor keeps some state from one frame to the next, which can't be split across workers
+        """
+        if extractor in STATEFUL_EXTRACTORS:
+            raise ValueError(f'{extractor} depends on the previous frames and can\'t be run by a worker pool')
+        if extractor_params.get('running_mode', 'image') != 'image':
+            raise ValueError(f'{extractor} in {extractor_params["running_mode"]} mode tracks between frames, '
+                             'only the image running mode can be run by a worker pool')
+        if extractor_params.get('roi', False):
+            raise ValueError(f'{extractor} with roi=True tracks between frames and can\'t be run by a worker pool')
+
+
+    def _allocate_slots(self, frame: np.ndarray) -> None:
+        """
+        Creates the shared memory slots based on the shape and type of the first frame
+        """
+        self.slots = [shared_memory.SharedMemory(create=True, size=frame.nbytes) for _ in range(self.n_slots)]
+        self.frames = [np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf) for shm in self.slots]
+        self.free_slots = list(range(self.n_slots))
+        logger.debug(f'Allocated {self.n_slots} shared memory slots of shape {frame.shape} ({frame.dtype})')
+
+
+    def _collect(self, block: bool) -> None:
+        """
+        Moves results sent by the workers to the re-ordering buffer and frees their slots
+
+        Parameters
+        ---
+        block: bool, required
+            Whether to wait for at least one result
+        """
+        while True:
+            try:
+                seq, slot_index, features, error = self.result_queue.get(block=block, timeout=5. if block else None)
+            except queue.Empty:
+                if block:
+                    raise RuntimeError(f'No result received from the {self.extractor_name} workers for 5 seconds')
+                return
+            if error is not None:
+                raise RuntimeError(f'{self.extractor_name} worker failed on frame {seq}:\n{error}')
+            self.free_slots.append(slot_index)
+            self.ready[seq] = features
+            block = False
+
+
+    def process(self, frame: np.ndarray, timestamp: Optional[float] = None) -> Any:
+        """
+        Implementation of the abstract method coming from feature_extractor.FeatureExtractor class.
+        Submits the frame to the workers and returns the oldest result not delivered yet
+
+
+        Parameters
+        ---
+        frame: np.ndarray, required
+            Frame to be processed
+
+        timestamp: float, default=None
+            Capture time of the frame, forwarded to the wrapped extractor
+
+
+        Returns
+        ---
+        features: Any
+            Output of the wrapped extractor for frame `result_seq`
+        """
+        if self.slots is None:
+            self._allocate_slots(frame)
+
+        while not self.free_slots:
+            self._collect(block=True)
+
+        slot_index = self.free_slots.pop()
+        np.copyto(self.frames[slot_index], frame)
+        self.task_queue.put((self.next_seq, slot_index, self.slots[slot_index].name, frame.shape, frame.dtype.str, timestamp))
+        self.next_seq += 1
+        self.frames_submitted += 1
+
+        self._collect(block=False)
+        # No result delivered yet, or too many frames in flight: waiting for the next one in order
+        while self.next_result_seq not in self.ready and \
+                (self.last_result is None or self.next_seq - self.next_result_seq >= self.n_workers):
+            self._collect(block=True)
+
+        if self.next_result_seq in self.ready:
+            self.last_result = self.ready.pop(self.next_result_seq)
+            self.result_seq = self.next_result_seq
+            self.next_result_seq += 1
+        return self.last_result
+
+
+    def close(self) -> None:
+        """
+        Overrides feature_extractor.FeatureExtractor.close
+        Stops the workers and releases the shared memory slots
+        """
+        for worker in self.workers:
+            if worker.is_alive():
+                self.task_queue.put(None)
+        for worker in self.workers:
+            worker.join(timeout=2.)
+            if worker.is_alive():
+                worker.terminate()
+        self.frames = []
+        for shm in self.slots or []:
+            shm.close()
+            shm.unlink()
+        self.slots = None
+        logger.debug(f'{self.extractor_name} workers stopped')
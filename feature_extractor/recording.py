@@ -0,0 +1,317 @@
+import os
+import json
+import time
+import shutil
+import logging
+import numbers
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .feature_extractor import FeatureExtractor, resolve_extractor
+from .landmark_result import LandmarkResult
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureRecorder:
+    """
+    Writes the outputs of a feature extractor, with the timestamp and sequence number of their frame, to a compact columnar binary file.
+    Every column is a contiguous fixed-shape array, so that the file can be memory-mapped (see: class`FeatureRecording`).
+
+    Three kinds of outputs are supported, inferred from the first output which isn't None:
+    + landmarks (feature_extractor.LandmarkResult or the mediapipe dictionary): float32 arrays of `max_detections` detections, with a presence mask
+    + scalar (e.g feature_extractor.FrameDiffCalculator): float64 values, with a presence mask (None outputs aren't present)
+    + vector (e.g feature_extractor.MotionGridExtractor): float32 vectors of a fixed size, with a presence mask
+
+    File layout: magic bytes, header size (uint64), JSON header describing the columns, then every column aligned on 64 bytes.
+    While recording, rows are appended to one temporary file per column, which are gathered into the final file by `close`.
+    """
+
+    MAGIC = b'GCFREC01'
+    ALIGNMENT = 64
+
+    def __init__(self, path: str, max_detections: int = 2, metadata: Optional[dict] = None):
+        """
+        Initializes the FeatureRecorder.
+
+
+        Parameters
+        ---
+        path: str, required
+            Path of the recording file
+
+        max_detections: int, default=2
+            Maximum number of detections (hands or poses) recorded per frame. Additional detections are dropped
+
+        metadata: dict, default=None
+            Additional information stored in the header (e.g the extractor name)
+        """
+        self.path = path
+        self.max_detections = max_detections
+        self.metadata = metadata or {}
+        self.kind = None
+        self.columns: Dict[str, dict] = {}
+        self._files = {}
+        self._rows = {}
+        self._pending_missing = 0
+        self._dropped_detections = 0
+        self.n_frames = 0
+        self._add_column('seq', np.int64, ())
+        self._add_column('timestamp', np.float64, ())
+
+
+    def _add_column(self, name: str, dtype, shape: tuple) -> None:
+        """
+        Declares a column and opens its temporary file. The row buffer is reused for every frame
+        """
+        self.columns[name] = {'dtype': np.dtype(dtype).str, 'shape': list(shape)}
+        self._rows[name] = np.zeros(shape, dtype=dtype)
+        self._files[name] = open(f'{self.path}.{name}.tmp', 'wb')
+
+
+    def _init_kind(self, output: Any) -> None:
+        """
+        Declares the feature columns according to the kind of the first output which isn't None
+        """
+        if isinstance(output, (LandmarkResult, dict)):
+            result = LandmarkResult.from_features(output)
+            self.kind = 'landmarks'
+            self.n_landmarks = result.landmarks.shape[1]
+            shape = (self.max_detections, self.n_landmarks, 3)
+            self._add_column('landmarks', np.float32, shape)
+            self._add_column('world_landmarks', np.float32, shape)
+            self._add_column('handedness', np.int8, (self.max_detections,))
+            self._add_column('handedness_scores', np.float32, (self.max_detections,))
+            self._add_column('present', np.bool_, (self.max_detections,))
+        elif isinstance(output, np.ndarray):
+            self.kind = 'vector'
+            self._add_column('value', np.float32, (output.size,))
+            self._add_column('present', np.bool_, ())
+        elif output is None or isinstance(output, numbers.Number):
+            self.kind = 'scalar'
+            self._add_column('value', np.float64, ())
+            self._add_column('present', np.bool_, ())
+        else:
+            raise TypeError(f'Extractor outputs of type {type(output).__name__} cannot be recorded')
+
+        # Frames recorded before the kind was known have no feature
+        for _ in range(self._pending_missing):
+            self._write_features(None)
+        self._pending_missing = 0
+
+
+    def _write_features(self, output: Any) -> None:
+        """
+        Fills the row buffers of the feature columns and appends them to their files
+        """
+        rows = self._rows
+        if self.kind == 'landmarks':
+            for name in ('landmarks', 'world_landmarks', 'handedness', 'handedness_scores', 'present'):
+                rows[name].fill(0)
+            if output is not None:
+                result = LandmarkResult.from_features(output)
+                n = min(len(result), self.max_detections)
+                self._dropped_detections += len(result) - n
+                rows['landmarks'][:n] = result.landmarks[:n]
+                rows['world_landmarks'][:n] = result.world_landmarks[:n]
+                rows['handedness'][:n] = result.handedness[:n]
+                rows['handedness_scores'][:n] = result.handedness_scores[:n]
+                rows['present'][:n] = True
+            names = ('landmarks', 'world_landmarks', 'handedness', 'handedness_scores', 'present')
+        else:
+            rows['present'][...] = output is not None
+            if output is None:
+                rows['value'].fill(0)
+            elif self.kind == 'vector':
+                if output.size != rows['value'].size:
+                    raise ValueError(f'Recorded vectors have {rows["value"].size} values, got {output.size}')
+                rows['value'][:] = output.ravel()
+            else:
+                rows['value'][...] = output
+            names = ('value', 'present')
+        for name in names:
+            self._files[name].write(rows[name].tobytes())
+
+
+    def write(self, seq: int, timestamp: float, output: Any) -> None:
+        """
+        Appends the output of the extractor for one frame
+
+
+        Parameters
+        ---
+        seq: int, required
+            Sequence number of the frame
+
+        timestamp: float, required
+            Capture time of the frame in seconds
+
+        output: Any, required
+            Output of the extractor
+        """
+        self._rows['seq'][...] = seq
+        self._rows['timestamp'][...] = timestamp
+        self._files['seq'].write(self._rows['seq'].tobytes())
+        self._files['timestamp'].write(self._rows['timestamp'].tobytes())
+
+        if self.kind is None and output is not None:
+            self._init_kind(output)
+        if self.kind is None:
+            self._pending_missing += 1
+        else:
+            self._write_features(output)
+        self.n_frames += 1
+
+
+    def close(self) -> None:
+        """
+        Gathers the temporary column files into the recording file
+        """
+        if self.kind is None:
+            self._init_kind(None)
+        for f in self._files.values():
+            f.close()
+
+        offset = 0
+        for column in self.columns.values():
+            column['offset'] = offset
+            row_size = np.dtype(column['dtype']).itemsize * int(np.prod(column['shape']))
+            offset += -(-row_size * self.n_frames // self.ALIGNMENT) * self.ALIGNMENT
+        header = {
+            'version': 1,
+            'n_frames': self.n_frames,
+            'kind': self.kind,
+            'max_detections': self.max_detections,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'metadata': self.metadata,
+            'columns': self.columns,
+        }
+        header_bytes = json.dumps(header).encode()
+
+        with open(self.path, 'wb') as f:
+            f.write(self.MAGIC)
+            f.write(np.uint64(len(header_bytes)).tobytes())
+            f.write(header_bytes)
+            data_start = -(-f.tell() // self.ALIGNMENT) * self.ALIGNMENT
+            for name, column in self.columns.items():
+                f.write(b'\0' * (data_start + column['offset'] - f.tell()))
+                with open(f'{self.path}.{name}.tmp', 'rb') as column_file:
+                    shutil.copyfileobj(column_file, f)
+                os.remove(f'{self.path}.{name}.tmp')
+
+        if self._dropped_detections:
+            logger.warning(f'{self._dropped_detections} detections beyond max_detections={self.max_detections} were not recorded')
+        logger.info(f'Recorded {self.n_frames} frames ({self.kind}) to {self.path}')
+
+
+class FeatureRecording:
+    """
+    Memory-mapped reader of a file written by a FeatureRecorder.
+    Columns are exposed as read-only numpy arrays (e.g `recording.columns['timestamp']`), and `recording[i]` rebuilds the output of the extractor for the i-th frame.
+    Mappers can then be iterated over a recording without any camera nor model.
+    """
+
+    def __init__(self, path: str):
+        """
+        Opens a recording file.
+
+
+        Parameters
+        ---
+        path: str, required
+            Path of the recording file
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(FeatureRecorder.MAGIC)) != FeatureRecorder.MAGIC:
+                raise ValueError(f'{path} is not a feature recording')
+            header_size = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            self.header = json.loads(f.read(header_size))
+            data_start = -(-f.tell() // FeatureRecorder.ALIGNMENT) * FeatureRecorder.ALIGNMENT
+
+        self.kind = self.header['kind']
+        self.n_frames = self.header['n_frames']
+        self.columns: Dict[str, np.ndarray] = {}
+        for name, column in self.header['columns'].items():
+            shape = (self.n_frames, *column['shape'])
+            if self.n_frames == 0:
+                self.columns[name] = np.empty(shape, dtype=column['dtype'])
+            else:
+                self.columns[name] = np.memmap(path, dtype=column['dtype'], mode='r', offset=data_start + column['offset'], shape=shape)
+        self.seq = self.columns['seq']
+        self.timestamps = self.columns['timestamp']
+
+
+    def __len__(self) -> int:
+        return self.n_frames
+
+
+    def __getitem__(self, index: int) -> Any:
+        """
+        Output of the extractor for the frame at the given index:
+        a feature_extractor.LandmarkResult, a float (or None) or a read-only float32 vector (or None) depending on the kind of the recording
+        """
+        columns = self.columns
+        present = columns['present'][index]
+        if self.kind == 'landmarks':
+            return LandmarkResult(
+                columns['landmarks'][index][present],
+                columns['world_landmarks'][index][present],
+                columns['handedness'][index][present],
+                columns['handedness_scores'][index][present],
+            )
+        if not present:
+            return None
+        if self.kind == 'vector':
+            return columns['value'][index]
+        return float(columns['value'][index])
+
+
+class RecordingExtractor(FeatureExtractor):
+    """
+    Wraps any feature extractor and records its outputs to a file (see: class`FeatureRecorder`), which can then be replayed by a feature_extractor.ReplayExtractor
+    Outputs of the wrapped extractor are returned unchanged, so that the scenario runs as usual while being recorded.
+    """
+
+    def __init__(self, extractor: str, extractor_params: Optional[dict] = None, path: str = 'recording.gcfrec', max_detections: int = 2):
+        """
+        Initializes the RecordingExtractor.
+
+        Parameters
+        ---
+        extractor: str, required
+            Name of the wrapped feature extractor class (e.g 'HandLandmarker')
+
+        extractor_params: dict, default=None
+            Parameters of the wrapped feature extractor
+
+        path: str, default='recording.gcfrec'
+            Path of the recording file
+
+        max_detections: int, default=2
+            Maximum number of detections recorded per frame (landmark extractors only)
+        """
+        self.extractor = resolve_extractor(extractor)(**(extractor_params or {}))
+        self.recorder = FeatureRecorder(path, max_detections, metadata={'extractor': extractor, 'extractor_params': extractor_params or {}})
+        self.seq = 0
+
+
+    def process(self, frame: np.ndarray, timestamp: Optional[float] = None) -> Any:
+        """
+        Implementation of the abstract method coming from feature_extractor.FeatureExtractor class.
+        Runs the wrapped extractor and records its output
+        """
+        features = self.extractor.process(frame, timestamp)
+        self.recorder.write(self.seq, timestamp if timestamp is not None else time.perf_counter(), features)
+        self.seq += 1
+        return features
+
+
+    def close(self) -> None:
+        """
+        Overrides feature_extractor.FeatureExtractor.close
+        Writes the recording file and closes the wrapped extractor
+        """
+        self.recorder.close()
+        self.extractor.close()
@@ -0,0 +1,99 @@
+import time
+import logging
+from typing import Any, Optional
+
+import numpy as np
+
+from .feature_extractor import FeatureExtractor
+from .recording import FeatureRecording
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayExtractor(FeatureExtractor):
+    """
+    Streams back the outputs recorded by a feature_extractor.RecordingExtractor, ignoring the frames it's given.
+    The recording is memory-mapped (see: class`feature_extractor.FeatureRecording`), so that mappers and audio generators
+    can be tuned on a session without any camera nor model (e.g with a video.BlankVideo input).
+
+    With `timing='original'`, the output returned for a frame is the last one recorded before the time elapsed since the first call
+    (multiplied by `speed`): the original timing is reproduced whatever the framerate of the video input.
+    With `timing='unthrottled'`, one recorded output is returned per call, as fast as the pipeline runs.
+    """
+
+    TIMINGS = ('original', 'unthrottled')
+
+    def __init__(self, path: str, speed: float = 1.0, timing: str = 'original', loop: bool = False):
+        """
+        Initializes the ReplayExtractor.
+
+        Parameters
+        ---
+        path: str, required
+            Path of the recording file
+
+        speed: float, default=1.0
+            Playback speed of the recording when timing='original' (e.g 4.0 to replay 4 times faster)
+
+        timing: str, default='original'
+            'original' to follow the recorded timestamps, 'unthrottled' to return the next recorded output at every call
+
+        loop: bool, default=False
+            Whether to restart from the beginning at the end of the recording. Otherwise the last output is returned again
+        """
+        if timing not in self.TIMINGS:
+            raise ValueError(f'Unknown timing {timing}. Expected one of {self.TIMINGS}')
+        if speed <= 0:
+            raise ValueError(f'speed must be positive, got {speed}')
+        self.recording = FeatureRecording(path)
+        if len(self.recording) == 0:
+            raise ValueError(f'{path} does not contain any frame')
+        self.speed = speed
+        self.timing = timing
+        self.loop = loop
+
+        # Timestamps relative to the first frame, in seconds of playback
+        self.offsets = (self.recording.timestamps - self.recording.timestamps[0]) / speed
+        self.duration = float(self.offsets[-1])
+        self.index = -1
+        self.start_time = None
+        self.end_logged = False
+        logger.info(f'Replaying {len(self.recording)} frames ({self.recording.kind}) from {path}, '
+                    f'{self.duration * speed:.1f}s recorded, {timing} timing')
+
+
+    def _next_index(self, now: float) -> int:
+        """
+        Index of the recorded frame to return at the given time
+        """
+        n = len(self.recording)
+        if self.timing == 'unthrottled':
+            index = self.index + 1
+            if index >= n:
+                return index % n if self.loop else n - 1
+            return index
+
+        if self.start_time is None:
+            self.start_time = now
+        elapsed = now - self.start_time
+        if elapsed > self.duration:
+            if not self.loop:
+                return n - 1
+            # A frame period is kept between the last frame and the first one of the next loop
+            cycle = self.duration + self.duration / max(n - 1, 1)
+            if cycle == 0:
+                return 0
+            elapsed %= cycle
+        return int(np.searchsorted(self.offsets, elapsed, side='right')) - 1
+
+
+    def process(self, frame: np.ndarray, timestamp: Optional[float] = None) -> Any:
+        """
+        Implementation of the abstract method coming from feature_extractor.FeatureExtractor class.
+        The frame is ignored, the recorded output due at the current time is returned
+        """
+        self.index = self._next_index(time.perf_counter())
+        if self.index == len(self.recording) - 1 and not self.loop and not self.end_logged:
+            self.end_logged = True
+            logger.info('End of the recording reached, the last output is returned from now on')
+        return self.recording[self.index]
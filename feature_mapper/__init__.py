@@ -1,11 +1,13 @@
-from .pinch_mapper import PinchGestureMapper
-from .pulse_mapper import PulseMapper
+from utils import registry
 
-# Step 5. of the tutorial on how to create a feature extractor
-from .barycenter_mapper import BarycenterMapper
+# Classes are imported on first access only (see utils.registry)
+MODULES = {
+    'PinchGestureMapper': '.pinch_mapper',
+    'PulseMapper': '.pulse_mapper',
+    # Step 5. of the tutorial on how to create a feature mapper
+    'BarycenterMapper': '.barycenter_mapper',
+}
 
-__all__ = [
-    'PinchGestureMapper',
-    'PulseMapper',
-    'BarycenterMapper'
-]
+__all__ = list(MODULES)
+
+__getattr__ = registry.lazy_getattr(__name__, MODULES)
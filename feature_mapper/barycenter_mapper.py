@@ -5,6 +5,7 @@ The step-by-step creation of this class is detailed in the README file of this m
 
 # 2. Necessary imports
 from .mapper import Mapper
+from feature_extractor.landmark_result import LandmarkResult
 import numpy as np
 
 import logging
@@ -25,14 +26,14 @@ class BarycenterMapper(Mapper):
 
 
     # 4. Implementation of the process_feature abstract method defined in Mapper
-    def process_features(self, raw_landmarker_data: dict) -> dict:
+    def process_features(self, raw_landmarker_data) -> dict:
         """
         Calculates the barycenter of hand landmarks and maps it to audio parameters
 
 
         Parameters:
         ---
-        raw_landmarker_data: dict
+        raw_landmarker_data: dict or feature_extractor.LandmarkResult
             Contains landmarks and handedness of every detected hand
 
 
@@ -41,32 +42,32 @@ class BarycenterMapper(Mapper):
         audio_params: dict
             Mapped frequency and volume to be output by the audio output module
         """
-        hand_landmarks = raw_landmarker_data['landmarks']
+        landmarker_result = LandmarkResult.from_features(raw_landmarker_data)
 
-        if hand_landmarks:
+        if len(landmarker_result):
             # Only processing the first detected hand
-            landmarks = hand_landmarks[0]
+            landmarks = landmarker_result.landmarks[0]
 
-            barycenter_x = self._compute_barycenter_1D([lm.x for lm in landmarks])
-            barycenter_y = self._compute_barycenter_1D([lm.y for lm in landmarks])
+            barycenter_x, barycenter_y = self._compute_barycenter_2D(landmarks[:, :2])
 
             self.audio_params['tempo'] = barycenter_y
             self.audio_params['resonance'] = barycenter_x
-           
+
         return self.audio_params
 
 
-    def _compute_barycenter_1D(self, coordinates: list) -> float:
+    def _compute_barycenter_2D(self, coordinates: np.ndarray) -> tuple:
         """
-        Helper function computing to compute the barycenter along x and y axes of the landmarks
+        Helper function computing the barycenter along x and y axes of the landmarks
 
         Parameters
         ---
-        coordinates, list, required
-            Coordinates of the landmarks along one axis (x or y)
+        coordinates, np.ndarray, required
+            (x, y) coordinates of the landmarks, with shape (n_landmarks, 2)
 
         Returns
         ---
-        mean of the list (i.e 1D Barycenter)
+        (x, y) barycenter as python floats
         """
-        return np.mean(coordinates)
+        barycenter = coordinates.mean(axis=0)
+        return float(barycenter[0]), float(barycenter[1])
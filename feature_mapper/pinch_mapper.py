@@ -1,6 +1,5 @@
-from utils.mediapipe import convert_to_landmark_list
+from feature_extractor.landmark_result import LandmarkResult
 from .mapper import Mapper
-import math
 import numpy as np
 
 class PinchGestureMapper(Mapper):
@@ -32,7 +31,7 @@ class PinchGestureMapper(Mapper):
 
         Parameters
         ---
-        raw_landmarker_data: dict, required
+        raw_landmarker_data: dict or feature_extractor.LandmarkResult, required
             Contains landmarks and handednes every detected hands
 
 
@@ -41,24 +40,21 @@ class PinchGestureMapper(Mapper):
         audio_params: dict
             Mapped frequency and volume to be output by the audio output module
         """
-        hands_lms =  raw_landmarker_data['landmarks']
-        handedness =  raw_landmarker_data['handedness']
-        assert len(hands_lms) == len(handedness)
-
-
-        if hands_lms:
-            for lms, handedness in zip(hands_lms, handedness):
-                if handedness[0].display_name == 'Right':
-                    lms_list = convert_to_landmark_list(lms).landmark
-                    index_pos = lms_list[8]
-                    thumb_pos = lms_list[4]
-                    distance = math.dist([index_pos.x, index_pos.y], [thumb_pos.x, thumb_pos.y])
-                    middle = np.mean([index_pos.x, thumb_pos.x]), np.mean([index_pos.y, thumb_pos.y])
-                    if distance < 0.1:
-                        freq = 100000/((middle[0]**2) * 1000 + 100)
-                        volume = middle[1]
-
-                        self.audio_params['frequency'] = freq
-                        self.audio_params['volume'] = volume
+        landmarker_result = LandmarkResult.from_features(raw_landmarker_data)
+        assert len(landmarker_result.landmarks) == len(landmarker_result.handedness)
+
+        if len(landmarker_result):
+            # (x, y) of the index tip (8) and thumb tip (4) of every right hand, shape (n_right_hands, 2, 2)
+            tips = landmarker_result.landmarks[landmarker_result.handedness == LandmarkResult.RIGHT][:, [8, 4], :2]
+            distances = np.linalg.norm(tips[:, 0] - tips[:, 1], axis=-1)
+            pinching = np.flatnonzero(distances < 0.1)
+            if pinching.size:
+                # As several right hands can be detected, the last pinching one is kept
+                middle = tips[pinching[-1]].mean(axis=0)
+                freq = 100000/((middle[0]**2) * 1000 + 100)
+                volume = middle[1]
+
+                self.audio_params['frequency'] = float(freq)
+                self.audio_params['volume'] = float(volume)
 
         return self.audio_params
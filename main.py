@@ -1,50 +1,182 @@
+import json
 import logging
+import time
 import numpy as np
-import cv2
-import yaml
 
 # Display
-from display import Display
-from utils.display_components import create_fps_counter
-from utils.file_parsers import parse_yml
+from display import NullDisplay
+from utils.latency import FrameTrace, LatencyCollector
+from utils.pipeline import Pipeline, MultiPipeline
 from utils.scenario import Scenario
 
 logger = logging.getLogger(__name__)
 
+RUNTIME_MODES = ('serial', 'pipelined')
 
-def main(scenario_file: str):
+
+def run_serial(scenario: Scenario, display):
+    """
+    Runs capture, extraction, mapping and output one after another in the main thread
+    """
+    while scenario.video_input.is_alive():
+        # Frame acquisition
+        slot = scenario.video_input.get_frame_slot()
+        if slot is None:
+            continue
+        frame: np.ndarray = slot.data
+        trace = FrameTrace(slot.seq, slot.timestamp, slot.sensor_timestamp)
+
+        # feature extractor output
+        trace.extract_start = time.perf_counter()
+        features = scenario.feature_extractor.process(frame, slot.timestamp)
+        trace.extract_end = time.perf_counter()
+
+        # mapping between features and audio data
+        audio_params = scenario.feature_mapper.process_features(features)
+        trace.map_end = time.perf_counter()
+
+        # sending audio params
+        scenario.audio_generator.send(audio_params, trace)
+
+        # frame to display
+        display.frame = frame
+
+
+def run_pipelined(scenario: Scenario, display):
+    """
+    Runs extraction, mapping and output in their own threads, connected by queues configured in the runtime section of the scenario
+    See: class`utils.pipeline.Pipeline`
+    """
+    pipeline = Pipeline(scenario, display, scenario.runtime.get('queues'))
+    pipeline.start()
+    try:
+        while scenario.video_input.is_alive() and pipeline.is_alive():
+            scenario.video_input.join(timeout=0.1)
+    finally:
+        pipeline.stop()
+
+
+def create_display(runtime: dict, headless: bool = False):
+    """
+    Creates the feedback display, replaced by a no-op sink when running headless (no window, GUI modules not imported)
+    """
+    display_params = runtime.get('display') or {}
+    if headless or runtime.get('headless', False):
+        return NullDisplay(**display_params)
+    from display import Display
+    from utils.display_components import create_fps_counter
+    display = Display(**display_params)
+    display.add_component(create_fps_counter(display))
+    return display
+
+
+def main(scenario_file: str, latency_report: str = None, headless: bool = False):
     logging.basicConfig(level=logging.DEBUG)
 
     scenario: Scenario = Scenario(scenario_file)
+    runtime_mode = scenario.runtime.get('mode', 'serial')
+    if runtime_mode not in RUNTIME_MODES:
+        raise ValueError(f'Unknown runtime mode {runtime_mode}. Choose between {RUNTIME_MODES}')
 
     #feedback display
-    display = Display()
+    display = create_display(scenario.runtime, headless)
+
+    # Per stage latency measurements
+    latency_collector = LatencyCollector()
+    scenario.audio_generator.latency_collector = latency_collector
+
+    # Optional recording of every captured frame, written from its own thread
+    frame_recorder = None
+    recorder_params = scenario.runtime.get('frame_recorder')
+    if recorder_params:
+        from video.frame_recorder import FrameRecorder
+        frame_recorder = FrameRecorder(**recorder_params)
+        scenario.video_input.add_sink(frame_recorder)
+        frame_recorder.start()
 
     # Starting input and output threads
     scenario.video_input.start()
     scenario.audio_generator.start()
 
-    # Display config
-    fps_counter = create_fps_counter(display)
-    display.add_component(fps_counter)
     display.start()
 
     try:
-        while scenario.video_input.is_alive():
-            # Frame acquisition
-            frame: np.ndarray = scenario.video_input.get_frame()
+        if runtime_mode == 'pipelined':
+            run_pipelined(scenario, display)
+        else:
+            run_serial(scenario, display)
 
-            # feature extractor output
-            features = scenario.feature_extractor.process(frame)
+    except KeyboardInterrupt:
+        pass
 
-            # mapping between features and audio data
-            # audio_params = scenario.feature_mapper.process_features(features)
+    finally:
+        # Stop all the threads
+        display.stop()
+        scenario.video_input.stop()
+        if frame_recorder is not None:
+            frame_recorder.close()
+        scenario.audio_generator.stop()
+        scenario.feature_extractor.close()
+
+        latency_collector.log_summary()
+        if latency_report:
+            latency_collector.dump(latency_report)
+
+def main_multi(scenario_files: list, latency_report: str = None, headless: bool = False):
+    """
+    Runs several scenarios in one process (see: class`utils.pipeline.MultiPipeline`).
+    Identical video inputs and feature extractors are created once and shared, mappers and audio generators are created per scenario.
+    The display and headless settings are taken from the runtime section of the first scenario.
+    A frame recorder is attached to every distinct video input whose scenario defines one (the first definition wins).
+    Runtime settings which don't apply are logged as ignored
+    """
+    logging.basicConfig(level=logging.DEBUG)
 
-            # sending audio params
-            # scenario.audio_generator.data_to_send = audio_params
+    shared_modules = {}
+    scenarios = [Scenario(scenario_file, shared_modules) for scenario_file in scenario_files]
+    display = create_display(scenarios[0].runtime, headless)
+    pipeline = MultiPipeline(scenarios, display)
+
+    for scenario in scenarios:
+        if scenario.runtime.get('mode', 'serial') != 'serial':
+            logger.warning(f'Scenario {scenario.name}: runtime.mode is ignored, several scenarios always run in pipelined workers')
+        if 'params' in (scenario.runtime.get('queues') or {}):
+            logger.warning(f'Scenario {scenario.name}: runtime.queues.params is ignored, mapping and output run in the same worker')
+        if any(scenario.runtime.get(key) != scenarios[0].runtime.get(key) for key in ('display', 'headless')):
+            logger.warning(f'Scenario {scenario.name}: runtime display settings are ignored, they are taken from the first scenario')
+
+    # Optional recording of the frames of every distinct video input, written from their own threads
+    frame_recorders = {}
+    for scenario in scenarios:
+        recorder_params = scenario.runtime.get('frame_recorder')
+        if not recorder_params:
+            continue
+        video_key = scenario.module_keys['video_input']
+        if video_key in frame_recorders:
+            logger.warning(f'Scenario {scenario.name}: runtime.frame_recorder is ignored, its video input is already recorded by another scenario')
+            continue
+        from video.frame_recorder import FrameRecorder
+        frame_recorders[video_key] = FrameRecorder(**recorder_params)
+        scenario.video_input.add_sink(frame_recorders[video_key])
+        frame_recorders[video_key].start()
+
+    # Per chain latency measurements
+    latency_collectors = {name: LatencyCollector() for name in pipeline.chains}
+    for name, scenario in pipeline.chains.items():
+        scenario.audio_generator.latency_collector = latency_collectors[name]
 
-            # frame to display
-            display.frame = frame
+    # Starting input and output threads
+    for video_input in pipeline.video_inputs:
+        video_input.start()
+    for scenario in scenarios:
+        scenario.audio_generator.start()
+
+    display.start()
+    pipeline.start()
+
+    try:
+        while pipeline.is_alive():
+            time.sleep(0.1)
 
     except KeyboardInterrupt:
         pass
@@ -52,13 +184,31 @@ def main(scenario_file: str):
     finally:
         # Stop all the threads
         display.stop()
-        scenario.video_input.stop()
-        scenario.audio_generator.stop()
+        for video_input in pipeline.video_inputs:
+            video_input.stop()
+        for frame_recorder in frame_recorders.values():
+            frame_recorder.close()
+        pipeline.stop()
+        for scenario in scenarios:
+            scenario.audio_generator.stop()
+        for key in set(scenario.module_keys['feature_extractor'] for scenario in scenarios):
+            shared_modules[key].close()
+
+        for name, latency_collector in latency_collectors.items():
+            latency_collector.log_summary(label=name)
+        if latency_report:
+            with open(latency_report, 'w') as f:
+                json.dump({name: latency_collector.summary() for name, latency_collector in latency_collectors.items()}, f, indent=2)
 
 import argparse
 parser = argparse.ArgumentParser()
-parser.add_argument('-s', '--scenario', type=str, help='Scenario to load (.yml format)')
+parser.add_argument('-s', '--scenario', type=str, nargs='+', help='Scenario(s) to load (.yml format). Several scenarios run in one process, sharing identical video inputs and feature extractors')
+parser.add_argument('--latency-report', type=str, default=None, help='Optional JSON file the per stage latency summary is written to on shutdown')
+parser.add_argument('--headless', action='store_true', help='Run without display window (also settable with runtime.headless in the scenario)')
 # ENTRY POINT
 if __name__ == "__main__":
     args = parser.parse_args()
-    main(scenario_file=args.scenario)
+    if len(args.scenario) > 1:
+        main_multi(scenario_files=args.scenario, latency_report=args.latency_report, headless=args.headless)
+    else:
+        main(scenario_file=args.scenario[0], latency_report=args.latency_report, headless=args.headless)
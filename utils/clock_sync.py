@@ -0,0 +1,164 @@
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+
+class ClockSync:
+    """
+    Maps the clock of a device (e.g the timestamp counter of a camera) to the host monotonic time.perf_counter clock.
+    The mapping host = slope * device + intercept is refined continuously by a linear fit over a rolling window of (device, host) pairs,
+    so that both the offset and the drift between the two clocks are followed.
+
+    Two kinds of pairs are supported:
+    + reference pairs (`envelope=False`), where both times were taken at the same instant, e.g the device clock latched by the host.
+      The mapping is a least squares fit of the pairs
+    + arrival pairs (`envelope=True`), where the host time is taken when the data stamped by the device is received, hence late by a variable
+      transfer delay. Only the least delayed pair of every `interval` is kept, the slope is fitted over these pairs
+      and the line is shifted down to their lower envelope. Mapped times then include the minimal transfer delay but none of its jitter
+
+    The slope is only fitted once the window spans `min_span` seconds, as a shorter span can't tell drift from jitter. It's 1 before.
+
+
+    Attributes
+    ---
+    slope: float
+        Host seconds per device second
+
+    intercept: float
+        Host time of the first device time
+
+    n_samples: int
+        Total number of pairs added
+    """
+
+    def __init__(self, window: int = 256, envelope: bool = False, interval: float = 0.1, min_span: float = 1.0):
+        """
+        Initializes the ClockSync.
+
+        Parameters
+        ---
+        window: int, default=256
+            Number of most recent pairs the mapping is fitted on
+
+        envelope: bool, default=False
+            Whether pairs are arrival pairs, whose host times are delayed (see above)
+
+        interval: float, default=0.1
+            Device time in seconds over which the least delayed arrival pair is kept (envelope mode only)
+
+        min_span: float, default=1.0
+            Device time in seconds the window must span before the slope is fitted
+        """
+        self.window = window
+        self.envelope = envelope
+        self.interval = interval
+        self.min_span = min_span
+        self.device_times = deque(maxlen=window)
+        self.host_times = deque(maxlen=window)
+        self.device_reference = None
+        self.slope = 1.
+        self.intercept = 0.
+        self.n_samples = 0
+        self._bucket_start = None
+        self._bucket_best = None
+
+
+    @property
+    def calibrated(self) -> bool:
+        """
+        Whether at least one pair was added, so that device times can be mapped
+        """
+        return self.n_samples > 0
+
+
+    def add(self, device_time: float, host_time: float) -> None:
+        """
+        Adds a pair of times and refits the mapping if required
+
+
+        Parameters
+        ---
+        device_time: float, required
+            Time given by the device clock, in seconds
+
+        host_time: float, required
+            Corresponding time.perf_counter time, in seconds
+        """
+        if self.device_reference is None:
+            # Device times are fitted relative to the first one to keep the precision of float64
+            self.device_reference = device_time
+            self._bucket_start = 0.
+        device_time -= self.device_reference
+        self.n_samples += 1
+
+        if not self.envelope:
+            self._append(device_time, host_time)
+            return
+
+        # A less delayed pair lowers the envelope right away, the slope is only refitted once per interval
+        offset = host_time - self.slope * device_time
+        if self.n_samples == 1 or offset < self.intercept:
+            self.intercept = offset
+        if self._bucket_best is None or offset < self._bucket_best[2]:
+            self._bucket_best = (device_time, host_time, offset)
+        if device_time - self._bucket_start >= self.interval:
+            self._append(*self._bucket_best[:2])
+            self._bucket_start = device_time
+            self._bucket_best = None
+
+
+    def _append(self, device_time: float, host_time: float) -> None:
+        """
+        Adds a pair to the fitting window and refits the mapping
+        """
+        self.device_times.append(device_time)
+        self.host_times.append(host_time)
+        self.fit()
+
+
+    def fit(self) -> None:
+        """
+        Fits the mapping over the current window
+        """
+        device = np.fromiter(self.device_times, dtype=np.float64)
+        host = np.fromiter(self.host_times, dtype=np.float64)
+        if device.size == 0:
+            return
+        if device[-1] - device[0] >= self.min_span:
+            centered = device - device.mean()
+            self.slope = float(np.dot(centered, host - host.mean()) / np.dot(centered, centered))
+        residuals = host - self.slope * device
+        self.intercept = float(residuals.min() if self.envelope else residuals.mean())
+
+
+    def to_host(self, device_time: float) -> Optional[float]:
+        """
+        Maps a device time to the host clock
+
+
+        Parameters
+        ---
+        device_time: float, required
+            Time given by the device clock, in seconds
+
+
+        Returns
+        ---
+        host_time: float or None
+            Corresponding time.perf_counter time in seconds, or None if no pair was added yet
+        """
+        if not self.calibrated:
+            return None
+        return self.slope * (device_time - self.device_reference) + self.intercept
+
+
+    def residual_spread(self) -> float:
+        """
+        Standard deviation in seconds of the host times of the window around the fitted mapping
+        """
+        if not self.device_times:
+            return float('nan')
+        device = np.fromiter(self.device_times, dtype=np.float64)
+        host = np.fromiter(self.host_times, dtype=np.float64)
+        return float(np.std(host - (self.slope * device + self.intercept)))
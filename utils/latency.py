@@ -0,0 +1,176 @@
+import json
+import logging
+from collections import deque
+from threading import Lock
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FrameTrace:
+    """
+    Timing record following a frame through every stage of the pipeline.
+    All the timestamps come from the monotonic time.perf_counter clock, in seconds. A stage which wasn't reached is None.
+
+
+    Attributes
+    ---
+    seq: int
+        Sequence number of the frame, as given by the video input
+
+    capture: float
+        Time at which the frame was grabbed by the video input
+
+    sensor: float
+        Time at which the device captured the frame (see: attribute`video.FrameSlot.sensor_timestamp`), None if unknown
+
+    extract_start: float
+        Time at which the feature extractor started processing the frame
+
+    extract_end: float
+        Time at which the features were available
+
+    map_end: float
+        Time at which the audio parameters were available
+
+    audio_dispatch: float
+        Time at which the audio generator output the parameters
+    """
+    __slots__ = ('seq', 'capture', 'sensor', 'extract_start', 'extract_end', 'map_end', 'audio_dispatch')
+
+    def __init__(self, seq: int, capture: float, sensor: Optional[float] = None):
+        self.seq = seq
+        self.capture = capture
+        self.sensor = sensor
+        self.extract_start = None
+        self.extract_end = None
+        self.map_end = None
+        self.audio_dispatch = None
+
+
+class LatencyCollector:
+    """
+    Collects completed FrameTrace records and keeps, for every stage of the pipeline, a rolling window of the most recent durations.
+    Percentiles are computed on demand from these windows, so recording a trace costs a few appends only.
+
+    The durations kept are:
+    + queue: from capture to the beginning of the extraction (time spent waiting for the main loop)
+    + extract: feature extraction
+    + map: feature mapping
+    + dispatch: from the mapper output to the audio generator output
+    + total: from capture to the audio generator output
+    + transfer: from the capture by the device to the capture by the video input (exposure, readout, transfer and conversion)
+    + sensor_total: from the capture by the device to the audio generator output
+    The last two are only available with video inputs providing sensor timestamps (e.g video.Flircam)
+    """
+
+    # name: (start attribute, end attribute)
+    STAGES = {
+        'queue': ('capture', 'extract_start'),
+        'extract': ('extract_start', 'extract_end'),
+        'map': ('extract_end', 'map_end'),
+        'dispatch': ('map_end', 'audio_dispatch'),
+        'total': ('capture', 'audio_dispatch'),
+        'transfer': ('sensor', 'capture'),
+        'sensor_total': ('sensor', 'audio_dispatch'),
+    }
+
+    def __init__(self, window: int = 1000):
+        """
+        Initializes the LatencyCollector.
+
+        Parameters
+        ---
+        window: int, default=1000
+            Number of most recent samples kept per stage
+        """
+        self.window = window
+        self.durations = {stage: deque(maxlen=window) for stage in self.STAGES}
+        self.n_traces = 0
+        self.lock = Lock()
+
+
+    def record(self, trace: FrameTrace) -> None:
+        """
+        Adds the durations of every stage reached by the trace to the rolling windows
+        It's safe to call it from any thread
+
+        Parameters
+        ---
+        trace: FrameTrace, required
+            Trace to record
+        """
+        with self.lock:
+            self.n_traces += 1
+            for stage, (start, end) in self.STAGES.items():
+                t_start, t_end = getattr(trace, start), getattr(trace, end)
+                if t_start is not None and t_end is not None:
+                    self.durations[stage].append(t_end - t_start)
+
+
+    def summary(self, percentiles=(50, 95, 99)) -> Dict[str, Optional[Dict[str, float]]]:
+        """
+        Computes latency percentiles of every stage over the current windows
+
+        Parameters
+        ---
+        percentiles: tuple, default=(50, 95, 99)
+            Percentiles to compute
+
+        Returns
+        ---
+        summary: dict
+            For every stage, a dictionary { 'p50': ..., 'p95': ..., 'p99': ..., 'count': ... } with durations in milliseconds
+            or None if no sample was recorded for that stage
+        """
+        with self.lock:
+            samples = {stage: np.fromiter(values, dtype=np.float64) for stage, values in self.durations.items()}
+
+        summary = {}
+        for stage, values in samples.items():
+            if values.size == 0:
+                summary[stage] = None
+                continue
+            stats = {f'p{p}': float(v) for p, v in zip(percentiles, np.percentile(values, percentiles) * 1000)}
+            stats['count'] = int(values.size)
+            summary[stage] = stats
+        return summary
+
+
+    def log_summary(self, level: int = logging.INFO, label: Optional[str] = None) -> None:
+        """
+        Logs the latency percentiles of every stage in a human readable table
+
+        Parameters
+        ---
+        level: int, default=logging.INFO
+            Logging level
+
+        label: str, default=None
+            Name of the traced chain, if several ones are collected (see: function`main.main_multi`)
+        """
+        summary = self.summary()
+        lines = [f'Latency summary{f" of {label}" if label else ""} over {self.n_traces} traced frames (ms):']
+        for stage, stats in summary.items():
+            if stats is None:
+                # Sensor stages are only measured with some video inputs
+                if self.STAGES[stage][0] != 'sensor':
+                    lines.append(f'  {stage:<12} no sample')
+            else:
+                lines.append(f'  {stage:<12} p50={stats["p50"]:8.3f}  p95={stats["p95"]:8.3f}  p99={stats["p99"]:8.3f}  (n={stats["count"]})')
+        logger.log(level, '\n'.join(lines))
+
+
+    def dump(self, path: str) -> None:
+        """
+        Writes the latency summary to a JSON file
+
+        Parameters
+        ---
+        path: str, required
+            Destination file
+        """
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
@@ -1,9 +1,22 @@
-from typing import List
+import os
+import time
+import logging
+import functools
+import contextlib
+from typing import Callable, Dict, List, Optional, Tuple
 
+import numpy as np
+
+from mediapipe.tasks.python import vision
 from mediapipe.tasks.python.components.containers import landmark as landmark_module
 
 from mediapipe.framework.formats import landmark_pb2
 
+logger = logging.getLogger(__name__)
+
+# Root directory of the project, where model files are expected by default
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 def convert_to_landmark_list(normalized_landmarks: List[landmark_module.NormalizedLandmark]) -> landmark_pb2.NormalizedLandmarkList:
     landmark_list = landmark_pb2.NormalizedLandmarkList()
     for landmark in normalized_landmarks:
@@ -12,3 +25,171 @@ def convert_to_landmark_list(normalized_landmarks: List[landmark_module.Normaliz
         new_landmark.y = landmark.y
         new_landmark.z = landmark.z
     return landmark_list
+
+
+RUNNING_MODES = {
+    'image': vision.RunningMode.IMAGE,
+    'video': vision.RunningMode.VIDEO,
+    'live_stream': vision.RunningMode.LIVE_STREAM,
+}
+
+
+def get_running_mode(name: str) -> vision.RunningMode:
+    """
+    Converts a running mode name, as written in scenario files, to the corresponding mediapipe running mode
+
+
+    Parameters:
+    ---
+    name: str
+        Either 'image', 'video' or 'live_stream'
+    """
+    if name not in RUNNING_MODES:
+        raise ValueError(f'Unknown running mode {name}. Choose between {list(RUNNING_MODES)}')
+    return RUNNING_MODES[name]
+
+
+class TimestampConverter:
+    """
+    Converts capture timestamps in seconds to the integer millisecond timestamps expected by mediapipe VIDEO and LIVE_STREAM modes.
+    Mediapipe rejects timestamps which aren't strictly increasing, hence two frames captured within the same millisecond are shifted by 1 ms.
+    """
+
+    def __init__(self):
+        self.origin = None
+        self.last_ms = -1
+
+
+    def to_ms(self, timestamp: Optional[float] = None) -> int:
+        """
+        Parameters:
+        ---
+        timestamp: float, default=None
+            Capture time in seconds (time.perf_counter clock). The current time is used if None
+
+
+        Returns:
+        ---
+        timestamp_ms: int
+            Strictly increasing timestamp in milliseconds, relative to the first converted timestamp
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        if self.origin is None:
+            self.origin = timestamp
+        timestamp_ms = max(int((timestamp - self.origin) * 1000), self.last_ms + 1)
+        self.last_ms = timestamp_ms
+        return timestamp_ms
+
+
+def resolve_model_path(model_path: str) -> str:
+    """
+    Finds a model file independently of the working directory.
+    Relative paths are looked up in the working directory first, then in the root directory of the project
+
+
+    Parameters:
+    ---
+    model_path: str
+        Absolute or relative path of the .task file
+
+
+    Returns:
+    ---
+    path: str
+        Absolute path of the model file
+    """
+    candidates = [model_path] if os.path.isabs(model_path) else [os.path.abspath(model_path), os.path.join(PROJECT_ROOT, model_path)]
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+    raise FileNotFoundError(f'Model file {model_path} not found (looked for {candidates}). See the README to download it')
+
+
+@functools.lru_cache(maxsize=None)
+def load_model(model_path: str) -> bytes:
+    """
+    Reads the content of a model file, once per process. It's given to mediapipe as `model_asset_buffer`
+
+
+    Parameters:
+    ---
+    model_path: str
+        Absolute or relative path of the .task file (see `resolve_model_path`)
+    """
+    with open(resolve_model_path(model_path), 'rb') as f:
+        return f.read()
+
+
+def warm_up(process: Callable[[np.ndarray, Optional[float]], object], n_frames: int, size: Tuple[int, int],
+            wait: Optional[Callable[[], bool]] = None) -> List[float]:
+    """
+    Runs dummy inferences on black frames, so that graph initialization and lazy allocations happen before the first real frame
+
+
+    Parameters:
+    ---
+    process: callable
+        `process` method of the extractor to warm up
+
+    n_frames: int
+        Number of dummy inferences
+
+    size: tuple
+        (width, height) of the dummy frames, which should be the size of the frames of the video input
+
+    wait: callable, default=None
+        Asynchronous extractors only (live_stream mode). Blocks until the result of the last submitted frame is published,
+        so that every inference completes during the warm-up and its duration is measured. Returns False if it timed out
+
+
+    Returns:
+    ---
+    durations: list
+        Duration of each inference in seconds
+    """
+    width, height = size
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    durations = []
+    for _ in range(n_frames):
+        start = time.perf_counter()
+        process(frame, start)
+        if wait is not None and not wait():
+            logger.warning('Warm-up inference result not received in time, the first frames may still be slow')
+            break
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+class StartupProfile:
+    """
+    Timing breakdown of the startup of an extractor (e.g import, model load, graph creation, warm-up), logged once it's ready
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.phases: Dict[str, float] = {}
+
+
+    def add(self, phase: str, duration: float) -> None:
+        """
+        Records the duration of a phase measured elsewhere (e.g an import time), in seconds
+        """
+        self.phases[phase] = duration
+
+
+    @contextlib.contextmanager
+    def phase(self, phase: str):
+        """
+        Context manager measuring the duration of the enclosed block
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[phase] = time.perf_counter() - start
+
+
+    def log(self, details: str = '') -> None:
+        breakdown = ', '.join(f'{phase} {1000 * duration:.1f}ms' for phase, duration in self.phases.items())
+        logger.info(f'{self.name} startup: {breakdown} (total {1000 * sum(self.phases.values()):.1f}ms){details}')
@@ -0,0 +1,419 @@
+import time
+import logging
+from collections import deque
+from functools import partial
+from threading import Thread, Event, Condition
+from typing import Any, Callable, List, Optional
+
+from .latency import FrameTrace
+
+logger = logging.getLogger(__name__)
+
+
+class LatestQueue:
+    """
+    Bounded queue connecting two stages of the pipeline.
+    What happens when an item is put in a full queue is set by the overflow policy:
+    + drop-oldest: the oldest queued item is discarded, so the consumer always gets the most recent data (latest-wins)
+    + drop-newest: the incoming item is discarded
+    + block: the producer waits until the consumer takes an item
+
+
+    Attributes
+    ---
+    dropped: int
+        Number of items discarded because the queue was full
+    """
+
+    OVERFLOW_POLICIES = ('drop-oldest', 'drop-newest', 'block')
+
+    def __init__(self, maxsize: int = 1, overflow: str = 'drop-oldest'):
+        """
+        Initializes the LatestQueue.
+
+        Parameters
+        ---
+        maxsize: int, default=1
+            Maximum number of queued items
+
+        overflow: str, default='drop-oldest'
+            Overflow policy. Choose between 'drop-oldest', 'drop-newest' and 'block'
+        """
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown overflow policy {overflow}. Choose between {self.OVERFLOW_POLICIES}')
+        if maxsize < 1:
+            raise ValueError(f'Queue size must be at least 1, got {maxsize}')
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.items = deque()
+        self.cond = Condition()
+        self.closed = False
+        self.dropped = 0
+
+
+    def put(self, item: Any) -> bool:
+        """
+        Queues an item, applying the overflow policy if the queue is full
+
+        Returns
+        ---
+        queued: bool
+            False if the item was discarded or the queue was closed
+        """
+        with self.cond:
+            if len(self.items) >= self.maxsize:
+                if self.overflow == 'drop-oldest':
+                    self.items.popleft()
+                    self.dropped += 1
+                elif self.overflow == 'drop-newest':
+                    self.dropped += 1
+                    return False
+                else:
+                    self.cond.wait_for(lambda: self.closed or len(self.items) < self.maxsize)
+            if self.closed:
+                return False
+            self.items.append(item)
+            self.cond.notify_all()
+            return True
+
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """
+        Takes the oldest queued item
+
+        Parameters
+        ---
+        timeout: float, default=None
+            Maximum time to wait for an item, in seconds. Waits indefinitely if None
+
+        Returns
+        ---
+        item: Any or None
+            None if the timeout expired or the queue was closed
+        """
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.closed or self.items, timeout) or not self.items:
+                return None
+            item = self.items.popleft()
+            self.cond.notify_all()
+            return item
+
+
+    def close(self) -> None:
+        """
+        Wakes up every producer and consumer waiting on the queue. Subsequent calls to put are ignored
+        """
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class StageWorker(Thread):
+    """
+    Thread running one stage of the pipeline.
+    At each iteration, it takes an item from its source, processes it and puts the result in its output queue, if any.
+    A None item (e.g a timeout) is skipped, and so is a None result.
+    If processing raises an exception, the whole pipeline is stopped through the shared stop event.
+    """
+
+    def __init__(self, name: str, source: Callable[[float], Any], process: Callable[[Any], Any],
+                 output: Optional[LatestQueue], stop_event: Event, poll_interval: float = 0.1):
+        """
+        Initializes the StageWorker.
+
+        Parameters
+        ---
+        name: str, required
+            Name of the stage, used for logging
+
+        source: callable, required
+            Function taking a timeout in seconds and returning the next item to process, or None
+
+        process: callable, required
+            Function processing one item
+
+        output: LatestQueue or None, required
+            Queue the results are put in
+
+        stop_event: threading.Event, required
+            Event shared by all the stages of the pipeline
+
+        poll_interval: float, default=0.1
+            Maximum time to wait for an item before checking whether the pipeline was stopped
+        """
+        super().__init__(name=f'{name}-stage', daemon=True)
+        self.stage_name = name
+        self.source = source
+        self.process = process
+        self.output = output
+        self.stop_event = stop_event
+        self.poll_interval = poll_interval
+        self.processed = 0
+        self.busy_time = 0.
+
+
+    def run(self):
+        """
+        Abstract method implementation from threading.Thread
+        """
+        try:
+            while not self.stop_event.is_set():
+                item = self.source(self.poll_interval)
+                if item is None:
+                    continue
+                start = time.perf_counter()
+                result = self.process(item)
+                self.busy_time += time.perf_counter() - start
+                self.processed += 1
+                if result is not None and self.output is not None:
+                    self.output.put(result)
+        except Exception:
+            logger.exception(f'Stage {self.stage_name} failed, stopping the pipeline')
+            self.stop_event.set()
+
+
+class Pipeline:
+    """
+    Pipelined runtime of a scenario.
+    Capture, extraction, mapping and output each run in their own thread, so that the throughput is bounded by the slowest stage rather than by the sum of all of them.
+
+    + capture: the video input thread. Its frame slots act as a latest-wins queue of size 1
+    + extract: grabs the newest frame, extracts features and forwards the frame to the display
+    + map: converts features to audio parameters
+    + output: hands audio parameters over to the audio generator
+
+    Extraction and mapping are connected by the `features` queue, mapping and output by the `params` queue.
+    Both are configured from the `runtime` section of the scenario file:
+
+    runtime:
+      mode: pipelined
+      queues:
+        features:
+          maxsize: 1
+          overflow: drop-oldest
+        params:
+          maxsize: 1
+          overflow: block
+    """
+
+    QUEUES = ('features', 'params')
+
+    def __init__(self, scenario, display=None, queues: Optional[dict] = None):
+        """
+        Initializes the Pipeline.
+
+        Parameters
+        ---
+        scenario: utils.scenario.Scenario, required
+            Scenario whose modules are run by the pipeline
+
+        display: display.Display, default=None
+            Display receiving the frames, if any
+
+        queues: dict, default=None
+            Configuration of the queues, { queue_name: { maxsize: int, overflow: str } }
+        """
+        self.scenario = scenario
+        self.display = display
+        self.stop_event = Event()
+
+        queues = queues or {}
+        unknown = set(queues) - set(self.QUEUES)
+        if unknown:
+            raise ValueError(f'Unknown pipeline queue(s) {unknown}. Available queues: {self.QUEUES}')
+        self.queues = {name: LatestQueue(**queues.get(name, {})) for name in self.QUEUES}
+
+        self.workers = [
+            StageWorker('extract', scenario.video_input.get_frame_slot, self._extract, self.queues['features'], self.stop_event),
+            StageWorker('map', self.queues['features'].get, self._map, self.queues['params'], self.stop_event),
+            StageWorker('output', self.queues['params'].get, self._output, None, self.stop_event),
+        ]
+
+
+    def _extract(self, slot):
+        trace = FrameTrace(slot.seq, slot.timestamp, slot.sensor_timestamp)
+        trace.extract_start = time.perf_counter()
+        features = self.scenario.feature_extractor.process(slot.data, slot.timestamp)
+        trace.extract_end = time.perf_counter()
+        if self.display is not None:
+            self.display.frame = slot.data
+        return features, trace
+
+
+    def _map(self, item):
+        features, trace = item
+        audio_params = self.scenario.feature_mapper.process_features(features)
+        trace.map_end = time.perf_counter()
+        return audio_params, trace
+
+
+    def _output(self, item):
+        audio_params, trace = item
+        self.scenario.audio_generator.send(audio_params, trace)
+
+
+    def start(self) -> None:
+        """
+        Starts every stage of the pipeline
+        """
+        for worker in self.workers:
+            worker.start()
+        logger.info('Pipelined runtime started')
+
+
+    def is_alive(self) -> bool:
+        """
+        Whether the pipeline is still running. It stops when a stage fails or when `stop` is called
+        """
+        return not self.stop_event.is_set()
+
+
+    def stop(self) -> None:
+        """
+        Stops every stage, waits for them to finish and logs their statistics
+        """
+        self.stop_event.set()
+        for queue in self.queues.values():
+            queue.close()
+        for worker in self.workers:
+            worker.join(timeout=1.)
+            mean_time = 1000 * worker.busy_time / max(worker.processed, 1)
+            logger.info(f'Stage {worker.stage_name}: {worker.processed} items processed ({mean_time:.3f} ms per item)')
+        for name, queue in self.queues.items():
+            logger.info(f'Queue {name} ({queue.overflow}, size {queue.maxsize}): {queue.dropped} items dropped')
+
+
+class MultiPipeline:
+    """
+    Runtime of several scenarios in one process, sharing their video inputs and feature extractors.
+    Scenarios are expected to be created with a common `shared_modules` dictionary (see: class`utils.scenario.Scenario`),
+    so that each distinct video input is opened once and each distinct feature extractor runs once per frame,
+    whatever the number of scenarios using them.
+
+    + capture: the thread of every distinct video input
+    + extract: one worker per distinct feature extractor, reading the frames of its video input as a consumer of its own (see: function`video.VideoInput.add_consumer`).
+      The features of every frame are fanned out to the `features` queue of every scenario using this extractor
+    + chain: one worker per scenario, mapping the features and handing the audio parameters over to the audio generator of the scenario
+
+    The `features` queue of every chain is configured from the `runtime.queues.features` section of its scenario file (default: size 1, drop-oldest),
+    so that a slow mapper or generator only drops frames of its own chain.
+    Only the frames of the first video input are sent to the display.
+
+
+    Attributes
+    ---
+    chains: dict
+        Scenarios indexed by chain name, the name of the scenario made unique
+
+    queues: dict
+        Features queue of every chain, indexed by chain name
+    """
+
+    def __init__(self, scenarios: List, display=None):
+        """
+        Initializes the MultiPipeline.
+
+        Parameters
+        ---
+        scenarios: list of utils.scenario.Scenario, required
+            Scenarios run by the pipeline
+
+        display: display.Display, default=None
+            Display receiving the frames of the first video input, if any
+        """
+        self.display = display
+        self.stop_event = Event()
+
+        self.chains = {}
+        for scenario in scenarios:
+            name, n = scenario.name, 1
+            while name in self.chains:
+                n += 1
+                name = f'{scenario.name} #{n}'
+            self.chains[name] = scenario
+        self.queues = {name: LatestQueue(**((scenario.runtime.get('queues') or {}).get('features') or {}))
+                       for name, scenario in self.chains.items()}
+
+        # Chains sharing a feature extractor, which implies sharing the video input
+        groups = {}
+        for name, scenario in self.chains.items():
+            groups.setdefault(scenario.module_keys['feature_extractor'], []).append(name)
+
+        self.video_inputs = []
+        self.extract_workers = []
+        self.consumers = [] # (video input, consumer ID) of every extract worker
+        for group in groups.values():
+            scenario = self.chains[group[0]]
+            video_input = scenario.video_input
+            if any(video_input is other for other in self.video_inputs):
+                consumer = video_input.add_consumer()
+            else:
+                consumer = 0
+                self.video_inputs.append(video_input)
+            display = self.display if video_input is self.video_inputs[0] and consumer == 0 else None
+            worker = StageWorker(f'extract {type(scenario.feature_extractor).__name__} ({", ".join(group)})',
+                                 partial(video_input.get_frame_slot, consumer=consumer),
+                                 partial(self._extract, scenario.feature_extractor, group, display), None, self.stop_event)
+            self.extract_workers.append(worker)
+            self.consumers.append((video_input, consumer))
+
+        self.chain_workers = [StageWorker(f'chain {name}', self.queues[name].get, partial(self._chain, scenario), None, self.stop_event)
+                              for name, scenario in self.chains.items()]
+        logger.info(f'{len(self.chains)} chain(s) sharing {len(self.extract_workers)} feature extractor(s) and {len(self.video_inputs)} video input(s)')
+
+
+    def _extract(self, feature_extractor, chain_names, display, slot):
+        extract_start = time.perf_counter()
+        features = feature_extractor.process(slot.data, slot.timestamp)
+        extract_end = time.perf_counter()
+        if display is not None:
+            display.frame = slot.data
+        # Every chain gets its own trace, as they are completed by different generators
+        for name in chain_names:
+            trace = FrameTrace(slot.seq, slot.timestamp, slot.sensor_timestamp)
+            trace.extract_start = extract_start
+            trace.extract_end = extract_end
+            self.queues[name].put((features, trace))
+
+
+    def _chain(self, scenario, item):
+        features, trace = item
+        audio_params = scenario.feature_mapper.process_features(features)
+        trace.map_end = time.perf_counter()
+        scenario.audio_generator.send(audio_params, trace)
+
+
+    def start(self) -> None:
+        """
+        Starts every worker of the pipeline. Video inputs and audio generators are started by the caller
+        """
+        for worker in self.chain_workers + self.extract_workers:
+            worker.start()
+        logger.info('Multi-scenario runtime started')
+
+
+    def is_alive(self) -> bool:
+        """
+        Whether the pipeline is still running: it stops when a worker fails, when every video input stopped or when `stop` is called
+        """
+        return not self.stop_event.is_set() and any(video_input.is_alive() for video_input in self.video_inputs)
+
+
+    def stop(self) -> None:
+        """
+        Stops every worker, waits for them to finish and logs the statistics of every extractor and chain
+        """
+        self.stop_event.set()
+        for queue in self.queues.values():
+            queue.close()
+        for worker, (video_input, consumer) in zip(self.extract_workers, self.consumers):
+            worker.join(timeout=1.)
+            stats = video_input.consumer_stats[consumer]
+            mean_time = 1000 * worker.busy_time / max(worker.processed, 1)
+            logger.info(f'Stage {worker.stage_name}: {worker.processed} frames processed ({mean_time:.3f} ms per frame), '
+                        f'{stats["dropped"]} frames dropped')
+        for worker, (name, queue) in zip(self.chain_workers, self.queues.items()):
+            worker.join(timeout=1.)
+            mean_time = 1000 * worker.busy_time / max(worker.processed, 1)
+            logger.info(f'Stage {worker.stage_name}: {worker.processed} frames processed ({mean_time:.3f} ms per frame), '
+                        f'{queue.dropped} features dropped ({queue.overflow}, size {queue.maxsize})')
@@ -0,0 +1,124 @@
+"""
+Registry of the classes that can be referenced in scenario files.
+Class names are mapped to the module defining them (see the MODULES dictionary of each package), and a module is only imported
+when a scenario references one of its classes. Hence a scenario only pays the import time of the dependencies it actually uses
+(e.g mediapipe is never imported by a scenario based on FrameDiffCalculator).
+"""
+import sys
+import time
+import logging
+import importlib
+import importlib.util
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PACKAGES = ('video', 'feature_extractor', 'feature_mapper', 'audio')
+
+_classes: Dict[str, str] = {}
+_extra_classes: Dict[str, str] = {}
+import_times: Dict[str, float] = {}
+
+
+def register(class_name: str, module_path: str) -> None:
+    """
+    Registers a class defined outside of the packages of the project, so that it can be referenced in scenario files
+
+
+    Parameters
+    ---
+    class_name: str, required
+        Name of the class, as written in scenario files
+
+    module_path: str, required
+        Absolute path of the module defining the class (e.g 'my_package.my_extractor')
+    """
+    _extra_classes[class_name] = module_path
+
+
+def lazy_getattr(package_name: str, modules: Dict[str, str]) -> Callable[[str], Any]:
+    """
+    Builds the module level __getattr__ of a package (PEP 562), importing the module defining a class on first access only.
+    The class is then cached in the package, so that __getattr__ isn't called again for it
+
+
+    Parameters
+    ---
+    package_name: str, required
+        Name of the package (its __name__)
+
+    modules: dict, required
+        MODULES dictionary of the package, mapping class names to the relative path of their module
+
+
+    Returns
+    ---
+    __getattr__: callable
+    """
+    def __getattr__(name: str) -> Any:
+        if name in modules:
+            value = getattr(importlib.import_module(modules[name], package_name), name)
+            setattr(sys.modules[package_name], name, value)
+            return value
+        raise AttributeError(f'module {package_name!r} has no attribute {name!r}')
+    return __getattr__
+
+
+def available_classes() -> Dict[str, str]:
+    """
+    Mapping of every registered class name to the path of its module.
+    Only the packages' __init__ modules are imported, which doesn't import any class
+    """
+    if not _classes:
+        for package_name in PACKAGES:
+            package = importlib.import_module(package_name)
+            for class_name, module in package.MODULES.items():
+                _classes[class_name] = importlib.util.resolve_name(module, package_name)
+    return {**_classes, **_extra_classes}
+
+
+def resolve(class_name: str) -> type:
+    """
+    Imports the module defining a class and returns the class.
+    The import time of the module (including its dependencies) is recorded in `import_times` if it wasn't imported yet
+
+
+    Parameters
+    ---
+    class_name: str, required
+        Name of the class (e.g 'HandLandmarker')
+
+
+    Returns
+    ---
+    cls: type
+    """
+    classes = available_classes()
+    if class_name not in classes:
+        raise KeyError(f'Unknown class {class_name}. Available classes: {sorted(classes)}')
+    module_path = classes[class_name]
+    already_imported = module_path in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(module_path)
+    if not already_imported:
+        import_times[module_path] = time.perf_counter() - start
+    return getattr(module, class_name)
+
+
+def log_import_times(level: int = logging.INFO, total: Optional[float] = None) -> None:
+    """
+    Logs the import time of every module imported through the registry, slowest first
+
+
+    Parameters
+    ---
+    level: int, default=logging.INFO
+        Logging level
+
+    total: float, default=None
+        Optional total startup time in seconds, logged along with the import times
+    """
+    for module_path, duration in sorted(import_times.items(), key=lambda item: item[1], reverse=True):
+        logger.log(level, f'Imported {module_path} in {1000 * duration:.1f}ms')
+    if total is not None:
+        logger.log(level, f'Modules created in {1000 * total:.1f}ms ({1000 * sum(import_times.values()):.1f}ms of imports)')
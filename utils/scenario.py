@@ -1,10 +1,10 @@
 from .file_parsers import parse_yml
-from video import *
-from audio import *
-from feature_extractor import *
-from feature_mapper import *
+from . import registry
 
+import json
+import time
 import logging
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
@@ -12,11 +12,12 @@ class Scenario:
     """
     Wrapper class to create modules of the pipeline, based on a YAML scenario file.
     Modules are dynamically instanced with the content of the scenario file.
+    Their classes are resolved through utils.registry, so that only the modules referenced by the scenario are imported.
     This class is not meant to be changed as long as the logic of the pipeline is kept
     Pay close attention to the type returned by the modules. They may vary from one scenario to another, depending on module combinations.
 
     """
-    def __init__(self, scenario_file: str):
+    def __init__(self, scenario_file: str, shared_modules: Optional[dict] = None):
         """
         Initializes a scenario
 
@@ -25,8 +26,19 @@ class Scenario:
         scenario_file: str, required
             Path to the the yaml scenario file
 
+        shared_modules: dict, default=None
+            Video inputs and feature extractors already created by other scenarios of the same process, indexed by their definition key.
+            When given, a module defined exactly like an existing one (same class and parameters) is reused rather than created again,
+            and new modules are added to it. A feature extractor is only shared between scenarios sharing the video input too.
+            Mappers and audio generators are always created per scenario
+
         Attributes
         ---
+        name: str
+            Name of the scenario, given by its `scenario` entry
+
+        module_keys: dict
+            Definition keys of the video input and of the feature extractor, identifying shared modules
         video_input: video.VideoInput
 
         feature_extractor: feature_extractor.FeatureExtractor
@@ -38,13 +50,21 @@ class Scenario:
 
         audio_generator: audio_generator.AudioGenerator
             Instance of the audio module, responsible for outputing audio with parameters output by the feature mapper
+
+        runtime: dict
+            Optional `runtime` section of the scenario file, defining how modules are run (see: function`main.main`)
         """
+        start = time.perf_counter()
         self.parameters: dict = parse_yml(scenario_file)
+        self.runtime: dict = self.parameters.get('runtime') or {}
+        self.name: str = str(self.parameters.get('scenario', scenario_file))
 
-        self.video_input = self._create_module('video_input')
-        self.feature_extractor = self._create_module('feature_extractor')
+        self.module_keys = {}
+        self.video_input = self._create_shared_module('video_input', shared_modules)
+        self.feature_extractor = self._create_shared_module('feature_extractor', shared_modules, scope=self.module_keys['video_input'])
         self.feature_mapper = self._create_module('feature_mapper')
         self.audio_generator = self._create_module('audio_generator')
+        registry.log_import_times(total=time.perf_counter() - start)
 
 
     def _create_module(self, module_name: str):
@@ -61,7 +81,39 @@ class Scenario:
         module: Any
             An instance of the specified module class, initialized with its parameters from the scenario
         """
-        module_class = globals()[self.parameters[module_name]['class']]
+        module_class = registry.resolve(self.parameters[module_name]['class'])
         module_params = self.parameters[module_name].get('params', {})
         module = module_class(**module_params)
         return module
+
+
+    def _create_shared_module(self, module_name: str, shared_modules: Optional[dict], scope: str = ''):
+        """
+        Reuses the module from shared_modules if an identical definition was already created, creates and adds it otherwise
+
+        Parameters:
+        ---
+        module_name: str
+            The name of the module to create (e.g., 'video_input', 'feature_extractor')
+
+        shared_modules: dict or None
+            Modules shared between scenarios, indexed by definition key. The module is always created if None
+
+        scope: str, default=''
+            Key of the module this one depends on, so that e.g identical extractors fed by different cameras aren't shared
+
+        Returns:
+        ---
+        module: Any
+            An instance of the specified module class
+        """
+        definition = self.parameters[module_name]
+        key = json.dumps([scope, module_name, definition['class'], definition.get('params') or {}], sort_keys=True, default=str)
+        self.module_keys[module_name] = key
+        if shared_modules is None:
+            return self._create_module(module_name)
+        if key in shared_modules:
+            logger.info(f'Scenario {self.name}: reusing {definition["class"]} {module_name}')
+        else:
+            shared_modules[key] = self._create_module(module_name)
+        return shared_modules[key]
@@ -1,14 +1,21 @@
-# if PySpin:
-#     from .flircam import Flircam
-# else:
-#     Flircam = None
 import importlib.util
 
-from .webcam import Webcam
+from utils import registry
 
-# Conditional import whether spinnaker-python is installed or not
+# Classes are imported on first access only (see utils.registry), so that PySpin isn't imported by webcam scenarios
+MODULES = {
+    'Flircam': '.flircam',
+    'Webcam': '.webcam',
+    'VideoFile': '.video_file',
+    'BlankVideo': '.blank_video',
+    'FrameRecorder': '.frame_recorder',
+    'FrameRecording': '.frame_recorder',
+}
+
+# Flircam is only exposed if spinnaker-python is installed
 if importlib.util.find_spec('PySpin'):
-    from .flircam import Flircam
-    __all__ = ['Flircam', 'Webcam']
+    __all__ = ['Flircam', 'Webcam', 'VideoFile', 'BlankVideo', 'FrameRecorder', 'FrameRecording']
 else:
-    __all__ = ['Webcam']
+    __all__ = ['Webcam', 'VideoFile', 'BlankVideo', 'FrameRecorder', 'FrameRecording']
+
+__getattr__ = registry.lazy_getattr(__name__, MODULES)
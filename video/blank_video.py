@@ -0,0 +1,89 @@
+import time
+import logging
+from typing import Optional
+
+import numpy as np
+
+from .video_input import VideoInput
+
+logger = logging.getLogger(__name__)
+
+
+class BlankVideo(VideoInput):
+    """
+    Video input publishing black frames, without any camera nor file.
+    It drives the main loop of scenarios whose features don't come from the frames, e.g replayed extractor outputs (see: class`feature_extractor.ReplayExtractor`)
+
+    With a framerate, frames are published at their due time like a camera, and those not read in time are dropped.
+    Without framerate, a frame is only published once every consumer got the previous one: nothing is dropped and the capture thread sleeps meanwhile,
+    so the main loop runs as fast as it can process frames and `n_frames` frames are all consumed.
+    """
+
+    def __init__(self, width: int = 64, height: int = 48, fps: Optional[float] = None, n_frames: Optional[int] = None, n_slots: int = 3):
+        """
+        Initializes the BlankVideo.
+
+        Parameters:
+        ---
+        width: int, default=64
+            Width of the frames
+
+        height: int, default=48
+            Height of the frames
+
+        fps: float, default=None
+            Framerate of the published frames. If None, each frame is published once the previous one was consumed
+
+        n_frames: int, default=None
+            Number of frames published before the video input stops, which ends the main loop of the program. Unlimited if None.
+            Without framerate, the video input stops once the last frame was consumed
+
+        n_slots: int, default=3
+            Number of preallocated frame slots. See: class`video.VideoInput`
+        """
+        self.frame = np.zeros((height, width, 3), dtype=np.uint8)
+        self.frame_period = 1. / fps if fps else 0.
+        self.n_frames = n_frames
+        self.frames_published = 0
+        self.next_deadline = None
+        super().__init__(n_slots=n_slots)
+
+
+    def configure(self):
+        """
+        Abstract method implementation
+        """
+        logger.info(f'Blank video input: {self.frame.shape[1]}x{self.frame.shape[0]}, '
+                    f'{1. / self.frame_period if self.frame_period else "unlimited"} fps, {self.n_frames or "unlimited"} frames')
+
+
+    def read_frame(self) -> Optional[np.ndarray]:
+        """
+        Abstract method implementation
+        Returns the black frame at its due time (or once the previous one was consumed), or None once n_frames frames were published
+        """
+        if not self.frame_period:
+            with self._cond:
+                self._cond.wait_for(lambda: self.stop_event.is_set() or self._frames_consumed())
+            if self.stop_event.is_set():
+                return None
+        if self.n_frames is not None and self.frames_published >= self.n_frames:
+            logger.info(f'Blank video input stopped after {self.frames_published} frames')
+            self.stop_event.set()
+            return None
+        if self.frame_period:
+            now = time.perf_counter()
+            if self.next_deadline is None:
+                self.next_deadline = now
+            elif self.next_deadline > now:
+                self.stop_event.wait(self.next_deadline - now)
+            self.next_deadline += self.frame_period
+        self.frames_published += 1
+        return self.frame
+
+
+    def cleanup(self):
+        """
+        Abstract method implementation
+        """
+        pass
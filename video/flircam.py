@@ -1,9 +1,12 @@
 import time
+from typing import Optional
+
 import cv2
 import numpy as np
 
 import PySpin
-from .video_input import VideoInput
+from utils.clock_sync import ClockSync
+from .video_input import VideoInput, FrameSlot
 
 import logging
 logger = logging.getLogger(__name__)
@@ -32,8 +35,82 @@ class Flircam(VideoInput):
     color_processor: PySpin.ImageProcessor
         In charge of defining the very first processing steps after image acquisition.
         It includes the expected raw pixel format (may vary from one camera to another) and the interpolation algorithm (can be changed according to expected image quality)
+        Only used with the 'bgr' output
+
+    roi: tuple
+        (offset_x, offset_y, width, height) of the sensor region actually acquired, in binned pixels
+
+    clock: utils.clock_sync.ClockSync
+        Mapping from the camera clock to the time.perf_counter clock, used to give every frame its sensor timestamp.
+        It's fitted on the camera clock latched periodically by the host, or on the arrival times of the frames
+        if the camera can't latch its clock or `latch_interval` is None
     """
-    def __init__(self):
+
+    # Pixel format of the camera for each output mode
+    PIXEL_FORMATS = {
+        'bgr': 'PixelFormat_BayerRG8',
+        'raw': 'PixelFormat_BayerRG8',
+        'mono': 'PixelFormat_Mono8',
+    }
+
+    def __init__(self, n_slots: int = 3, output: str = 'bgr', width: Optional[int] = None, height: Optional[int] = None,
+                 offset_x: Optional[int] = None, offset_y: Optional[int] = None, binning: int = 1,
+                 exposure_time: float = 500., frame_rate: Optional[float] = None, latch_interval: Optional[float] = 0.5):
+        """
+        Initializes the Flircam.
+
+        Parameters
+        ---
+        n_slots: int, default=3
+            Number of preallocated frame slots. See: class`video.VideoInput`
+
+        output: str, default='bgr'
+            Format of the frames:
+            + 'bgr': color frames (height, width, 3) demosaiced by the Spinnaker SDK
+            + 'raw': Bayer RG mosaic (height, width) as read from the sensor, without any conversion
+            + 'mono': single channel frames (height, width), converted by the camera
+            'raw' and 'mono' frames are copied once from the camera buffer, which makes them the fastest outputs.
+            They suit extractors working on grayscale images (e.g FrameDiffCalculator), not the landmarkers
+
+        width: int, default=None
+            Width of the sensor region of interest in (binned) pixels. The whole sensor width if None
+
+        height: int, default=None
+            Height of the sensor region of interest in (binned) pixels. The whole sensor height if None.
+            Reducing the height increases the maximum framerate
+
+        offset_x: int, default=None
+            Horizontal offset of the region of interest. The region is centered if None
+
+        offset_y: int, default=None
+            Vertical offset of the region of interest. The region is centered if None
+
+        binning: int, default=1
+            Number of sensor pixels combined along each axis. Color cameras may only support binning with the 'mono' output
+
+        exposure_time: float, default=500.
+            Exposure time in microseconds. It bounds the framerate to 1e6 / exposure_time
+
+        frame_rate: float, default=None
+            Acquisition framerate. The maximum framerate allowed by the region of interest and the exposure time if None
+
+        latch_interval: float, default=0.5
+            Interval in seconds between two latches of the camera clock, which refine the mapping of chunk timestamps to the host clock.
+            A latch is a round trip to the camera performed by the capture thread.
+            If None, the mapping is fitted on the arrival times of the frames, which includes the minimal transfer time in the sensor timestamps
+        """
+        if output not in self.PIXEL_FORMATS:
+            raise ValueError(f'Unknown output {output}. Expected one of {list(self.PIXEL_FORMATS)}')
+        self.output = output
+        self.requested_roi = (offset_x, offset_y, width, height)
+        self.binning = binning
+        self.exposure_time = exposure_time
+        self.frame_rate = frame_rate
+        self.latch_interval = latch_interval
+        self.clock = None
+        self.last_latch = 0.
+        self.last_chunk = None
+        self.last_frame_id = -1
         self.system = None
 
         logger.debug('Finding camera')
@@ -42,8 +119,8 @@ class Flircam(VideoInput):
         logger.debug('Initializing camera')
         self.cam.Init()
         logger.debug('Camera initialized')
-        self.color_processor = self._init_color_processor(PySpin.SPINNAKER_COLOR_PROCESSING_ALGORITHM_NEAREST_NEIGHBOR)
-        super().__init__()
+        self.color_processor = self._init_color_processor(PySpin.SPINNAKER_COLOR_PROCESSING_ALGORITHM_NEAREST_NEIGHBOR) if output == 'bgr' else None
+        super().__init__(n_slots=n_slots)
 
 
     def _find_camera(self) -> None:
@@ -79,84 +156,212 @@ class Flircam(VideoInput):
         return processor
 
 
+    @staticmethod
+    def _fit(node, value: Optional[int]) -> int:
+        """
+        Closest valid value of an integer camera setting, below the requested one: clamped to the limits of the node and aligned on its increment.
+        The maximum is returned if the value is None
+        """
+        minimum, maximum, increment = node.GetMin(), node.GetMax(), node.GetInc()
+        value = maximum if value is None else min(max(value, minimum), maximum)
+        return minimum + (value - minimum) // increment * increment
+
+
+    def _configure_roi(self) -> None:
+        """
+        Sets the binning and the sensor region of interest.
+        Offsets are reset first, as they bound the maximum size, and binning is set before the size, as it changes the size limits
+        """
+        offset_x, offset_y, width, height = self.requested_roi
+        self.cam.OffsetX.SetValue(0)
+        self.cam.OffsetY.SetValue(0)
+        self.cam.BinningHorizontal.SetValue(self.binning)
+        self.cam.BinningVertical.SetValue(self.binning)
+        self.cam.Width.SetValue(self._fit(self.cam.Width, width))
+        self.cam.Height.SetValue(self._fit(self.cam.Height, height))
+        # The remaining margins are the maximum offsets, the region is centered by default
+        self.cam.OffsetX.SetValue(self._fit(self.cam.OffsetX, offset_x if offset_x is not None else self.cam.OffsetX.GetMax() // 2))
+        self.cam.OffsetY.SetValue(self._fit(self.cam.OffsetY, offset_y if offset_y is not None else self.cam.OffsetY.GetMax() // 2))
+
+        self.roi = (self.cam.OffsetX.GetValue(), self.cam.OffsetY.GetValue(), self.cam.Width.GetValue(), self.cam.Height.GetValue())
+        requested = tuple(value if value is not None else actual for value, actual in zip(self.requested_roi, self.roi))
+        if requested != self.roi:
+            logger.warning(f'Region of interest {requested} adjusted to {self.roi} (offset_x, offset_y, width, height) to match the camera constraints')
+
+
     def configure(self):
         """
         Asbtract method implementation
         Setup camera configuration for frame acquisition.
         To ensure maximum framerate and minimal digital preprocessing, auto exposure/gain/white-balance options are disabled.
+        The region of interest and the exposure time are set before the framerate, as they bound the maximum framerate.
         For timing measurement purposes, ChunkMode is activated to get timestamps from the camera
 
         Acquisition on the camera side is started right after the configuration setup to
         """
         self.cam.AcquisitionMode.SetValue(PySpin.AcquisitionMode_Continuous)
-        self.cam.PixelFormat.SetValue(PySpin.PixelFormat_BayerRG8)
-        self.cam.BinningHorizontal.SetValue(1)
-        self.cam.BinningVertical.SetValue(1)
-        max_width, max_height = self.cam.Width.GetMax(), self.cam.Height.GetMax()
-        self.cam.Width.SetValue(max_width)
-        self.cam.Height.SetValue(max_height)
-
-        # Set frame rate to maximum possible
-        self.cam.AcquisitionFrameRateEnable.SetValue(True)
-        max_frame_rate = self.cam.AcquisitionFrameRate.GetMax()
-        self.cam.AcquisitionFrameRate.SetValue(max_frame_rate)
-
-        self.cam.TLStream.StreamBufferCountMode.SetValue(PySpin.StreamBufferCountMode_Manual)
-        num_buffers_min = self.cam.TLStream.StreamBufferCountManual.GetMin()
-        self.cam.TLStream.StreamBufferCountManual.SetValue(num_buffers_min)
-        self.cam.TLStream.StreamBufferHandlingMode.SetValue(
-            PySpin.StreamBufferHandlingMode_NewestOnly)
+        self.cam.PixelFormat.SetValue(getattr(PySpin, self.PIXEL_FORMATS[self.output]))
+        self._configure_roi()
 
         # Disable auto exposure, auto gain, and auto white balance
         self.cam.ExposureAuto.SetValue(PySpin.ExposureAuto_Off)
         self.cam.GainAuto.SetValue(PySpin.GainAuto_Off)
         self.cam.BalanceWhiteAuto.SetValue(PySpin.BalanceWhiteAuto_Off)
 
-        # Set ADC bit depth to 10 bits
+        # Set ADC bit depth to 8 bits
         self.cam.AdcBitDepth.SetValue(PySpin.AdcBitDepth_Bit8)
 
-        # Set exposure time and limits
-        # self.cam.ExposureTime.SetValue(self.config.video.exposure_time)  # in microseconds
-        self.cam.ExposureTime.SetValue(500)  # in microseconds
+        # Set exposure time in microseconds
+        self.cam.ExposureTime.SetValue(self.exposure_time)
+
+        # Set frame rate to the requested one, or the maximum possible
+        self.cam.AcquisitionFrameRateEnable.SetValue(True)
+        max_frame_rate = self.cam.AcquisitionFrameRate.GetMax()
+        self.cam.AcquisitionFrameRate.SetValue(min(self.frame_rate or max_frame_rate, max_frame_rate))
+
+        self.cam.TLStream.StreamBufferCountMode.SetValue(PySpin.StreamBufferCountMode_Manual)
+        num_buffers_min = self.cam.TLStream.StreamBufferCountManual.GetMin()
+        self.cam.TLStream.StreamBufferCountManual.SetValue(num_buffers_min)
+        self.cam.TLStream.StreamBufferHandlingMode.SetValue(
+            PySpin.StreamBufferHandlingMode_NewestOnly)
 
         # Enable chunk data mode
         self.cam.ChunkModeActive.SetValue(True)
 
-        # Enable timestamp
+        # Enable timestamp and frame ID
         self.cam.ChunkSelector.SetValue(PySpin.ChunkSelector_Timestamp)
         self.cam.ChunkEnable.SetValue(True)
+        self.cam.ChunkSelector.SetValue(PySpin.ChunkSelector_FrameID)
+        self.cam.ChunkEnable.SetValue(True)
+        self._init_clock_sync()
 
-        logger.debug(f'Camera frame rate set to: {self.cam.AcquisitionFrameRate.GetValue()} fps')
+        logger.debug(f'Camera output: {self.output}, region of interest: {self.roi}, binning: {self.binning}')
+        logger.debug(f'Camera frame rate set to: {self.cam.AcquisitionFrameRate.GetValue()} fps (max {max_frame_rate:.1f})')
         logger.debug(f'Camera buffer size set to: {num_buffers_min}')
 
         logger.info('Beginning frame acquisition')
         self.cam.BeginAcquisition()
 
 
+    def _init_clock_sync(self) -> None:
+        """
+        Creates the mapping from the camera clock to the host clock, calibrated with a first latch of the camera clock if possible
+        """
+        if self.latch_interval is not None:
+            self.clock = ClockSync(envelope=False)
+            try:
+                self._latch_clock()
+                return
+            except (AttributeError, PySpin.SpinnakerException) as e:
+                logger.warning(f'The camera clock cannot be latched ({e}), sensor timestamps are mapped with the arrival times of the frames')
+        self.clock = ClockSync(envelope=True)
+
+
+    def _latch_clock(self) -> None:
+        """
+        Latches the camera clock and adds it to the clock mapping with the host time in the middle of the round trip
+        """
+        before = time.perf_counter()
+        self.cam.TimestampLatch.Execute()
+        device_time = self.cam.TimestampLatchValue.GetValue() * 1e-9
+        after = time.perf_counter()
+        self.clock.add(device_time, (before + after) / 2)
+        self.last_latch = after
+
+
+    def _read_chunk(self, frame_cam) -> None:
+        """
+        Keeps the timestamp (nanoseconds) and the frame ID of the chunk data of an image. It must be called before the image is released
+        """
+        chunk = frame_cam.GetChunkData()
+        self.last_chunk = (chunk.GetTimestamp(), chunk.GetFrameID()) if chunk is not None else None
+
+
+    def read_metadata(self, slot: FrameSlot) -> None:
+        """
+        Overrides video.VideoInput.read_metadata
+        Gives the slot the frame ID and the timestamp of the camera, mapped to the host clock.
+        Gaps between frame IDs are counted as frames lost by the camera (e.g overwritten in the camera buffers before being transferred)
+        """
+        if self.last_chunk is None:
+            super().read_metadata(slot)
+            return
+        timestamp, frame_id = self.last_chunk
+        device_time = timestamp * 1e-9
+        if self.last_frame_id >= 0 and frame_id > self.last_frame_id + 1:
+            self.frames_lost += frame_id - self.last_frame_id - 1
+        self.last_frame_id = frame_id
+
+        if self.clock.envelope:
+            self.clock.add(device_time, slot.timestamp)
+        elif slot.timestamp - self.last_latch >= self.latch_interval:
+            self._latch_clock()
+        slot.frame_id = frame_id
+        slot.sensor_timestamp = self.clock.to_host(device_time)
+
+
+    def _image_array(self, frame_cam) -> np.ndarray:
+        """
+        Pixels of a camera image in the output format. For 'raw' and 'mono' outputs, it's a read-only view of the camera buffer,
+        which is only valid until the image is released
+        """
+        if self.output == 'bgr':
+            return self.color_processor.Convert(frame_cam, PySpin.PixelFormat_BGR8).GetNDArray()
+        return frame_cam.GetNDArray()
+
+
     def read_frame(self) -> np.ndarray:
         """
         Abstract method implementation
-        Uses PySpin to grab a frame annd convert it to a numpy array
-        Note: the numpy array provided by the GetNDArray() function is in readonly mode by default
+        Uses PySpin to grab a frame and convert it to a numpy array.
+        The pixels are copied before the camera buffer is released, as the numpy array provided by the GetNDArray() function refers to it
+        """
+        try:
+            frame_cam = self.cam.GetNextImage()
+            try:
+                if frame_cam.IsIncomplete():
+                    logger.warning('Image incomplete')
+                    return None
+                self._read_chunk(frame_cam)
+                return self._image_array(frame_cam).copy()
+            finally:
+                frame_cam.Release()
+        except PySpin.SpinnakerException as e:
+            logger.exception(e)
+
+
+    def read_frame_into(self, out: np.ndarray) -> bool:
+        """
+        Overrides video.VideoInput.read_frame_into
+        The image is copied once into the provided buffer and the camera buffer is released right after.
+        With the 'raw' and 'mono' outputs, pixels are copied straight from the camera buffer, without any conversion
         """
         try:
             frame_cam = self.cam.GetNextImage()
-            if frame_cam.IsIncomplete():
-                logger.warning('Image incomplete')
-                return None
-            frame_conv = self.color_processor.Convert(frame_cam, PySpin.PixelFormat_BGR8)
-            frame = frame_conv.GetNDArray()
-            frame.flags.writeable = True
-            frame_cam.Release()
-            return frame
+            try:
+                if frame_cam.IsIncomplete():
+                    logger.warning('Image incomplete')
+                    return False
+                frame = self._image_array(frame_cam)
+                if frame.shape != out.shape:
+                    return False
+                self._read_chunk(frame_cam)
+                np.copyto(out, frame)
+                return True
+            finally:
+                frame_cam.Release()
         except PySpin.SpinnakerException as e:
             logger.exception(e)
+            return False
 
 
     def cleanup(self):
         """
         Abstract method implementation
         """
+        if self.clock is not None and self.clock.calibrated:
+            logger.info(f'Camera clock mapping: camera clock drift {1e6 * (1 / self.clock.slope - 1):+.1f}ppm relative to the host, '
+                        f'residual spread {1e6 * self.clock.residual_spread():.1f}us over {self.clock.n_samples} samples')
         self.cam.EndAcquisition()
         self.cam.DeInit()
         del self.cam
@@ -0,0 +1,351 @@
+import json
+import os
+import queue
+import time
+import zlib
+import logging
+from threading import Thread, Lock
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'GCFRAMES'
+HEADER_SIZE = 4096
+VERSION = 2
+COMPRESSIONS = (None, 'zlib')
+INDEX_DTYPE = np.dtype([
+    ('seq', '<i8'),
+    ('timestamp', '<f8'),
+    ('frame_id', '<i8'), # -1 if the video input doesn't provide it
+    ('sensor_timestamp', '<f8'), # NaN if the video input doesn't provide it
+    ('offset', '<u8'), # relative to the beginning of the data section
+    ('size', '<u8'), # stored size in bytes, equal to frame_size for uncompressed frames
+])
+
+
+class FrameRecorder(Thread):
+    """
+    Sink recording the frames captured by a video input to a preallocated memory-mapped file, for later analysis (e.g timing studies).
+    It's attached to a video input with `video_input.add_sink(recorder)`: frames are pushed by the capture thread and written by the recorder thread,
+    so that disk writes never stall the capture.
+
+    Frames are handed over through a bounded pool of preallocated buffers. When every buffer is waiting to be written, the pushed frame is dropped
+    and counted in `frames_overflowed`: the capture thread is never blocked.
+
+    With `compression='zlib'`, every row of a frame is delta encoded (difference between neighbouring pixels) and entropy coded with zlib's
+    Huffman-only strategy, which is lossless and several times faster than regular deflate. As zlib releases the GIL,
+    frames are compressed by `compression_threads` threads in parallel.
+
+    File layout (see: class`FrameRecording` to read it):
+    + fixed size header: magic bytes followed by a JSON description (frame shape, dtype, compression, number of frames), padded to 4096 bytes
+    + index of `max_frames` entries in capture order (sequence number, capture timestamp, device frame ID and sensor timestamp, offset and size of each frame)
+    + data section, preallocated for `max_frames` uncompressed frames. The unused end of the file is truncated when the recorder is closed
+
+
+    Attributes
+    ---
+    frames_written: int
+        Number of frames written to the file
+
+    frames_overflowed: int
+        Number of frames dropped because every buffer of the pool was waiting to be written
+
+    frames_truncated: int
+        Number of frames dropped because the file already held max_frames frames
+    """
+
+    def __init__(self, path: str, max_frames: int = 5000, queue_size: int = 64, compression: Optional[str] = None, compression_threads: int = 2):
+        """
+        Initializes the FrameRecorder.
+
+        Parameters
+        ---
+        path: str, required
+            Path of the recording file
+
+        max_frames: int, default=5000
+            Number of frames the file is preallocated for (e.g 10s at 500 fps). Further frames are dropped
+
+        queue_size: int, default=64
+            Number of preallocated buffers between the capture thread and the recorder thread.
+            It bounds the memory used to absorb disk latency spikes
+
+        compression: str, default=None
+            None to store raw frames, or 'zlib' for lossless compression.
+            Compression reduces the file size but lowers the sustainable framerate, check frames_overflowed
+
+        compression_threads: int, default=2
+            Number of threads compressing frames when compression is enabled
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(f'Unknown compression {compression}. Expected one of {COMPRESSIONS}')
+        super().__init__(daemon=True)
+        self.path = path
+        self.max_frames = max_frames
+        self.queue_size = queue_size
+        self.compression = compression
+        n_threads = compression_threads if compression is not None else 1
+        self.helpers = [Thread(target=self._write_loop, daemon=True) for _ in range(n_threads - 1)]
+
+        self._free = queue.Queue()
+        self._filled = queue.Queue()
+        self._lock = Lock()
+        self._pool = None
+        self._file = None
+        self._index = None
+        self._data = None
+        self.frame_size = 0
+        self.data_used = 0
+        self.frames_queued = 0
+
+        self.frames_written = 0
+        self.frames_overflowed = 0
+        self.frames_truncated = 0
+
+
+    def _allocate(self, frame: np.ndarray) -> None:
+        """
+        Allocates the buffer pool and the file based on the shape and type of the first frame
+        """
+        self.shape = frame.shape
+        self.dtype = frame.dtype
+        self.frame_size = frame.nbytes
+        self._pool = [np.empty_like(frame) for _ in range(self.queue_size)]
+        for buffer in self._pool:
+            self._free.put(buffer)
+
+        index_size = -(-self.max_frames * INDEX_DTYPE.itemsize // HEADER_SIZE) * HEADER_SIZE
+        self.data_start = HEADER_SIZE + index_size
+        self._file = np.memmap(self.path, dtype=np.uint8, mode='w+', shape=(self.data_start + self.max_frames * self.frame_size,))
+        self._index = self._file[HEADER_SIZE:HEADER_SIZE + self.max_frames * INDEX_DTYPE.itemsize].view(INDEX_DTYPE)
+        self._data = self._file[self.data_start:]
+        self._write_header(complete=False)
+        logger.info(f'Recording frames of shape {self.shape} ({self.dtype}) to {self.path}, '
+                    f'{self.max_frames} frames preallocated ({self._file.size / 1e9:.2f}GB), compression: {self.compression}')
+
+
+    def _write_header(self, complete: bool) -> None:
+        """
+        Writes the fixed size header. It's written again with the final number of frames when the recorder is closed
+        """
+        header = json.dumps({
+            'version': VERSION,
+            'shape': list(self.shape),
+            'dtype': self.dtype.str,
+            'compression': self.compression,
+            'max_frames': self.max_frames,
+            'n_frames': self.frames_written,
+            'data_start': self.data_start,
+            'complete': complete,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }).encode()
+        if len(MAGIC) + len(header) > HEADER_SIZE:
+            raise ValueError('Frame recording header too large')
+        self._file[:HEADER_SIZE] = np.frombuffer(MAGIC + header.ljust(HEADER_SIZE - len(MAGIC)), dtype=np.uint8)
+
+
+    def push(self, frame: np.ndarray, seq: int, timestamp: float, frame_id: int = -1, sensor_timestamp: Optional[float] = None) -> bool:
+        """
+        Queues a copy of a frame to be written. Called by the capture thread of the video input, it never blocks
+
+
+        Parameters
+        ---
+        frame: np.ndarray, required
+            Captured frame. It's copied, so the caller can reuse its buffer right after
+
+        seq: int, required
+            Sequence number of the frame
+
+        timestamp: float, required
+            Capture time of the frame in seconds
+
+        frame_id: int, default=-1
+            Frame counter of the device
+
+        sensor_timestamp: float, default=None
+            Capture time of the frame by the device, on the time.perf_counter clock
+
+
+        Returns
+        ---
+        queued: bool
+            False if the frame was dropped because the pool or the file was full, or because the shape changed
+        """
+        if self._pool is None:
+            self._allocate(frame)
+        elif frame.shape != self.shape:
+            self.frames_overflowed += 1
+            return False
+        if self.frames_queued >= self.max_frames:
+            if not self.frames_truncated:
+                logger.warning(f'{self.path} is full ({self.max_frames} frames), further frames are dropped')
+            self.frames_truncated += 1
+            return False
+        try:
+            buffer = self._free.get_nowait()
+        except queue.Empty:
+            self.frames_overflowed += 1
+            return False
+        np.copyto(buffer, frame)
+        # The index entry is reserved now, so that frames stay in capture order whatever the thread writing them
+        self._filled.put((buffer, self.frames_queued, seq, timestamp, frame_id, sensor_timestamp))
+        self.frames_queued += 1
+        return True
+
+
+    def _write(self, buffer: np.ndarray, position: int, seq: int, timestamp: float, frame_id: int, sensor_timestamp: Optional[float],
+               delta: Optional[np.ndarray]) -> None:
+        """
+        Writes a frame to the data section and fills its index entry
+        """
+        if self.compression == 'zlib':
+            delta[:, :1] = buffer[:, :1]
+            np.subtract(buffer[:, 1:], buffer[:, :-1], out=delta[:, 1:])
+            compressor = zlib.compressobj(1, zlib.DEFLATED, 15, 9, zlib.Z_HUFFMAN_ONLY)
+            payload = compressor.compress(delta) + compressor.flush()
+            # Incompressible frames are stored raw, so that a frame never exceeds its preallocated size
+            if len(payload) >= self.frame_size:
+                payload = buffer.reshape(-1).view(np.uint8)
+            else:
+                payload = np.frombuffer(payload, dtype=np.uint8)
+            size = payload.size
+            with self._lock:
+                offset = self.data_used
+                self.data_used += size
+        else:
+            payload = buffer.reshape(-1).view(np.uint8)
+            size = self.frame_size
+            offset = position * self.frame_size
+            with self._lock:
+                self.data_used = max(self.data_used, offset + size)
+        self._data[offset:offset + size] = payload
+
+        entry = self._index[position]
+        entry['seq'] = seq
+        entry['timestamp'] = timestamp
+        entry['frame_id'] = frame_id
+        entry['sensor_timestamp'] = sensor_timestamp if sensor_timestamp is not None else np.nan
+        entry['offset'] = offset
+        entry['size'] = size
+        with self._lock:
+            self.frames_written += 1
+
+
+    def _write_loop(self) -> None:
+        """
+        Writes queued frames until a None item is received
+        """
+        delta = None
+        while True:
+            item = self._filled.get()
+            if item is None:
+                break
+            buffer = item[0]
+            if self.compression == 'zlib' and delta is None:
+                delta = np.empty_like(buffer)
+            self._write(*item, delta)
+            self._free.put(buffer)
+
+
+    def start(self):
+        """
+        Overrides threading.Thread.start to start the compression threads as well
+        """
+        super().start()
+        for helper in self.helpers:
+            helper.start()
+
+
+    def run(self):
+        """
+        Abstract method implementation coming from threading.Thread
+        Writes queued frames until the recorder is closed. Frames still queued at that time are written before the thread ends
+        """
+        self._write_loop()
+
+
+    def close(self) -> None:
+        """
+        Writes the remaining queued frames, finalizes the header and releases the file.
+        It must be called once the video input stopped pushing frames
+        """
+        threads = [thread for thread in (self, *self.helpers) if thread.is_alive()]
+        for _ in threads:
+            self._filled.put(None)
+        for thread in threads:
+            thread.join()
+        if self._file is None:
+            logger.info('Frame recorder closed without any frame')
+            return
+
+        self._write_header(complete=True)
+        self._file.flush()
+        file_size = self.data_start + self.data_used
+        del self._index, self._data, self._file
+        self._file = None
+        os.truncate(self.path, file_size)
+        ratio = self.data_used / max(self.frames_written * self.frame_size, 1)
+        logger.info(f'Frame recorder: {self.frames_written} frames written to {self.path} ({file_size / 1e6:.1f}MB, '
+                    f'{100 * ratio:.0f}% of raw size), {self.frames_overflowed} overflowed, {self.frames_truncated} truncated')
+
+
+class FrameRecording:
+    """
+    Random access reader of a file written by a FrameRecorder.
+    `recording[i]` returns the i-th recorded frame: a read-only view of the memory-mapped file for raw frames, a decoded copy for compressed ones.
+    Sequence numbers, capture timestamps, device frame IDs and sensor timestamps are available as arrays, without reading any frame
+    (e.g to study inter-frame intervals or frames lost by the device)
+    """
+
+    def __init__(self, path: str):
+        """
+        Opens a frame recording file.
+
+
+        Parameters
+        ---
+        path: str, required
+            Path of the recording file
+        """
+        self.path = path
+        self._file = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(self._file[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f'{path} is not a frame recording')
+        self.header = json.loads(bytes(self._file[len(MAGIC):HEADER_SIZE]).decode().rstrip())
+        if self.header['version'] != VERSION:
+            raise ValueError(f'{path} was written with version {self.header["version"]} of the format, only version {VERSION} can be read')
+        self.shape = tuple(self.header['shape'])
+        self.dtype = np.dtype(self.header['dtype'])
+        self.compression = self.header['compression']
+        self.frame_size = int(np.prod(self.shape)) * self.dtype.itemsize
+
+        index = self._file[HEADER_SIZE:HEADER_SIZE + self.header['max_frames'] * INDEX_DTYPE.itemsize].view(INDEX_DTYPE)
+        if self.header['complete']:
+            self.index = index[:self.header['n_frames']]
+        else:
+            # The recorder wasn't closed: only the entries of written frames are kept
+            self.index = index[index['size'] > 0]
+            logger.warning(f'{path} was not closed properly, {len(self.index)} frames recovered')
+        self.seq = self.index['seq']
+        self.timestamps = self.index['timestamp']
+        self.frame_ids = self.index['frame_id']
+        self.sensor_timestamps = self.index['sensor_timestamp']
+        self._data = self._file[self.header['data_start']:]
+
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        entry = self.index[index]
+        offset, size = int(entry['offset']), int(entry['size'])
+        payload = self._data[offset:offset + size]
+        if size == self.frame_size:
+            return payload.view(self.dtype).reshape(self.shape)
+        delta = np.frombuffer(zlib.decompress(payload), dtype=self.dtype).reshape(self.shape)
+        # Rows are restored from the differences between neighbouring pixels (modulo 2^bits, like the encoding)
+        return np.cumsum(delta, axis=1, dtype=self.dtype)
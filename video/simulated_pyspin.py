@@ -0,0 +1,359 @@
+"""
+Simulated subset of the PySpin API (spinnaker-python), emulating a Flir camera such as the Blackfly S BFS-U3-04S2C.
+It allows to run and check the hardware dependent code of video.Flircam without camera nor SDK:
+
+    from video import simulated_pyspin
+    simulated_pyspin.install(width=720, height=540)
+    from video.flircam import Flircam
+
+The simulated camera produces a bright square moving over a noisy background, as a Bayer RG mosaic.
+It mimics the behaviours the acquisition code depends on:
++ sizes, offsets and framerate limits depending on the binning, the ROI and the exposure time
++ frames paced at the configured framerate, and frame IDs skipped when images aren't requested in time (NewestOnly buffer handling)
++ camera buffers recycled by `Release`: arrays returned by `GetNDArray` are overwritten afterwards, like with the SDK
++ chunk data (timestamp in nanoseconds and frame ID) and optional incomplete images
++ a device clock with its own offset and drift, which can be latched (TimestampLatch), and images delivered after a transfer delay
+"""
+import sys
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+AcquisitionMode_Continuous = 'Continuous'
+PixelFormat_BayerRG8 = 'BayerRG8'
+PixelFormat_Mono8 = 'Mono8'
+PixelFormat_BGR8 = 'BGR8'
+StreamBufferCountMode_Manual = 'Manual'
+StreamBufferHandlingMode_NewestOnly = 'NewestOnly'
+ExposureAuto_Off = 'Off'
+GainAuto_Off = 'Off'
+BalanceWhiteAuto_Off = 'Off'
+AdcBitDepth_Bit8 = 'Bit8'
+ChunkSelector_Timestamp = 'Timestamp'
+ChunkSelector_FrameID = 'FrameID'
+SPINNAKER_COLOR_PROCESSING_ALGORITHM_NEAREST_NEIGHBOR = 'NearestNeighbor'
+
+# Settings of the cameras created afterwards (see: function`install`)
+SENSOR = {
+    'width': 720,
+    'height': 540,
+    'line_rate': 522. * 540, # rows read per second, which bounds the framerate of a given ROI height
+    'incomplete_rate': 0.,
+    'bandwidth': 380e6, # bytes per second, images are delivered once transferred
+    'clock_offset': 1234.5, # device clock at host time 0, in seconds
+    'clock_drift': 50e-6, # relative rate difference between the device and host clocks
+    'seed': 0,
+}
+
+
+class SpinnakerException(Exception):
+    pass
+
+
+class LibraryVersion:
+    major, minor, type, build = 4, 0, 0, 116
+
+
+class Node:
+    """
+    Camera setting. Integer settings have limits and an increment, the maximum of size settings depends on other settings
+    """
+
+    def __init__(self, value=None, minimum=None, maximum=None, increment: int = 1):
+        self.value = value
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increment = increment
+
+    def GetValue(self):
+        return self.value
+
+    def SetValue(self, value):
+        minimum, maximum = self.GetMin(), self.GetMax()
+        if minimum is not None:
+            if value < minimum or value > maximum:
+                raise SpinnakerException(f'Value {value} out of range [{minimum}, {maximum}]')
+            if isinstance(value, int) and not isinstance(value, bool) and (value - minimum) % self.increment:
+                raise SpinnakerException(f'Value {value} is not a multiple of the increment {self.increment}')
+        self.value = value
+
+    def GetMin(self):
+        return self.minimum
+
+    def GetMax(self):
+        return self.maximum() if callable(self.maximum) else self.maximum
+
+    def GetInc(self):
+        return self.increment
+
+
+class Command:
+    """
+    Camera command, run by `Execute`
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def Execute(self) -> None:
+        self.callback()
+
+
+class Stream:
+    def __init__(self):
+        self.StreamBufferCountMode = Node('Auto')
+        self.StreamBufferCountManual = Node(10, 1, 100)
+        self.StreamBufferHandlingMode = Node('OldestFirst')
+
+
+class ChunkData:
+    def __init__(self, timestamp: int, frame_id: int):
+        self.timestamp = timestamp
+        self.frame_id = frame_id
+
+    def GetTimestamp(self) -> int:
+        return self.timestamp
+
+    def GetFrameID(self) -> int:
+        return self.frame_id
+
+
+class Image:
+    """
+    Camera buffer holding an image. Its content is only valid until `Release` is called
+    """
+
+    def __init__(self, data: np.ndarray, pixel_format: str, chunk: Optional[ChunkData] = None, incomplete: bool = False, camera: Optional['Camera'] = None):
+        self.data = data
+        self.pixel_format = pixel_format
+        self.chunk = chunk
+        self.incomplete = incomplete
+        self.camera = camera
+        self.released = False
+
+    def IsIncomplete(self) -> bool:
+        return self.incomplete
+
+    def GetNDArray(self) -> np.ndarray:
+        if self.released:
+            raise SpinnakerException('Image already released')
+        array = self.data.view()
+        array.flags.writeable = False
+        return array
+
+    def GetWidth(self) -> int:
+        return self.data.shape[1]
+
+    def GetHeight(self) -> int:
+        return self.data.shape[0]
+
+    def GetPixelFormat(self) -> str:
+        return self.pixel_format
+
+    def GetChunkData(self) -> ChunkData:
+        return self.chunk
+
+    def Release(self) -> None:
+        if self.released or self.camera is None:
+            return
+        # The buffer goes back to the camera, which writes the next images into it
+        self.released = True
+        self.camera.images_outstanding -= 1
+        self.data[...] = 0
+
+
+class ImageProcessor:
+    def SetColorProcessing(self, algorithm) -> None:
+        self.algorithm = algorithm
+
+    def Convert(self, image: Image, pixel_format: str) -> Image:
+        if pixel_format != PixelFormat_BGR8:
+            raise SpinnakerException(f'Unsupported conversion to {pixel_format}')
+        data = image.GetNDArray()
+        if image.pixel_format == PixelFormat_BayerRG8:
+            # OpenCV names Bayer patterns after the second row, RGGB sensors are decoded with the BG code
+            converted = cv2.cvtColor(data, cv2.COLOR_BayerBG2BGR)
+        else:
+            converted = cv2.cvtColor(data, cv2.COLOR_GRAY2BGR)
+        return Image(converted, PixelFormat_BGR8)
+
+
+class Camera:
+    """
+    Simulated camera. Settings are exposed as nodes, named like the ones of PySpin.CameraPtr
+    """
+
+    def __init__(self):
+        sensor_width, sensor_height = SENSOR['width'], SENSOR['height']
+        self.initialized = False
+        self.acquiring = False
+        self.images_outstanding = 0
+        self.AcquisitionMode = Node(AcquisitionMode_Continuous)
+        self.PixelFormat = Node(PixelFormat_BayerRG8)
+        self.BinningHorizontal = Node(1, 1, 4)
+        self.BinningVertical = Node(1, 1, 4)
+        self.Width = Node(sensor_width, 16, lambda: sensor_width // self.BinningHorizontal.value - self.OffsetX.value, 16)
+        self.Height = Node(sensor_height, 2, lambda: sensor_height // self.BinningVertical.value - self.OffsetY.value, 2)
+        self.OffsetX = Node(0, 0, lambda: sensor_width // self.BinningHorizontal.value - self.Width.value, 4)
+        self.OffsetY = Node(0, 0, lambda: sensor_height // self.BinningVertical.value - self.Height.value, 2)
+        self.AcquisitionFrameRateEnable = Node(False)
+        self.AcquisitionFrameRate = Node(30., 1., self._max_frame_rate)
+        self.ExposureAuto = Node('Continuous')
+        self.GainAuto = Node('Continuous')
+        self.BalanceWhiteAuto = Node('Continuous')
+        self.AdcBitDepth = Node('Bit10')
+        self.ExposureTime = Node(5000., 10., 30e6)
+        self.ChunkModeActive = Node(False)
+        self.ChunkSelector = Node(ChunkSelector_Timestamp)
+        self.ChunkEnable = Node(False)
+        self.TimestampLatch = Command(lambda: self.TimestampLatchValue.SetValue(self._device_timestamp(time.perf_counter())))
+        self.TimestampLatchValue = Node(0)
+        self.TLStream = Stream()
+
+    @staticmethod
+    def _device_timestamp(host_time: float) -> int:
+        """
+        Device clock in nanoseconds at a given host time
+        """
+        return int((SENSOR['clock_offset'] + host_time * (1 + SENSOR['clock_drift'])) * 1e9)
+
+    def _max_frame_rate(self) -> float:
+        readout = SENSOR['line_rate'] / (self.Height.value * self.BinningVertical.value)
+        return min(readout, 1e6 / self.ExposureTime.value)
+
+    def Init(self) -> None:
+        self.initialized = True
+
+    def DeInit(self) -> None:
+        if self.acquiring:
+            raise SpinnakerException('Acquisition must be ended before DeInit')
+        self.initialized = False
+
+    def BeginAcquisition(self) -> None:
+        if not self.initialized:
+            raise SpinnakerException('Camera not initialized')
+        self.acquiring = True
+        self.period = 1. / (self.AcquisitionFrameRate.value if self.AcquisitionFrameRateEnable.value else 30.)
+        self.start_time = time.perf_counter()
+        self.last_frame_id = -1
+        self.rng = np.random.default_rng(SENSOR['seed'])
+        height, width = self.Height.value, self.Width.value
+        self.background = self.rng.integers(0, 64, (height, width), dtype=np.uint8)
+        self.buffers = [np.empty((height, width), dtype=np.uint8) for _ in range(max(self.TLStream.StreamBufferCountManual.value, 2))]
+        self.next_buffer = 0
+        self.transfer_time = width * height / SENSOR['bandwidth']
+
+    def EndAcquisition(self) -> None:
+        self.acquiring = False
+
+    def _render(self, frame_id: int, out: np.ndarray) -> None:
+        """
+        Noisy background and a bright square moving from left to right. The Bayer pattern of the sensor dims green pixels
+        """
+        np.copyto(out, self.background)
+        height, width = out.shape
+        side = max(2, min(width, height) // 6)
+        x = (frame_id * 4) % max(width - side, 1)
+        y = (height - side) // 2
+        out[y:y + side, x:x + side] = 220
+        if self.PixelFormat.value == PixelFormat_BayerRG8:
+            out[0::2, 1::2] //= 2
+            out[1::2, 0::2] //= 2
+
+    def GetNextImage(self, timeout: int = 1000) -> Image:
+        """
+        Waits for the next frame. With the NewestOnly buffer handling, frames captured while the previous image was held are lost
+        """
+        if not self.acquiring:
+            raise SpinnakerException('Acquisition not started')
+        # Newest frame whose transfer is complete. Exposure starts every period, transfer takes transfer_time
+        elapsed = time.perf_counter() - self.start_time - self.transfer_time
+        frame_id = max(int(elapsed / self.period), self.last_frame_id + 1)
+        exposure_time = self.start_time + frame_id * self.period
+        delay = exposure_time + self.transfer_time - time.perf_counter()
+        if delay > timeout / 1000:
+            time.sleep(timeout / 1000)
+            raise SpinnakerException('Timeout while waiting for an image')
+        if delay > 0:
+            time.sleep(delay)
+        self.last_frame_id = frame_id
+
+        data = self.buffers[self.next_buffer]
+        self.next_buffer = (self.next_buffer + 1) % len(self.buffers)
+        self._render(frame_id, data)
+        chunk = ChunkData(self._device_timestamp(exposure_time), frame_id) if self.ChunkModeActive.value else None
+        incomplete = bool(SENSOR['incomplete_rate']) and self.rng.random() < SENSOR['incomplete_rate']
+        self.images_outstanding += 1
+        return Image(data, self.PixelFormat.value, chunk, incomplete, camera=self)
+
+
+class CameraList:
+    def __init__(self, cameras):
+        self.cameras = cameras
+
+    def GetSize(self) -> int:
+        return len(self.cameras)
+
+    def __len__(self) -> int:
+        return len(self.cameras)
+
+    def __getitem__(self, index: int) -> Camera:
+        return self.cameras[index]
+
+    def Clear(self) -> None:
+        self.cameras = []
+
+
+class System:
+    _instance = None
+
+    @classmethod
+    def GetInstance(cls) -> 'System':
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def GetLibraryVersion(self) -> LibraryVersion:
+        return LibraryVersion()
+
+    def GetCameras(self) -> CameraList:
+        return CameraList([Camera()])
+
+    def ReleaseInstance(self) -> None:
+        System._instance = None
+
+
+def install(width: int = 720, height: int = 540, max_frame_rate: float = 522., incomplete_rate: float = 0.,
+            bandwidth: float = 380e6, clock_drift: float = 50e-6, seed: int = 0) -> None:
+    """
+    Registers this module as PySpin, so that video.Flircam uses simulated cameras. It must be called before video.flircam is imported
+
+
+    Parameters
+    ---
+    width: int, default=720
+        Width of the sensor in pixels
+
+    height: int, default=540
+        Height of the sensor in pixels
+
+    max_frame_rate: float, default=522.
+        Maximum framerate of the full sensor
+
+    incomplete_rate: float, default=0.
+        Probability of an image to be incomplete
+
+    bandwidth: float, default=380e6
+        Transfer rate in bytes per second, which sets the delay between the exposure and the delivery of an image
+
+    clock_drift: float, default=50e-6
+        Relative rate difference between the device and host clocks
+
+    seed: int, default=0
+        Seed of the simulated images
+    """
+    SENSOR.update(width=width, height=height, line_rate=max_frame_rate * height, incomplete_rate=incomplete_rate,
+                  bandwidth=bandwidth, clock_drift=clock_drift, seed=seed)
+    sys.modules['PySpin'] = sys.modules[__name__]
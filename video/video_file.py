@@ -0,0 +1,193 @@
+import os
+import time
+import logging
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from .video_input import VideoInput
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+
+class VideoFile(VideoInput):
+    """
+    Replays a prerecorded video file or a directory of frames as if it was a live video input.
+    It allows to run and benchmark a scenario without any camera.
+
+    The next frame is always decoded ahead of its due time on the capture thread, so that pacing only consists in waiting for the deadline.
+    Three pacing modes are available:
+    + native: frames are published at the framerate of the source
+    + fixed: frames are published at the framerate given by the `fps` parameter
+    + unthrottled: frames are published as fast as they can be decoded
+
+    When the end of the source is reached, the video input either loops or stops, which ends the main loop of the program.
+    """
+
+    PACING_MODES = ('native', 'fixed', 'unthrottled')
+
+    def __init__(self, path: str, pacing: str = 'native', fps: Optional[float] = None, loop: bool = False, n_slots: int = 3):
+        """
+        Initializes the VideoFile.
+
+        Parameters:
+        ---
+        path: str, required
+            Path to a video file or to a directory containing one image per frame (sorted by filename)
+
+        pacing: str, default='native'
+            Pacing mode. Choose between 'native', 'fixed' and 'unthrottled'
+
+        fps: float, default=None
+            Framerate used by the 'fixed' pacing mode. It's also used as the native framerate of image directories (30 fps if not specified)
+
+        loop: bool, default=False
+            Whether to restart from the first frame once the end of the source is reached
+
+        n_slots: int, default=3
+            Number of preallocated frame slots. See: class`video.VideoInput`
+        """
+        if pacing not in self.PACING_MODES:
+            raise ValueError(f'Unknown pacing mode {pacing}. Choose between {self.PACING_MODES}')
+        if pacing == 'fixed' and not fps:
+            raise ValueError('The fixed pacing mode requires the fps parameter')
+        self.path = path
+        self.pacing = pacing
+        self.fps = fps
+        self.loop = loop
+        self.cap = None
+        self.image_files = None
+        self.image_index = 0
+        self.native_fps = None
+        self.frame_period = 0.
+        self.next_deadline = None
+        super().__init__(n_slots=n_slots)
+
+
+    def configure(self):
+        """
+        Abstract method implementation
+        Opens the source and computes the time between two published frames according to the pacing mode
+        """
+        if os.path.isdir(self.path):
+            self.image_files = sorted(
+                os.path.join(self.path, f) for f in os.listdir(self.path)
+                if f.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            if not self.image_files:
+                raise Exception(f'No image found in {self.path}')
+            self.native_fps = self.fps or 30.
+            logger.debug(f'Found {len(self.image_files)} frames in {self.path}')
+        else:
+            self.cap = cv2.VideoCapture(self.path)
+            if not self.cap.isOpened():
+                raise Exception(f'Failed to open video file {self.path}')
+            self.native_fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.
+            logger.debug(f'Opened {self.path} ({int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))} frames at {self.native_fps:.2f} fps)')
+
+        if self.pacing == 'native':
+            self.frame_period = 1. / self.native_fps
+        elif self.pacing == 'fixed':
+            self.frame_period = 1. / self.fps
+        else:
+            self.frame_period = 0.
+        logger.info(f'Video file pacing: {self.pacing} ({1. / self.frame_period if self.frame_period else "unlimited"} fps)')
+
+
+    def _rewind(self) -> bool:
+        """
+        Restarts the source from the first frame if looping is enabled, otherwise signals the end of the stream
+
+        Returns
+        ---
+        rewound: bool
+            True if the source was rewound
+        """
+        if not self.loop:
+            logger.info('End of video file reached')
+            self.stop_event.set()
+            return False
+        if self.cap is not None:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        self.image_index = 0
+        return True
+
+
+    def _decode(self, out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """
+        Decodes the next frame of the source, into the out buffer if provided
+
+        Returns
+        ---
+        frame: np.ndarray or None
+            Decoded frame or None once the end of the source is reached
+        """
+        for _ in range(2): # second attempt after rewinding
+            if self.cap is not None:
+                valid, frame = self.cap.read(out) if out is not None else self.cap.read()
+                if valid:
+                    return frame
+            elif self.image_index < len(self.image_files):
+                frame = cv2.imread(self.image_files[self.image_index], cv2.IMREAD_COLOR)
+                self.image_index += 1
+                if frame is None:
+                    logger.warning(f'Failed to read {self.image_files[self.image_index - 1]}')
+                return frame
+            if not self._rewind():
+                return None
+        return None
+
+
+    def _wait_for_deadline(self) -> None:
+        """
+        Sleeps until the due time of the frame that was just decoded, then schedules the next one.
+        If the pipeline is late by more than one frame, the schedule is reset instead of trying to catch up
+        """
+        if not self.frame_period:
+            return
+        now = time.perf_counter()
+        if self.next_deadline is None or now - self.next_deadline > self.frame_period:
+            self.next_deadline = now
+        elif self.next_deadline > now:
+            self.stop_event.wait(self.next_deadline - now)
+        self.next_deadline += self.frame_period
+
+
+    def read_frame(self) -> np.ndarray:
+        """
+        Abstract method implementation
+        Decodes the next frame and returns it at its due time
+        """
+        frame = self._decode()
+        if frame is not None:
+            self._wait_for_deadline()
+        return frame
+
+
+    def read_frame_into(self, out: np.ndarray) -> bool:
+        """
+        Overrides video.VideoInput.read_frame_into
+        Video files are decoded directly into the provided buffer
+        """
+        frame = self._decode(out)
+        if frame is None:
+            return False
+        if frame is not out:
+            if frame.shape != out.shape:
+                logger.warning(f'Frame shape {frame.shape} differs from the first frame shape {out.shape}')
+                return False
+            np.copyto(out, frame)
+        self._wait_for_deadline()
+        return True
+
+
+    def cleanup(self):
+        """
+        Abstract method implementation
+        """
+        if self.cap is not None:
+            self.cap.release()
+        logger.debug('Video file released')
@@ -1,22 +1,116 @@
 from abc import ABC, abstractmethod
-from threading import Thread, Event
+from threading import Thread, Event, Condition, current_thread
+from typing import Optional, List
+import time
 import logging
 
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
+
+class FrameSlot:
+    """
+    Preallocated frame buffer owned by a VideoInput.
+    The capture thread writes frames directly into `data`, so no new array is allocated per frame.
+
+
+    Attributes
+    ---
+    data: np.ndarray
+        Pixel buffer of the slot. It's reused from one frame to another
+
+    seq: int
+        Monotonically increasing sequence number of the frame stored in the slot (-1 if the slot was never written)
+
+    timestamp: float
+        Capture time of the frame, in seconds, from the monotonic time.perf_counter clock
+
+    frame_id: int
+        Frame counter of the device (e.g camera chunk data), -1 if the video input doesn't provide it
+
+    sensor_timestamp: float
+        Time at which the device captured the frame, mapped to the time.perf_counter clock, in seconds.
+        None if the video input doesn't provide it
+    """
+    __slots__ = ('data', 'seq', 'timestamp', 'frame_id', 'sensor_timestamp')
+
+    def __init__(self, shape: tuple, dtype):
+        self.data = np.empty(shape, dtype=dtype)
+        self.seq = -1
+        self.timestamp = 0.0
+        self.frame_id = -1
+        self.sensor_timestamp = None
+
+
 class VideoInput(ABC, Thread):
     """
     Wrapper for all the possible video inputs of the pipeline.
     The frame acquisition process by the app runs its own thread in order not to interfere add any delay in the main loop of the program.
+
+    Frames are handed over to the consumer through a small pool of preallocated slots (see class:`FrameSlot`).
+    The capture thread never writes into the newest published slot nor into the slot currently held by the consumer,
+    hence the view returned by `get_frame` stays valid until the next call to `get_frame`.
+    Slots are allocated when the first frame is grabbed, as the frame shape isn't known before.
+
+    Several consumers (e.g the extractors of several scenarios sharing a camera) can read the same frames without any copy:
+    each one is registered with `add_consumer` and passes its ID to `get_frame_slot`. Every consumer gets every newest frame,
+    and one more slot is allocated per additional consumer, so that the slots held by all of them are preserved.
+
+
+    Attributes
+    ---
+    frames_captured: int
+        Number of frames successfully grabbed by the capture thread
+
+    frames_delivered: int
+        Number of frames returned to the consumers by `get_frame`
+
+    frames_dropped: int
+        Number of captured frames which were overwritten before a consumer could read them (summed over the consumers)
+
+    consumer_stats: list
+        Frames delivered to and dropped for every consumer, as { 'delivered': int, 'dropped': int } dictionaries
+
+    read_failures: int
+        Number of times the video input failed to provide a frame
+
+    frames_lost: int
+        Number of frames captured by the device but never received, counted from the gaps between frame IDs.
+        Only video inputs providing frame IDs count them
+
+    sinks: list
+        Objects receiving every captured frame from the capture thread (see: function`add_sink`)
     """
-    def __init__(self):
+    def __init__(self, n_slots: int = 3):
+        """
+        Initializes the video input.
+
+        Parameters
+        ---
+        n_slots: int, default=3
+            Number of preallocated frame slots. At least 3 are required so that the capture thread always has a free slot to write into
+        """
+        if n_slots < 3:
+            raise ValueError(f'At least 3 frame slots are required, got {n_slots}')
         super().__init__()
         self.configure()
-        self.frame = None
+        self.n_slots = n_slots
+        self._slots: Optional[List[FrameSlot]] = None
+        self._latest: int = -1 # index of the newest published slot
+        self._reading: List[int] = [-1] # index of the slot held by every consumer
+        self._last_delivered_seq: List[int] = [-1]
+        self.consumer_stats = [{'delivered': 0, 'dropped': 0}]
+        self._seq: int = 0
+        self._cond = Condition()
         self.stop_event = Event()
-        self.frame_available = Event()
+        self.sinks = []
+
+        self.frames_captured = 0
+        self.frames_delivered = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+        self.frames_lost = 0
 
 
     @abstractmethod
@@ -38,6 +132,31 @@ class VideoInput(ABC, Thread):
         pass
 
 
+    def read_frame_into(self, out: np.ndarray) -> bool:
+        """
+        Grabs a frame from the video input and writes it into a preallocated buffer.
+        The default implementation copies the output of `read_frame`.
+        Subclasses able to decode directly into an existing buffer should override it to avoid any allocation.
+
+
+        Parameters
+        ---
+        out: np.ndarray, required
+            Destination buffer. Its shape and dtype match the ones of the first grabbed frame
+
+
+        Returns
+        ---
+        success: bool
+            False if no frame could be read or if its shape differs from the buffer one
+        """
+        frame = self.read_frame()
+        if frame is None or frame.shape != out.shape:
+            return False
+        np.copyto(out, frame)
+        return True
+
+
     @abstractmethod
     def cleanup(self) -> None:
         """
@@ -48,29 +167,221 @@ class VideoInput(ABC, Thread):
         pass
 
 
+    def read_metadata(self, slot: FrameSlot) -> None:
+        """
+        Fills the device metadata (frame_id and sensor_timestamp) of the slot holding the frame just grabbed.
+        It's called by the capture thread once the slot is stamped. The default implementation provides no metadata.
+        Video inputs whose device stamps frames (e.g video.Flircam) override it
+
+
+        Parameters
+        ---
+        slot: FrameSlot, required
+            Slot of the last grabbed frame
+        """
+        slot.frame_id = -1
+        slot.sensor_timestamp = None
+
+
+    def add_sink(self, sink) -> None:
+        """
+        Attaches a sink receiving every captured frame, including the ones the consumer doesn't read (e.g video.FrameRecorder).
+        Its `push(frame, seq, timestamp, frame_id, sensor_timestamp)` method is called by the capture thread right after the frame is published,
+        so it must not block: the frame buffer is reused once `push` returns.
+        Sinks must be attached before the video input is started
+
+
+        Parameters
+        ---
+        sink: Any, required
+            Object implementing push(frame: np.ndarray, seq: int, timestamp: float, frame_id: int, sensor_timestamp: Optional[float])
+        """
+        self.sinks.append(sink)
+
+
+    def add_consumer(self) -> int:
+        """
+        Registers an additional consumer of the frames. The first consumer (ID 0) always exists.
+        Consumers must be registered before the video input is started
+
+
+        Returns
+        ---
+        consumer: int
+            ID of the consumer, to be given to `get_frame_slot`
+        """
+        if self._slots is not None:
+            raise RuntimeError('Consumers must be registered before the first frame is captured')
+        self._reading.append(-1)
+        self._last_delivered_seq.append(-1)
+        self.consumer_stats.append({'delivered': 0, 'dropped': 0})
+        # Every consumer holds a slot, one more is published and another one is written
+        self.n_slots = max(self.n_slots, len(self._reading) + 2)
+        return len(self._reading) - 1
+
+
+    def _frames_consumed(self) -> bool:
+        """
+        Whether every consumer got the newest published frame (or no frame was published yet). Must be called with `_cond` held
+        """
+        if self._latest < 0:
+            return True
+        seq = self._slots[self._latest].seq
+        return all(delivered >= seq for delivered in self._last_delivered_seq)
+
+
+    def _allocate_slots(self, frame: np.ndarray) -> None:
+        """
+        Allocates the slot pool based on the shape and type of the first frame
+        """
+        self._slots = [FrameSlot(frame.shape, frame.dtype) for _ in range(self.n_slots)]
+        logger.debug(f'Allocated {self.n_slots} frame slots of shape {frame.shape} ({frame.dtype})')
+
+
+    def _next_write_slot(self) -> int:
+        """
+        Picks the slot the next frame is written into.
+        It can be neither the newest published slot nor a slot currently read by a consumer
+        """
+        with self._cond:
+            busy = (self._latest, *self._reading)
+        index = (self._latest + 1) % self.n_slots
+        while index in busy:
+            index = (index + 1) % self.n_slots
+        return index
+
+
+    def _grab(self) -> int:
+        """
+        Grabs a frame into a free slot
+
+        Returns
+        ---
+        index: int
+            Index of the written slot or -1 if the frame couldn't be read
+        """
+        if self._slots is None:
+            frame = self.read_frame()
+            if frame is None:
+                return -1
+            self._allocate_slots(frame)
+            index = self._next_write_slot()
+            np.copyto(self._slots[index].data, frame)
+            return index
+
+        index = self._next_write_slot()
+        if not self.read_frame_into(self._slots[index].data):
+            return -1
+        return index
+
+
     def run(self):
         """
         Abstract method implementation coming from threading.Thread
         It contains the main loop of this thread.
-        At each iteration, it grabs a new frame and it signals that the image is available via the frame_available threading.Event
+        At each iteration, it grabs a new frame into a free slot, stamps it and publishes it as the newest available frame
         The while loop stops when the stop_event evnet is triggered. See: function`stop`
         """
-        while not self.stop_event.is_set():
-            self.frame = self.read_frame()
-            self.frame_available.set()
+        try:
+            while not self.stop_event.is_set():
+                index = self._grab()
+                if index < 0:
+                    self.read_failures += 1
+                    continue
+                slot = self._slots[index]
+                slot.timestamp = time.perf_counter()
+                slot.seq = self._seq
+                self._seq += 1
+                self.read_metadata(slot)
+                with self._cond:
+                    self._latest = index
+                    self.frames_captured += 1
+                    self._cond.notify_all()
+                for sink in self.sinks:
+                    sink.push(slot.data, slot.seq, slot.timestamp, slot.frame_id, slot.sensor_timestamp)
+        finally:
+            # Wakes up any consumer waiting for a frame which will never come
+            with self._cond:
+                self._cond.notify_all()
 
 
     def stop(self):
         """
         Abstract method implementation coming from threading.Thread
-        When called, it triggers the stop_event event and calls the cleanup method
+        When called, it triggers the stop_event event, waits for the current frame grab to end and calls the cleanup method
         """
         logger.info('Stopping video stream')
         self.stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self.is_alive() and self is not current_thread():
+            # Releasing the device while a frame is being read may crash the backend
+            self.join(timeout=1.)
         self.cleanup()
+        logger.info(f'Video stream stats: {self.frames_captured} captured, {self.frames_delivered} delivered, '
+                    f'{self.frames_dropped} dropped, {self.read_failures} read failures, {self.frames_lost} lost by the device')
+
+
+    def get_frame_slot(self, timeout: Optional[float] = None, consumer: int = 0) -> Optional[FrameSlot]:
+        """
+        Waits for a frame newer than the last one delivered to the consumer and returns the slot holding it.
+        The slot is reserved for the consumer until its next call, so its content isn't overwritten in the meantime.
+
+
+        Parameters
+        ---
+        timeout: float, default=None
+            Maximum time to wait for a new frame, in seconds. Waits indefinitely if None
+
+        consumer: int, default=0
+            ID of the consumer (see: function`add_consumer`)
 
 
-    def get_frame(self):
-        self.frame_available.wait()
-        self.frame_available.clear()
-        return self.frame
+        Returns
+        ---
+        slot: FrameSlot or None
+            Newest complete frame slot or None if the timeout expired or the video input stopped
+        """
+        def new_frame_available():
+            return self._latest >= 0 and self._slots[self._latest].seq > self._last_delivered_seq[consumer]
+
+        with self._cond:
+            self._cond.wait_for(lambda: self.stop_event.is_set() or new_frame_available(), timeout)
+            if not new_frame_available():
+                self._reading[consumer] = -1
+                return None
+            slot = self._slots[self._latest]
+            self._reading[consumer] = self._latest
+            stats = self.consumer_stats[consumer]
+            if self._last_delivered_seq[consumer] >= 0:
+                dropped = slot.seq - self._last_delivered_seq[consumer] - 1
+                stats['dropped'] += dropped
+                self.frames_dropped += dropped
+            self._last_delivered_seq[consumer] = slot.seq
+            stats['delivered'] += 1
+            self.frames_delivered += 1
+            # Wakes up producers pacing on the consumers (see: function`_frames_consumed`)
+            self._cond.notify_all()
+            return slot
+
+
+    def get_frame(self, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        Returns a zero-copy view of the newest complete frame.
+        The view remains valid until the next call to `get_frame` or `get_frame_slot`.
+        See: function`get_frame_slot`
+
+
+        Parameters
+        ---
+        timeout: float, default=None
+            Maximum time to wait for a new frame, in seconds. Waits indefinitely if None
+
+
+        Returns
+        ---
+        frame: np.ndarray or None
+            Newest frame or None if the timeout expired or the video input stopped
+        """
+        slot = self.get_frame_slot(timeout)
+        return slot.data if slot is not None else None
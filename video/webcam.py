@@ -1,4 +1,5 @@
 import cv2
+import numpy as np
 from .video_input import VideoInput
 import time
 import logging
@@ -12,7 +13,7 @@ class Webcam(VideoInput):
     It uses opencv to trigger the camera and handle the incoming video stream
     """
 
-    def __init__(self, cam_index=0):
+    def __init__(self, cam_index=0, n_slots: int = 3):
         """
         Initializes the Webcam.
 
@@ -20,10 +21,13 @@ class Webcam(VideoInput):
         ---
         cam_index: int, default=0
             The index of the webcam to use.
+
+        n_slots: int, default=3
+            Number of preallocated frame slots. See: class`video.VideoInput`
         """
         self.cam_index = cam_index
         self.cap = None
-        super().__init__()
+        super().__init__(n_slots=n_slots)
 
 
     def configure(self):
@@ -46,6 +50,22 @@ class Webcam(VideoInput):
         return frame
 
 
+    def read_frame_into(self, out):
+        """
+        Overrides video.VideoInput.read_frame_into
+        cv2.VideoCapture decodes the frame directly into the provided buffer, hence no allocation is performed
+        """
+        valid, frame = self.cap.read(out)
+        if not valid:
+            return False
+        if frame is not out:
+            # OpenCV reallocates when the buffer doesn't fit the frame (e.g resolution change)
+            if frame.shape != out.shape:
+                return False
+            np.copyto(out, frame)
+        return True
+
+
     def cleanup(self):
         """
         Abstract method implementation